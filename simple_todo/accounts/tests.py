@@ -1,3 +1,57 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from todo_lists.models import AccountDeletion, Task, TodoList
+from todo_lists.purge import purge_accounts
+
+
+# Test Case Classes
+# =================
+@override_settings(CRON_SECRET="secret", ACCOUNT_PURGE_THREAD=False)
+class AccountPurgeViewTests(TestCase):
+    def setUp(self):
+        # Delete an account without the background thread, like on a
+        # serverless host, so only the scheduled purge deletes it
+        self.user = User.objects.create_user("alice", password="secret")
+        todo_list = TodoList.objects.create(user=self.user, name="Groceries")
+        Task.objects.create(
+            todo_list=todo_list, 
+            owner=self.user, 
+            name="Milk", 
+            due_date=timezone.now()
+        )
+        self.client.force_login(self.user)
+        self.client.post(reverse("account-delete"))
+
+    def test_purge_requires_the_cron_secret(self):
+        for token in ["", "Bearer ", "Bearer wrong"]:
+            with self.subTest(token=token):
+                response = self.client.get(
+                    reverse("account-purge"), HTTP_AUTHORIZATION=token)
+                self.assertEqual(response.status_code, 401)
+
+        # The view is disabled without a secret
+        with override_settings(CRON_SECRET=""):
+            response = self.client.get(
+                reverse("account-purge"), HTTP_AUTHORIZATION="Bearer ")
+            self.assertEqual(response.status_code, 404)
+
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_purge_deletes_requested_accounts(self):
+        # The account was only deactivated by the request
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertTrue(AccountDeletion.objects.exists())
+
+        # A purge which is out of time leaves the account for the next run
+        self.assertEqual(purge_accounts(0), 0)
+        self.assertTrue(Task.objects.exists())
+
+        response = self.client.get(
+            reverse("account-purge"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.json(), {"purged": 1, "remaining": 0})
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(TodoList.objects.exists())
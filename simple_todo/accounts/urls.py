@@ -5,5 +5,6 @@ from . import views
 
 urlpatterns = [
     path("", include("allauth.urls")),
-    path("delete/", views.AccountDeleteView.as_view(), name="account-delete")
+    path("delete/", views.AccountDeleteView.as_view(), name="account-delete"),
+    path("purge/", views.AccountPurgeView.as_view(), name="account-purge")
 ]
@@ -1,9 +1,18 @@
+import hmac
+
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth import logout
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
 from django.urls import reverse
-from django.views.generic import TemplateView
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
+from django.views.generic import TemplateView, View
+
+from todo_lists.models import AccountDeletion
+from todo_lists.purge import purge_accounts, request_account_deletion
 
 
 # View Classes
@@ -12,11 +21,41 @@ class AccountDeleteView(LoginRequiredMixin, TemplateView):
     template_name = "accounts/account_delete.html"
 
     def post(self, *args, **kwargs):
-        # Delete the current user's account and return to the homepage
-        self.request.user.delete()
+        # Deactivate the current user's account, log them out and return to
+        # the homepage while their data is deleted in the background
+        request_account_deletion(self.request.user)
+        logout(self.request)
         messages.add_message(
             self.request, 
             messages.INFO, 
             "Your account has been successfully deleted."
         )
         return HttpResponseRedirect(reverse("todo-lists"))
+
+
+@method_decorator(never_cache, name="get")
+class AccountPurgeView(View):
+    def get(self, request, *args, **kwargs):
+        # Let a scheduled job which sends the cron secret as a bearer token,
+        # like Vercel cron jobs do, delete the accounts whose deletion was
+        # requested. The view is disabled while there is no secret.
+        if not settings.CRON_SECRET:
+            raise Http404
+        
+        token = request.headers.get("Authorization", "")
+
+        if not hmac.compare_digest(
+            token.encode(), 
+            f"Bearer {settings.CRON_SECRET}".encode()
+        ):
+            return JsonResponse({"detail": "Invalid token."}, status=401)
+        
+        # Stop in time for the function time limit. Accounts which are left
+        # over are deleted by the next run.
+        count = purge_accounts(settings.ACCOUNT_PURGE_SECONDS)
+        return JsonResponse(
+            {
+                "purged": count, 
+                "remaining": AccountDeletion.objects.count()
+            }
+        )
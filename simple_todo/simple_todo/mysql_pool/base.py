@@ -0,0 +1,146 @@
+import queue
+import threading
+
+from django.db import OperationalError
+from django.db.backends.mysql import base
+
+
+# Pools of open connections by database alias, shared by all threads
+pools = {}
+pools_lock = threading.Lock()
+
+
+# Connection Pool Class
+# =====================
+class ConnectionPool:
+    def __init__(self, max_size, timeout):
+        # Idle connections, most recently used first, so the surplus ones
+        # sit unused until the server drops them. At most max_size
+        # connections are open or in use at a time.
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.timeout = timeout
+
+    def get(self, connect, health_checks):
+        # Wait for a free slot, then reuse an idle connection or open a new
+        # one. Idle connections which the server dropped are discarded.
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f"No database connection became free within {self.timeout} "
+                f"seconds."
+            )
+        
+        try:
+            while True:
+                try:
+                    connection = self.idle.get_nowait()
+
+                except queue.Empty:
+                    return connect()
+                
+                if not health_checks or self.is_usable(connection):
+                    return connection
+                
+                self.close(connection)
+
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def put(self, connection):
+        # Return a connection which is no longer used. Transactions which
+        # were left open are rolled back first.
+        try:
+            if not connection.get_autocommit():
+                connection.rollback()
+
+        except base.Database.Error:
+            self.close(connection)
+
+        else:
+            self.idle.put(connection)
+
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        # Close a connection which was taken from the pool but can't be
+        # used, and free its slot
+        try:
+            self.close(connection)
+
+        finally:
+            self.slots.release()
+
+    def is_usable(self, connection):
+        try:
+            connection.ping()
+
+        except base.Database.Error:
+            return False
+        
+        return True
+    
+    def close(self, connection):
+        # Close a connection which can't be reused, ignoring errors since it
+        # may already be broken
+        try:
+            connection.close()
+
+        except base.Database.Error:
+            pass
+
+
+# Database Wrapper Class
+# ======================
+class DatabaseWrapper(base.DatabaseWrapper):
+    # MySQL backend which shares connections between threads instead of
+    # opening one per thread. Under ASGI every request runs in a new
+    # thread, so persistent connections can't be reused there. Configure
+    # the pool with OPTIONS["pool"] = {"max_size": ..., "timeout": ...}.
+    @property
+    def pool(self):
+        # Create the pool of this database on first use
+        with pools_lock:
+            if self.alias not in pools:
+                options = self.settings_dict["OPTIONS"].get("pool", {})
+                pools[self.alias] = ConnectionPool(
+                    options.get("max_size", 10), 
+                    options.get("timeout", 10)
+                )
+
+            return pools[self.alias]
+
+    def get_connection_params(self):
+        # The pool options aren't connection parameters
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    def connect(self):
+        # Discard the connection if its state couldn't be initialized, so
+        # its slot isn't held until the wrapper is closed and it isn't
+        # handed out again in an unknown state
+        try:
+            super().connect()
+
+        except BaseException:
+            if self.connection is not None:
+                connection, self.connection = self.connection, None
+                self.pool.discard(connection)
+
+            raise
+
+    def get_new_connection(self, conn_params):
+        # Take a connection from the pool. The connection state, like
+        # autocommit and the isolation level, is initialized again
+        # afterwards.
+        return self.pool.get(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            self.settings_dict["CONN_HEALTH_CHECKS"]
+        )
+
+    def _close(self):
+        # Return the connection to the pool instead of closing it
+        if self.connection is not None:
+            self.pool.put(self.connection)
@@ -0,0 +1,130 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+# Name of the cookie which pins a client to the primary after it writes
+PIN_COOKIE = "db_pin"
+
+# Methods whose reads may be served by a replica
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Routing state of the current request, or None outside of requests
+routing = ContextVar("routing", default=None)
+
+
+# Routing Class
+# =============
+class Routing:
+    def __init__(self, replica):
+        # Whether reads may go to a replica and whether the client has to be
+        # pinned to the primary
+        self.replica = replica
+        self.pin = False
+
+
+# Functions
+# =========
+def use_primary(pin=False):
+    # Send the remaining reads of the current request to the primary, and
+    # optionally pin the client to it like after a write
+    state = routing.get()
+
+    if state is not None:
+        state.replica = False
+        state.pin = state.pin or pin
+
+
+# Router Classes
+# ==============
+class ReplicaRouter:
+    # Send the reads of safe requests to a random replica and everything
+    # else to the primary. Management commands and background threads
+    # always use the primary.
+    def db_for_read(self, model, **hints):
+        state = routing.get()
+
+        if state is None or not state.replica or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # Read the rest of the request from the primary, so it sees its own
+        # writes
+        use_primary(pin=True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        return db not in settings.DATABASE_REPLICAS
+
+
+# Middleware Classes
+# ==================
+class ReplicaMiddleware:
+    # Let the reads of safe requests go to a replica, unless the client
+    # wrote recently. Replicas lag behind the primary, so after a write the
+    # client is pinned to the primary for DATABASE_REPLICA_PIN_SECONDS and
+    # still reads its own writes.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = self.start(request)
+        token = routing.set(state)
+
+        try:
+            response = self.get_response(request)
+
+        finally:
+            routing.reset(token)
+
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        token = routing.set(state)
+
+        try:
+            response = await self.get_response(request)
+
+        finally:
+            routing.reset(token)
+
+        return self.finish(state, response)
+
+    def start(self, request):
+        # Allow replica reads for safe requests of unpinned clients
+        return Routing(
+            request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES)
+
+    def finish(self, state, response):
+        # Pin the client to the primary if the request wrote
+        if state.pin and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax"
+            )
+
+        return response
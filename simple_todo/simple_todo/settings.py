@@ -60,6 +60,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    "simple_todo.replicas.ReplicaMiddleware",
+    "todo_lists_api_v1.middleware.ApiGZipMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -101,6 +103,54 @@ DATABASES = {
     'default': env.db()
 }
 
+# Read replicas (comma separated database URLs). The reads of GET requests
+# go to a random replica, and clients are pinned to the primary for
+# DB_REPLICA_PIN_SECONDS after they write. Tests read from the primary.
+DATABASE_REPLICAS = []
+
+for i, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), 1):
+    DATABASES[f"replica{i}"] = env.db_url_config(url)
+    DATABASES[f"replica{i}"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(f"replica{i}")
+
+DATABASE_REPLICA_PIN_SECONDS = env.int("DB_REPLICA_PIN_SECONDS", default=10)
+DATABASE_ROUTERS = [
+    "simple_todo.replicas.ReplicaRouter"
+]
+
+for database in DATABASES.values():
+    # Keep connections open for DB_CONN_MAX_AGE seconds between requests,
+    # so requests don't pay for connecting and authenticating every time (0
+    # closes them after each request). Health checks replace connections
+    # which the server dropped instead of failing the request.
+    database["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+    database["CONN_HEALTH_CHECKS"] = env.bool(
+        "DB_CONN_HEALTH_CHECKS", default=True)
+
+    # Under ASGI every request runs in a new thread, so persistent
+    # connections are never reused. Share a pool of connections between
+    # threads instead.
+    if env.bool("DB_POOL", default=False):
+        from django.core.exceptions import ImproperlyConfigured
+
+        if database["ENGINE"] != "django.db.backends.mysql":
+            raise ImproperlyConfigured("DB_POOL is only supported with MySQL.")
+        
+        database["ENGINE"] = "simple_todo.mysql_pool"
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+            "timeout": env.float("DB_POOL_TIMEOUT", default=10)
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://")
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -188,5 +238,29 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework_simplejwt.authentication.JWTAuthentication"
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "todo_lists_api_v1.renderers.MessagePackRenderer"
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "todo_lists_api_v1.parsers.MessagePackParser"
     ]
 }
+
+# Delta sync (tombstones older than this are pruned, so older sync tokens
+# are rejected and clients must reload everything)
+from datetime import timedelta
+
+SYNC_TOKEN_LIFETIME = timedelta(days=30)
+
+# Account deletion. Deleted accounts are purged by a scheduled job, which
+# either calls the account purge view with CRON_SECRET as a bearer token or
+# runs "manage.py purge_accounts". The background thread only starts sooner.
+CRON_SECRET = env("CRON_SECRET", default="")
+ACCOUNT_PURGE_THREAD = env.bool("ACCOUNT_PURGE_THREAD", default=True)
+ACCOUNT_PURGE_SECONDS = env.int("ACCOUNT_PURGE_SECONDS", default=8)
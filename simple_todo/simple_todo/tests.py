@@ -0,0 +1,225 @@
+import os
+import tempfile
+import warnings
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from todo_lists.models import TodoList
+
+from .mysql_pool import base as mysql_pool
+from .replicas import PIN_COOKIE, ReplicaRouter, Routing, routing
+
+
+# Test Case Classes
+# =================
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def route(self, state):
+        # Return the database a read is sent to with the given routing state
+        token = routing.set(state)
+
+        try:
+            return self.router.db_for_read(TodoList)
+
+        finally:
+            routing.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+    def test_safe_reads_go_to_a_replica(self):
+        self.assertIn(self.route(Routing(True)), ["replica1", "replica2"])
+
+    @override_settings(DATABASE_REPLICAS=["replica1"])
+    def test_other_reads_go_to_the_primary(self):
+        # Unsafe requests and code outside of requests read from the primary
+        self.assertEqual(self.route(Routing(False)), "default")
+        self.assertEqual(self.route(None), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_reads_go_to_the_primary_without_replicas(self):
+        self.assertEqual(self.route(Routing(True)), "default")
+
+    @override_settings(DATABASE_REPLICAS=["replica1"])
+    def test_writes_pin_the_request_to_the_primary(self):
+        state = Routing(True)
+        token = routing.set(state)
+
+        try:
+            self.assertEqual(self.router.db_for_write(TodoList), "default")
+            self.assertEqual(self.router.db_for_read(TodoList), "default")
+
+        finally:
+            routing.reset(token)
+
+        self.assertTrue(state.pin)
+
+    @override_settings(DATABASE_REPLICAS=["replica1"])
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "todo_lists"))
+        self.assertFalse(self.router.allow_migrate("replica1", "todo_lists"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaMiddlewareTests(TestCase):
+    # The replica only exists while the tests of this class run, so the
+    # test runner doesn't set it up
+    databases = {"default"}
+
+    @classmethod
+    def setUpClass(cls):
+        # Register a replica which is a second SQLite file and create its
+        # test database. It isn't replicated to, so rows which exist on only
+        # one of the databases tell which one a request read from.
+        cls.databases_override = override_settings(DATABASES={
+            **settings.DATABASES,
+            "replica1": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": "",
+                "TEST": {
+                    "NAME": str(
+                        Path(tempfile.gettempdir()) / f"simple_todo_replica_{os.getpid()}.sqlite3")
+                }
+            }
+        })
+
+        # Django warns that connections don't follow DATABASES, so the
+        # alias is added to them by hand
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cls.databases_override.enable()
+
+        connections.settings["replica1"] = connections.configure_settings(None)["replica1"]
+        connections["replica1"].creation.create_test_db(verbosity=0, autoclobber=True)
+        cls.databases = {"default", "replica1"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        # Delete the test database of the replica and unregister it
+        super().tearDownClass()
+        connections["replica1"].creation.destroy_test_db(
+            connections["replica1"].settings_dict["NAME"], verbosity=0)
+        del connections["replica1"]
+        del connections.settings["replica1"]
+        cls.databases_override.disable()
+
+    def setUp(self):
+        # Create the user on both databases, then a todo list which only
+        # exists on the replica
+        self.user = User.objects.create_user("alice", password="secret")
+        User.objects.using("replica1").create(pk=self.user.pk, username="alice")
+        TodoList.objects.using("replica1").create(
+            user_id=self.user.pk, name="Only on replica")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_names(self):
+        # Return the names of the todo lists the client reads
+        response = self.client.get(reverse("todo_list-list"))
+        self.assertEqual(response.status_code, 200)
+        return [todo_list["name"] for todo_list in response.json()["results"]]
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.list_names(), ["Only on replica"])
+
+    def test_client_is_pinned_after_write(self):
+        # Write to the primary, which pins the client to it
+        response = self.client.post(
+            reverse("todo_list-list"), {"name": "Written"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.list_names(), ["Written"])
+
+        # Read from the replica again once the pin expired
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.list_names(), ["Only on replica"])
+
+    def test_sync_reads_from_primary(self):
+        # Sync tokens are stamped from the primary's clock, so the changes
+        # and the pages loaded after the token come from the primary
+        TodoList.objects.create(user=self.user, name="On primary")
+        response = self.client.get(reverse("sync"))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.get(
+            reverse("sync"), {"since": response.json()["token"]})
+        self.assertEqual(
+            [todo_list["name"] for todo_list in response.json()["todo_lists"]],
+            ["On primary"]
+        )
+        self.assertEqual(self.list_names(), ["On primary"])
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        # Use a pool with a single slot, so a leaked slot makes the next
+        # connection time out, and stub connections instead of a server
+        self.alias = f"pool_{self.id()}"
+        self.wrapper = mysql_pool.DatabaseWrapper(
+            {
+                **connections["default"].settings_dict,
+                "ENGINE": "simple_todo.mysql_pool",
+                "NAME": "test",
+                "OPTIONS": {"pool": {"max_size": 1, "timeout": 0.01}}
+            },
+            self.alias
+        )
+        self.connection = mock.Mock()
+        patcher = mock.patch.object(
+            mysql_pool.base.DatabaseWrapper, 
+            "get_new_connection", 
+            return_value=self.connection
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(mysql_pool.pools.pop, self.alias, None)
+
+    def assertSlotFree(self):
+        # Take and give back the only slot, which fails if it is still held
+        # and raises ValueError if it was released twice
+        self.assertTrue(self.wrapper.pool.slots.acquire(timeout=0))
+        self.wrapper.pool.slots.release()
+
+    def test_close_releases_slot(self):
+        with mock.patch.object(self.wrapper, "init_connection_state"):
+            self.wrapper.connect()
+
+        with self.assertRaises(OperationalError):
+            self.wrapper.pool.get(mock.Mock, False)
+
+        self.wrapper.close()
+        self.assertIsNone(self.wrapper.connection)
+        self.assertSlotFree()
+
+        # The connection is reused by the next connect
+        with mock.patch.object(self.wrapper, "init_connection_state"):
+            self.wrapper.connect()
+
+        self.assertIs(self.wrapper.connection, self.connection)
+        self.wrapper.close()
+        self.assertSlotFree()
+
+    def test_failed_init_releases_slot(self):
+        with mock.patch.object(
+            self.wrapper, 
+            "init_connection_state", 
+            side_effect=OperationalError
+        ):
+            with self.assertRaises(OperationalError):
+                self.wrapper.connect()
+
+        # The connection is closed instead of going back to the pool, and
+        # closing the wrapper afterwards doesn't release the slot again
+        self.assertIsNone(self.wrapper.connection)
+        self.connection.close.assert_called_once()
+        self.assertTrue(self.wrapper.pool.idle.empty())
+        self.wrapper.close()
+        self.assertSlotFree()
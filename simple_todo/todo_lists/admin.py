@@ -1,21 +1,61 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
 
 from .models import Task, TodoList
+from .search import match_sql, parse_terms
+
+
+# Mixin Classes
+# =============
+class FullTextSearchMixin:
+    # Lookups which are matched against the full-text index of a model, and
+    # the field holding the username of the owner, which is matched exactly
+    full_text_fields = []
+    owner_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        # Fall back to the default search without a full-text index
+        terms = parse_terms(search_term)
+        matches = [
+            (lookup, match_sql(model, terms))
+            for lookup, model in self.full_text_fields
+        ] if terms else []
+
+        if not matches or any(match is None for lookup, match in matches):
+            return super().get_search_results(request, queryset, search_term)
+        
+        # Match the names against the full-text indexes and the owner by name
+        condition = Q(**{self.owner_field: search_term.strip()})
+
+        for lookup, (sql, params) in matches:
+            condition |= Q(**{lookup: RawSQL(sql, params)})
+
+        return queryset.filter(condition), False
 
 
 # Model Admin Classes
 # ===================
 @admin.register(TodoList)
-class TodoListAdmin(admin.ModelAdmin):
+class TodoListAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ["name", "user"]
     ordering = ["name"]
     autocomplete_fields = ["user"]
     search_fields = ["name", "user__username"]
+    full_text_fields = [
+        ("pk__in", TodoList)
+    ]
+    owner_field = "user__username"
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ["name", "todo_list", "due_date"]
     ordering = ["name"]
     autocomplete_fields = ["todo_list"]
-    search_fields = ["name", "todo_list__name", "todo_list__user__username"]
+    search_fields = ["name", "todo_list__name", "owner__username"]
+    full_text_fields = [
+        ("pk__in", Task),
+        ("todo_list__in", TodoList)
+    ]
+    owner_field = "owner__username"
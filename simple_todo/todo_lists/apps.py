@@ -1,7 +1,27 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def repair_search_index(sender, using, **kwargs):
+    # Migrations which rebuild a table on SQLite drop its triggers, so put
+    # back whatever part of the search index is missing unless the search
+    # index migration was unapplied
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+
+    from .search import install_index
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+
+    if ("todo_lists", "0008_search_index") in applied:
+        install_index(connection)
 
 
 class TodoListsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'todo_lists'
     verbose_name = "Todo Lists"
+
+    def ready(self):
+        post_migrate.connect(repair_search_index, sender=self)
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from .purge import delete_account
+
+
+# Functions
+# =========
+@contextmanager
+def benchmark_users(count):
+    # Create throwaway users for a benchmark and delete their data in chunks
+    # afterwards, even if the benchmark failed
+    prefix = f"benchmark-{uuid4().hex[:16]}"
+    password = make_password(None)
+    users = User.objects.bulk_create(
+        [
+            User(username=f"{prefix}-{i}", password=password)
+            for i in range(count)
+        ]
+    )
+
+    try:
+        yield users
+
+    finally:
+        for user in users:
+            delete_account(user.pk)
+
+
+@contextmanager
+def benchmark_user():
+    # Create a single throwaway user for a benchmark
+    with benchmark_users(1) as users:
+        yield users[0]
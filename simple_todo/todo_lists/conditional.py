@@ -0,0 +1,70 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import UserSummary
+
+
+# Functions
+# =========
+def get_user_summary(request):
+    # Look up the version stamp and counters of the current user once per
+    # request
+    if not hasattr(request, "_user_summary"):
+        request._user_summary = UserSummary.for_user(request.user.pk)
+
+    return request._user_summary
+
+
+def user_conditional(variant):
+    # Answer matching conditional GET requests with 304 before the view
+    # runs. The ETag is derived from the version stamp of the current user,
+    # so any change to their todo lists or tasks invalidates it. Async
+    # views are supported as well.
+    def etag_func(request, *args, **kwargs):
+        # Leave anonymous requests to the view, which rejects them
+        if not request.user.is_authenticated:
+            return None
+
+        version = get_user_summary(request).version
+        name = variant(request) if callable(variant) else variant
+        return f'"{request.user.pk}-{version}-{name}"'
+
+    def last_modified_func(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return None
+
+        return get_user_summary(request).updated_at
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func, last_modified_func)(view_func)
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # Look up the summary without blocking the event loop, so
+                # the ETag and last modified functions don't query
+                if request.user.is_authenticated:
+                    request._user_summary = await UserSummary.afor_user(
+                        request.user.pk)
+
+                response = await conditional_view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            # Make browsers revalidate the private response on every request
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
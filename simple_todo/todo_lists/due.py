@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+
+
+# Due date windows which can be requested, in the order they are shown
+WINDOWS = [
+    ("overdue", "Overdue"),
+    ("today", "Today"),
+    ("week", "This Week"),
+    ("next", "Next Hours"),
+    ("month", "Month")
+]
+
+# Longest window which can be requested in hours
+MAX_HOURS = 24 * 31
+
+
+# Functions
+# =========
+def due_window(window, now, hours=24, month=None):
+    # Return the start (inclusive) and end (exclusive) of a due date window
+    # relative to the given aware moment. Days and weeks start at midnight in
+    # the time zone of the moment. Raise ValueError if the window is invalid.
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if window == "overdue":
+        return None, now
+
+    elif window == "today":
+        return today, today + timedelta(days=1)
+
+    elif window == "week":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=7)
+
+    elif window == "next":
+        if not 0 < hours <= MAX_HOURS:
+            raise ValueError(f"Hours must be between 1 and {MAX_HOURS}.")
+
+        return now, now + timedelta(hours=hours)
+
+    elif window == "month":
+        start = today.replace(day=1) if month is None else month.replace(
+            tzinfo=now.tzinfo)
+
+        # The month after December 9999 can't be represented
+        try:
+            end = (start + timedelta(days=32)).replace(day=1)
+
+        except OverflowError:
+            raise ValueError("Month is out of range.")
+
+        return start, end
+
+    raise ValueError(f'"{window}" is not a valid window.')
+
+
+def due_window_from_params(params, now=None):
+    # Parse the window, hours, month and time zone query parameters and
+    # return the due date window they select. Raise ValueError with a
+    # message for the client if any of them is invalid.
+    now = timezone.now() if now is None else now
+
+    # Parse the time zone, which defaults to the current time zone
+    tz = params.get("tz")
+
+    try:
+        tz = ZoneInfo(tz) if tz else timezone.get_current_timezone()
+
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'"{tz}" is not a valid time zone.')
+
+    # Parse the length of the window in hours
+    try:
+        hours = int(params.get("hours", 24))
+
+    except ValueError:
+        raise ValueError("Hours must be an integer.")
+
+    # Parse the month as YYYY-MM
+    month = params.get("month")
+
+    try:
+        month = datetime.strptime(month, "%Y-%m") if month else None
+
+    except ValueError:
+        raise ValueError("Month must have the format YYYY-MM.")
+
+    return due_window(
+        params.get("window", "overdue"),
+        timezone.localtime(now, tz),
+        hours,
+        month
+    )
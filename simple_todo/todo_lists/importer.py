@@ -0,0 +1,349 @@
+import csv
+import json
+import re
+import sqlite3
+from datetime import datetime, timezone as dt_timezone
+from itertools import chain, islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Task, TodoList, UserSummary
+
+
+# Formats which can be imported. They match the output of the export.
+FORMATS = ["ndjson", "csv"]
+
+# Number of NDJSON lines which are parsed at once
+PARSE_CHUNK_SIZE = 1000
+
+# Due dates in UTC without fractions of a second, as the export writes them
+UTC_DATE_RE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}Z")
+
+
+# Functions
+# =========
+def decode_lines(lines):
+    # Decode lines which were read from a binary stream. Only the first line
+    # can start with a byte order mark, and decoding plain UTF-8 is much
+    # faster.
+    encoding = "utf-8-sig"
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode(encoding, "replace")
+
+        encoding = "utf-8"
+        yield line
+
+
+def parse_ndjson(lines):
+    # Yield the line number and object of each non-empty line, or a
+    # ValueError instead of the object if the line is invalid. The lines
+    # are parsed in chunks as one JSON array, which is much faster than
+    # parsing them one at a time. A chunk which doesn't parse into one value
+    # per line is parsed again line by line to find the invalid lines.
+    numbered = (
+        (number, line) 
+        for number, line in enumerate(decode_lines(lines), 1) 
+        if line.strip()
+    )
+
+    while chunk := list(islice(numbered, PARSE_CHUNK_SIZE)):
+        try:
+            rows = json.loads(f"[{','.join([line for _, line in chunk])}]")
+
+        except ValueError:
+            rows = None
+
+        if rows is None or len(rows) != len(chunk):
+            yield from parse_ndjson_lines(chunk)
+            continue
+
+        for (number, _), row in zip(chunk, rows):
+            if isinstance(row, dict):
+                yield number, row
+
+            else:
+                yield number, ValueError("Expected a JSON object.")
+
+
+def parse_ndjson_lines(chunk):
+    # Parse numbered lines one at a time
+    for number, line in chunk:
+        try:
+            row = json.loads(line)
+
+        except ValueError:
+            yield number, ValueError("Invalid JSON.")
+            continue
+
+        if not isinstance(row, dict):
+            yield number, ValueError("Expected a JSON object.")
+            continue
+
+        yield number, row
+
+
+def parse_csv(lines):
+    # Yield the line number and row of each line after the header. A
+    # malformed file stops the import.
+    reader = csv.DictReader(decode_lines(lines))
+
+    try:
+        for row in reader:
+            yield reader.line_num, row
+
+    except csv.Error as exc:
+        yield reader.line_num, ValueError(f"Invalid CSV: {exc}")
+
+
+def parse(lines, format):
+    # Parse the lines in the given format
+    return parse_csv(lines) if format == "csv" else parse_ndjson(lines)
+
+
+def adapt_utc_datetime(value):
+    # Format an aware date the way SQLite and MySQL store it. This returns
+    # the same as adapt_datetimefield_value() if the database time zone is
+    # UTC, but doesn't look up the settings for every value.
+    return value.astimezone(dt_timezone.utc).isoformat(" ")[:-6]
+
+
+# Importer Class
+# ==============
+class Importer:
+    # Keep the first errors only, so a file in the wrong format doesn't use
+    # up memory
+    max_errors = 100
+    max_name_length = Task._meta.get_field("name").max_length
+
+    def __init__(self, user, batch_size=10000, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = {"todo_lists": 0, "tasks": 0, "errors": 0}
+        self.errors = []
+
+        # Rows which weren't written yet
+        self.pending_todo_lists = {}
+        self.pending_tasks = {}
+
+        # The names of the todo lists by their ID in the file and the IDs of
+        # the todo lists which were written by their name. These only grow
+        # with the number of todo lists, not tasks.
+        self.todo_list_names = {}
+        self.todo_list_ids = {}
+
+        # Backends like MySQL match conflicts on any unique constraint and
+        # don't accept a target
+        self.conflict_target = connection.features.supports_update_conflicts_with_target
+
+        # Look up the date adapter of the backend once, since every access
+        # to the connection goes through a thread local. Dates which are
+        # stored as text in UTC are formatted directly.
+        self.utc_text = (
+            connection.vendor in ("sqlite", "mysql") 
+            and connection.timezone_name == "UTC"
+        )
+
+        if self.utc_text:
+            self.adapt_datetime = adapt_utc_datetime
+
+        else:
+            self.adapt_datetime = connection.ops.adapt_datetimefield_value
+
+    def run(self, rows):
+        # Import the parsed rows in batches, then update the counters of the
+        # user and return the statistics
+        for number, row in rows:
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+
+                self.add(row)
+
+            except ValueError as exc:
+                self.add_error(number, exc)
+
+        self.flush_todo_lists()
+        self.flush_tasks()
+        UserSummary.recount([self.user.pk])
+        return dict(self.stats, error_details=self.errors)
+
+    def add(self, row):
+        # Queue a row for writing. Raise ValueError if it is invalid.
+        kind = row.get("type")
+
+        if kind == "todo_list":
+            self.add_todo_list(row)
+
+        elif kind == "task":
+            self.add_task(row)
+
+        else:
+            raise ValueError(f'"{kind}" is not a valid type.')
+
+    def add_todo_list(self, row):
+        # Queue the todo list. Existing todo lists with the same name are
+        # reused.
+        name = self.clean_name(row)
+        self.todo_list_names[str(row.get("id", ""))] = name
+        self.pending_todo_lists[name] = TodoList(user=self.user, name=name)
+
+        if len(self.pending_todo_lists) >= self.batch_size:
+            self.flush_todo_lists()
+
+    def add_task(self, row):
+        # Look up the todo list of the task by its ID in the file
+        name = self.clean_name(row)
+        todo_list_name = self.todo_list_names.get(str(row.get("todo_list", "")))
+
+        if todo_list_name is None:
+            raise ValueError("Unknown todo list.")
+
+        # Parse the due date. fromisoformat() is much faster and handles the
+        # dates written by the export.
+        value = str(row.get("due_date", ""))
+
+        try:
+            due_date = datetime.fromisoformat(value)
+
+        except ValueError:
+            due_date = parse_datetime(value)
+
+            if due_date is None:
+                raise ValueError("Invalid due date.")
+
+        # Convert the due date to the format of the database. A valid date
+        # in the format of the export only needs another separator when the
+        # database stores text in UTC.
+        if self.utc_text and UTC_DATE_RE.fullmatch(value):
+            due_date = f"{value[:10]} {value[11:19]}"
+
+        else:
+            if due_date.tzinfo is None:
+                due_date = timezone.make_aware(due_date)
+
+            due_date = self.adapt_datetime(due_date)
+
+        # Queue the task. Existing tasks with the same name in the same todo
+        # list are updated. The todo list may still be queued itself, so
+        # its ID is looked up when the tasks are written.
+        self.pending_tasks[todo_list_name, name] = due_date
+
+        if len(self.pending_tasks) >= self.batch_size:
+            self.flush_tasks()
+
+    def clean_name(self, row):
+        # Return the name of the row. Raise ValueError if it is invalid.
+        name = row.get("name")
+
+        if not isinstance(name, str) or not name:
+            raise ValueError("Name is required.")
+
+        if len(name) > self.max_name_length:
+            raise ValueError(
+                f"Name is longer than {self.max_name_length} characters.")
+
+        return name
+
+    def add_error(self, number, exc):
+        # Count the error and remember the first ones
+        self.stats["errors"] += 1
+
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": number, "error": str(exc)})
+
+    def flush_todo_lists(self):
+        # Insert the queued todo lists, or touch those which already exist
+        if not self.pending_todo_lists:
+            return
+
+        names = list(self.pending_todo_lists)
+
+        with transaction.atomic():
+            TodoList.objects.bulk_create(
+                self.pending_todo_lists.values(),
+                update_conflicts=True,
+                unique_fields=["user", "name"] if self.conflict_target else None,
+                update_fields=["updated_at"]
+            )
+
+        # Not every backend returns the primary keys of upserted rows, so
+        # fetch them in one query
+        self.todo_list_ids.update(
+            self.user.todo_lists.filter(name__in=names).values_list("name", "pk")
+        )
+        self.stats["todo_lists"] += len(names)
+        self.pending_todo_lists.clear()
+
+    def flush_tasks(self):
+        # Insert the queued tasks, or update those which already exist. This
+        # runs multi-row upserts directly instead of going through
+        # bulk_create(), which spends most of its time building and
+        # preparing model instances. Rows are not sent one at a time with
+        # executemany() because SQLite flushes the full-text index after
+        # every statement.
+        if not self.pending_tasks:
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Write the queued todo lists first, in one batch instead of one
+            # at a time when their first task is added, and in the same
+            # transaction, so each batch is committed once
+            self.flush_todo_lists()
+            todo_list_ids = self.todo_list_ids
+            user_id = self.user.pk
+            now = self.adapt_datetime(timezone.now())
+            rows = [
+                (todo_list_ids[todo_list_name], user_id, name, due_date, now)
+                for (todo_list_name, name), due_date in self.pending_tasks.items()
+            ]
+
+            # Send as many rows per statement as the backend accepts. Django
+            # assumes the old limit of 999 parameters for SQLite, but newer
+            # versions accept far more, and fewer statements are faster.
+            max_params = connection.features.max_query_params
+
+            if connection.vendor == "sqlite" and hasattr(connection.connection, "getlimit"):
+                max_params = connection.connection.getlimit(
+                    sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+
+            rows_per_query = max_params // 5 if max_params else len(rows)
+
+            for i in range(0, len(rows), rows_per_query):
+                chunk = rows[i:i + rows_per_query]
+                cursor.execute(
+                    self.task_upsert_sql(len(chunk)),
+                    list(chain.from_iterable(chunk))
+                )
+
+        self.stats["tasks"] += len(rows)
+        self.pending_tasks.clear()
+
+        # Report the progress
+        if self.progress is not None:
+            self.progress(self.stats)
+
+    def task_upsert_sql(self, count):
+        # Return the statement which inserts the given number of tasks or
+        # updates the tasks with the same name in the same todo list
+        table = Task._meta.db_table
+        sql = (
+            f"INSERT INTO {table} "
+            f"(todo_list_id, owner_id, name, due_date, updated_at) VALUES "
+            f"{', '.join(['(%s, %s, %s, %s, %s)'] * count)} "
+        )
+
+        if connection.vendor == "mysql":
+            return sql + (
+                "ON DUPLICATE KEY UPDATE "
+                "due_date = VALUES(due_date), updated_at = VALUES(updated_at)"
+            )
+        
+        return sql + (
+            "ON CONFLICT (todo_list_id, name) DO UPDATE SET "
+            "due_date = excluded.due_date, updated_at = excluded.updated_at"
+        )
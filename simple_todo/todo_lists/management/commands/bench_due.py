@@ -0,0 +1,125 @@
+import statistics
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from todo_lists.benchmark import benchmark_user
+from todo_lists.due import WINDOWS, due_window
+from todo_lists.importer import Importer
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Measures the latency of the due date window queries for a user with "
+        "many tasks and fails if any of them is slower than the budget. The "
+        "generated data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=100000,
+            help="Number of tasks of the user, due over two years around now."
+        )
+        parser.add_argument(
+            "--todo-lists",
+            type=int,
+            default=100,
+            help="Number of todo lists the tasks are spread over."
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=10,
+            help="Number of tasks fetched by each query."
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of queries to measure for each window."
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=20,
+            help="Most milliseconds the 99th percentile of a query may take."
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_user() as user:
+            self.stdout.write(f"Generating {options['tasks']} tasks...")
+            self.generate(user, options)
+            todo_list = user.todo_lists.order_by("name").first()
+            now = timezone.now()
+            slow = []
+
+            # Fetch the first page of each window across all todo lists, then
+            # within one todo list, and a page from the middle of the
+            # overdue tasks
+            queries = {
+                name: user.tasks.due_between(*due_window(window, now))
+                for window, name in WINDOWS
+            }
+            queries[f"This Week in {todo_list.name}"] = (
+                todo_list.tasks.due_between(*due_window("week", now)))
+            queries["Overdue after 6 months"] = (
+                user.tasks.due_between(*due_window("overdue", now))
+                .due_after(now - timedelta(days=182), 0)
+            )
+
+            for name, queryset in queries.items():
+                durations = self.measure(
+                    queryset.select_related("todo_list"),
+                    options["page_size"],
+                    options["requests"]
+                )
+                percentiles = statistics.quantiles(durations, n=100)
+                self.stdout.write(
+                    f"{name}: p50 {percentiles[49] * 1000:.2f} ms, "
+                    f"p99 {percentiles[98] * 1000:.2f} ms"
+                )
+
+                if percentiles[98] * 1000 > options["budget"]:
+                    slow.append(name)
+
+        if slow:
+            raise CommandError(
+                f"Over the budget of {options['budget']} ms: {', '.join(slow)}")
+
+    def generate(self, user, options):
+        # Import the tasks, spread evenly over the todo lists and over the
+        # year before and after now
+        start = timezone.now() - timedelta(days=365)
+        step = timedelta(days=730) / options["tasks"]
+        rows = [
+            {"type": "todo_list", "id": i, "name": f"List {i:05d}"}
+            for i in range(options["todo_lists"])
+        ]
+        rows += [
+            {
+                "type": "task",
+                "todo_list": i % options["todo_lists"],
+                "name": f"Task {i:06d}",
+                "due_date": (start + step * i).astimezone(dt_timezone.utc)
+                .isoformat().replace("+00:00", "Z")
+            }
+            for i in range(options["tasks"])
+        ]
+        Importer(user).run(enumerate(rows, 1))
+
+    def measure(self, queryset, page_size, count):
+        # Return the time in seconds which each query for a page took
+        durations = []
+
+        for _ in range(count):
+            start = time.perf_counter()
+            list(queryset[:page_size])
+            durations.append(time.perf_counter() - start)
+
+        return durations
@@ -0,0 +1,135 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django_htmx.middleware import HtmxDetails
+
+from todo_lists.benchmark import benchmark_user
+from todo_lists.models import Task, TodoList, UserSummary
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Measures how long the HTMX partials of the todo lists and tasks "
+        "take to render with and without their cached fragments. The "
+        "generated data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todo-lists",
+            type=int,
+            default=100,
+            help="Number of todo lists to create."
+        )
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=100,
+            help="Number of tasks in the rendered todo list."
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of renders to measure for each partial."
+        )
+
+    def handle(self, *args, **options):
+        # The cache tag uses the "template_fragments" cache if there is one
+        try:
+            cache = caches["template_fragments"]
+
+        except InvalidCacheBackendError:
+            cache = caches["default"]
+
+        self.stdout.write(f"Cache backend: {type(cache).__name__}")
+
+        with benchmark_user() as user:
+            todo_list = self.generate(user, options)
+
+            # Bumping a version stamp invalidates the cached fragment like a
+            # write does
+            partials = {
+                "todo lists": (
+                    reverse("todo-lists"),
+                    lambda: UserSummary.bump(user.pk)
+                ),
+                "tasks": (
+                    reverse("todo-list", args=[todo_list.pk]),
+                    lambda: TodoList.bump({todo_list.pk: 0})
+                )
+            }
+
+            for name, (path, invalidate) in partials.items():
+                self.report(
+                    f"{name}, cold",
+                    self.measure(user, path, options["requests"], invalidate)
+                )
+                self.report(
+                    f"{name}, warm",
+                    self.measure(user, path, options["requests"])
+                )
+
+    def generate(self, user, options):
+        # Create the todo lists and the tasks of the first one, and return
+        # the first todo list
+        todo_lists = TodoList.objects.bulk_create(
+            [
+                TodoList(user=user, name=f"List {i:05d}")
+                for i in range(options["todo_lists"])
+            ]
+        )
+        now = timezone.now()
+        Task.objects.bulk_create(
+            [
+                Task(
+                    todo_list=todo_lists[0],
+                    owner=user,
+                    name=f"Task {i:05d}",
+                    due_date=now + timedelta(hours=i)
+                )
+                for i in range(options["tasks"])
+            ],
+            batch_size=1000
+        )
+        UserSummary.recount([user.pk])
+        return todo_lists[0]
+
+    def measure(self, user, path, count, invalidate=None):
+        # Return the time in seconds which each request for the first page
+        # of the partial took. The view is called without the middleware,
+        # which is the same for every request.
+        factory = RequestFactory(headers={"HX-Request": "true"})
+        match = resolve(path)
+        durations = []
+
+        for _ in range(count):
+            if invalidate is not None:
+                invalidate()
+
+            request = factory.get(path)
+            request.user = user
+            request.htmx = HtmxDetails(request)
+            start = time.perf_counter()
+            response = match.func(request, *match.args, **match.kwargs)
+            response.render()
+            durations.append(time.perf_counter() - start)
+
+        return durations
+
+    def report(self, name, durations):
+        # Print the median and 95th percentile render time
+        percentiles = statistics.quantiles(durations, n=100)
+        self.stdout.write(
+            f"{name}: p50 {percentiles[49] * 1000:.2f} ms, "
+            f"p95 {percentiles[94] * 1000:.2f} ms"
+        )
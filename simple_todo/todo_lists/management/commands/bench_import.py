@@ -0,0 +1,94 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from todo_lists.benchmark import benchmark_user
+from todo_lists.importer import Importer, parse
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Measures how many tasks per second the importer writes into the "
+        "configured database. The imported data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks", 
+            type=int, 
+            default=200000, 
+            help="Number of tasks to import."
+        )
+        parser.add_argument(
+            "--tasks-per-list", 
+            type=int, 
+            default=1000, 
+            help="Number of tasks in each todo list."
+        )
+        parser.add_argument(
+            "--batch-size", 
+            type=int, 
+            default=10000, 
+            help="Number of rows to write per query."
+        )
+        parser.add_argument(
+            "--input", 
+            choices=["ndjson", "csv"], 
+            default="ndjson", 
+            help="Format of the generated file."
+        )
+
+    def handle(self, *args, **options):
+        # Generate the file in memory first, so only parsing and writing are
+        # measured
+        lines = list(self.generate(options))
+
+        with benchmark_user() as user:
+            importer = Importer(user, batch_size=options["batch_size"])
+            start = time.perf_counter()
+            stats = importer.run(parse(iter(lines), options["input"]))
+            duration = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Imported {stats['tasks']} tasks in {duration:.2f} s "
+            f"({stats['tasks'] / duration:.0f} tasks/s) with "
+            f"{stats['errors']} errors."
+        )
+
+    def generate(self, options):
+        # Yield the lines of an export with the given number of tasks
+        rows = []
+        todo_list = 0
+
+        for i in range(options["tasks"]):
+            if i % options["tasks_per_list"] == 0:
+                todo_list += 1
+                rows.append({
+                    "type": "todo_list", 
+                    "id": todo_list, 
+                    "name": f"List {todo_list}"
+                })
+
+            rows.append({
+                "type": "task",
+                "id": i + 1,
+                "todo_list": todo_list,
+                "name": f"Task {i}",
+                "due_date": f"2030-01-{i % 28 + 1:02d}T09:00:00Z"
+            })
+
+        if options["input"] == "csv":
+            yield b"type,id,todo_list,name,due_date\n"
+
+            for row in rows:
+                yield (
+                    f"{row['type']},{row['id']},{row.get('todo_list', '')},"
+                    f"{row['name']},{row.get('due_date', '')}\n"
+                ).encode()
+
+        else:
+            for row in rows:
+                yield json.dumps(row).encode() + b"\n"
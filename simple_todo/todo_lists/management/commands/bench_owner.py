@@ -0,0 +1,127 @@
+import statistics
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo_lists.benchmark import benchmark_users
+from todo_lists.importer import Importer
+from todo_lists.models import Task
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Compares the latency of task queries scoped by the denormalized "
+        "owner with the join through the todo list they replaced. The "
+        "generated data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1000,
+            help="Number of users to create."
+        )
+        parser.add_argument(
+            "--todo-lists",
+            type=int,
+            default=10,
+            help="Number of todo lists of each user."
+        )
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=100,
+            help="Number of tasks in each todo list."
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=10,
+            help="Number of tasks fetched by each listing."
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Number of queries to measure for each variant."
+        )
+
+    def handle(self, *args, **options):
+        total = options["users"] * options["todo_lists"] * options["tasks"]
+        self.stdout.write(f"Generating {total} tasks...")
+
+        with benchmark_users(options["users"]) as users:
+            for user in users:
+                self.generate(user, options)
+
+            # Query the tasks of a user in the middle of the table, like the
+            # task views and viewset do now and did before
+            user = users[len(users) // 2]
+            pk = user.tasks.order_by("name", "id").values_list("pk", flat=True)[0]
+            page_size = options["page_size"]
+            queries = {
+                "First page": (
+                    lambda: list(user.tasks.order_by("name", "id")[:page_size]),
+                    lambda: list(
+                        Task.objects.filter(todo_list__user=user)
+                        .order_by("name", "id")[:page_size]
+                    )
+                ),
+                "Lookup by ID": (
+                    lambda: user.tasks.get(pk=pk),
+                    lambda: Task.objects.get(pk=pk, todo_list__user=user)
+                ),
+                "Count": (
+                    lambda: user.tasks.count(),
+                    lambda: Task.objects.filter(todo_list__user=user).count()
+                )
+            }
+
+            for name, (owner, join) in queries.items():
+                for variant, query in [("owner", owner), ("join", join)]:
+                    self.report(
+                        f"{name}, {variant}", 
+                        self.measure(query, options["requests"])
+                    )
+
+    def generate(self, user, options):
+        # Import the todo lists and tasks of a user
+        due_date = timezone.now().astimezone(dt_timezone.utc)
+        rows = [
+            {"type": "todo_list", "id": i, "name": f"List {i:03d}"}
+            for i in range(options["todo_lists"])
+        ]
+        rows += [
+            {
+                "type": "task",
+                "todo_list": i % options["todo_lists"],
+                "name": f"Task {i:05d}",
+                "due_date": (due_date + timedelta(hours=i)).isoformat()
+            }
+            for i in range(options["todo_lists"] * options["tasks"])
+        ]
+        Importer(user).run(enumerate(rows, 1))
+
+    def measure(self, query, count):
+        # Return the time in seconds which each query took
+        durations = []
+
+        for _ in range(count):
+            start = time.perf_counter()
+            query()
+            durations.append(time.perf_counter() - start)
+
+        return durations
+
+    def report(self, name, durations):
+        # Print the median and 99th percentile latency
+        percentiles = statistics.quantiles(durations, n=100)
+        self.stdout.write(
+            f"{name}: p50 {percentiles[49] * 1000:.2f} ms, "
+            f"p99 {percentiles[98] * 1000:.2f} ms"
+        )
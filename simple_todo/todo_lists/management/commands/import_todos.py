@@ -0,0 +1,72 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo_lists.importer import FORMATS, Importer, parse
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = "Imports todo lists and tasks from an NDJSON or CSV export."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "username", 
+            help="Import into the account of this user."
+        )
+        parser.add_argument(
+            "path", 
+            help='File to import, or "-" to read from standard input.'
+        )
+        parser.add_argument(
+            "--input", 
+            choices=FORMATS, 
+            help="Format of the file (guessed from its extension by default)."
+        )
+        parser.add_argument(
+            "--batch-size", 
+            type=int, 
+            default=10000, 
+            help="Number of rows to write per query."
+        )
+
+    def handle(self, *args, **options):
+        # Look up the user
+        try:
+            user = User.objects.get(username=options["username"])
+
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist.')
+        
+        # Guess the format from the file extension
+        path = options["path"]
+        format = options["input"] or (
+            "csv" if path.lower().endswith(".csv") else "ndjson")
+        
+        # Import the file and report the progress after each batch
+        importer = Importer(
+            user, 
+            batch_size=options["batch_size"], 
+            progress=lambda stats: self.stdout.write(
+                f"Imported {stats['todo_lists']} todo lists and "
+                f"{stats['tasks']} tasks..."
+            )
+        )
+
+        if path == "-":
+            stats = importer.run(parse(sys.stdin.buffer, format))
+
+        else:
+            with open(path, "rb") as file:
+                stats = importer.run(parse(file, format))
+
+        # Report the errors
+        for error in stats["error_details"]:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+
+        self.stdout.write(
+            f"Imported {stats['todo_lists']} todo lists and {stats['tasks']} "
+            f"tasks with {stats['errors']} errors."
+        )
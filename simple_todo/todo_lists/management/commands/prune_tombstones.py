@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo_lists.models import Tombstone
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = "Deletes tombstones which are older than the sync token lifetime."
+
+    def handle(self, *args, **options):
+        # Delete expired tombstones
+        cutoff = timezone.now() - settings.SYNC_TOKEN_LIFETIME
+        count, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {count} expired tombstones.")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from todo_lists.purge import purge_accounts
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Deletes the accounts whose deletion was requested. Run it on a "
+        "schedule, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-seconds", 
+            type=float, 
+            help="Stop after this many seconds and leave the rest for the next run."
+        )
+
+    def handle(self, *args, **options):
+        # Delete the remaining data of deleted accounts
+        count = purge_accounts(options["max_seconds"])
+        self.stdout.write(f"Purged {count} deleted accounts.")
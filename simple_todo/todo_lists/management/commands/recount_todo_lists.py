@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from todo_lists.models import UserSummary
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = "Recomputes the cached todo list and task counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids", 
+            nargs="*", 
+            type=int, 
+            help="Only recount the todo lists of these users."
+        )
+
+    def handle(self, *args, **options):
+        # Recount the todo lists and tasks of the given users or everyone
+        UserSummary.recount(options["user_ids"] or None)
+        self.stdout.write("Recounted todo lists and tasks.")
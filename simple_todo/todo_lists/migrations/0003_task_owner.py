@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_task_owner(apps, schema_editor):
+    # Copy the owner of each todo list onto its tasks
+    Task = apps.get_model("todo_lists", "Task")
+    TodoList = apps.get_model("todo_lists", "TodoList")
+    Task.objects.using(schema_editor.connection.alias).update(
+        owner=Subquery(
+            TodoList.objects.filter(pk=OuterRef("todo_list")).values("user")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0002_task_todo_list_due_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='owner',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_task_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='owner',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'name'], name='owner_name'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0005_user_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
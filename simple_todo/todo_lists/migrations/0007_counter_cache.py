@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    # Count the tasks of each todo list and the todo lists of each user
+    db = schema_editor.connection.alias
+    Task = apps.get_model("todo_lists", "Task")
+    TodoList = apps.get_model("todo_lists", "TodoList")
+    UserSummary = apps.get_model("todo_lists", "UserSummary")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    TodoList.objects.using(db).update(
+        task_count=Coalesce(
+            Subquery(
+                Task.objects.filter(todo_list=OuterRef("pk"))
+                .order_by()
+                .values("todo_list")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0
+        )
+    )
+    UserSummary.objects.using(db).bulk_create(
+        [
+            UserSummary(user_id=pk) 
+            for pk in User.objects.using(db).values_list("pk", flat=True)
+        ],
+        ignore_conflicts=True
+    )
+    UserSummary.objects.using(db).update(
+        todo_list_count=Coalesce(
+            Subquery(
+                TodoList.objects.filter(user=OuterRef("user"))
+                .order_by()
+                .values("user")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0006_todo_list_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='usersummary',
+            name='todo_list_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:20
+
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    # Create the full-text indexes over todo list and task names
+    from todo_lists.search import install_index
+    install_index(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    # Drop the full-text indexes
+    from todo_lists.search import uninstall_index
+    uninstall_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0007_counter_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
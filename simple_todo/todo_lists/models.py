@@ -1,5 +1,66 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Case, 
+    Count, 
+    F, 
+    OuterRef, 
+    Q, 
+    Subquery, 
+    Value, 
+    When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+# QuerySet Classes
+# ================
+class TodoListQuerySet(models.QuerySet):
+    def with_stats(self, now):
+        # Annotate each todo list with the number of its overdue tasks and
+        # the due date of its next task which isn't overdue. Each subquery
+        # is a range scan of the (todo_list, due_date) index.
+        tasks = Task.objects.filter(todo_list=OuterRef("pk")).order_by()
+        return self.annotate(
+            overdue_count=Coalesce(
+                Subquery(
+                    tasks.filter(due_date__lt=now)
+                    .values("todo_list")
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0
+            ),
+            next_due=Subquery(
+                tasks.filter(due_date__gte=now)
+                .order_by("due_date")
+                .values("due_date")[:1]
+            )
+        )
+
+
+class TaskQuerySet(models.QuerySet):
+    def due_between(self, start=None, end=None):
+        # Return the tasks due from start (inclusive) to end (exclusive) in
+        # date order. Either bound may be left open. The range scan is served
+        # by the (owner, due_date) and (todo_list, due_date) indexes.
+        queryset = self
+
+        if start is not None:
+            queryset = queryset.filter(due_date__gte=start)
+
+        if end is not None:
+            queryset = queryset.filter(due_date__lt=end)
+
+        return queryset.order_by("due_date", "id")
+    
+    def due_after(self, due_date, pk):
+        # Continue a listing in date order after the given task. The
+        # separate lower bound lets the index seek to the position instead
+        # of scanning the window from its start.
+        return self.filter(due_date__gte=due_date).filter(
+            Q(due_date__gt=due_date) | Q(pk__gt=pk))
 
 
 # Data Model Classes
@@ -7,6 +68,14 @@ from django.db import models
 class TodoList(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="todo_lists")
     name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    task_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = TodoListQuerySet.as_manager()
+
+    # Fields which are only changed with F() expressions by bump()
+    counter_fields = ("version", "task_count")
 
     class Meta:
         constraints = [
@@ -18,15 +87,95 @@ class TodoList(models.Model):
                 name="unique_user_name"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=[
+                    "user",
+                    "updated_at"
+                ],
+                name="user_updated_at"
+            )
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user})"
+    
+    @classmethod
+    def bump(cls, task_deltas):
+        # Change the version stamp of the tasks of the given todo lists and
+        # add the change in their number of tasks to their task counts
+        task_deltas = {
+            pk: delta for pk, delta in task_deltas.items() if pk is not None
+        }
+        cls.objects.filter(pk__in=task_deltas).update(
+            version=F("version") + 1,
+            task_count=F("task_count") + Case(
+                *[
+                    When(pk=pk, then=Value(delta)) 
+                    for pk, delta in task_deltas.items() if delta
+                ],
+                default=Value(0)
+            )
+        )
+
+    def save(self, *args, **kwargs):
+        # Never write back counters which were loaded before they were
+        # bumped. Every other field is saved, including updated_at, which
+        # clients sync from.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+
+        with transaction.atomic():
+            # Remember the previous owner if the todo list already exists
+            adding = self._state.adding
+            old_user_id = None if adding else (
+                TodoList.objects.filter(pk=self.pk)
+                .values_list("user_id", flat=True)
+                .first()
+            )
+            super().save(*args, **kwargs)
+
+            # Move the tasks along with the todo list if it was reassigned
+            if old_user_id is not None and old_user_id != self.user_id:
+                self.tasks.update(
+                    owner_id=self.user_id,
+                    updated_at=timezone.now()
+                )
+                UserSummary.bump(old_user_id, todo_lists=-1)
+                UserSummary.bump(self.user_id, todo_lists=1)
+
+            else:
+                UserSummary.bump(self.user_id, todo_lists=int(adding))
+
+    def delete(self, *args, **kwargs):
+        # Leave a tombstone behind for clients which sync changes
+        with transaction.atomic():
+            Tombstone.objects.create(
+                user_id=self.user_id,
+                kind=Tombstone.TODO_LIST,
+                object_id=self.pk
+            )
+            UserSummary.bump(self.user_id, todo_lists=-1)
+            return super().delete(*args, **kwargs)
 
 
 class Task(models.Model):
     todo_list = models.ForeignKey(TodoList, on_delete=models.CASCADE, related_name="tasks")
+    owner = models.ForeignKey(
+        User, 
+        on_delete=models.CASCADE, 
+        related_name="tasks", 
+        editable=False, 
+        db_index=False
+    )
     name = models.CharField(max_length=64)
     due_date = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TaskQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -38,6 +187,216 @@ class Task(models.Model):
                 name="unique_todo_list_name"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=[
+                    "todo_list",
+                    "due_date"
+                ],
+                name="todo_list_due_date"
+            ),
+            models.Index(
+                fields=[
+                    "owner",
+                    "due_date"
+                ],
+                name="owner_due_date"
+            ),
+            models.Index(
+                fields=[
+                    "owner",
+                    "name"
+                ],
+                name="owner_name"
+            ),
+            models.Index(
+                fields=[
+                    "owner",
+                    "updated_at"
+                ],
+                name="owner_updated_at"
+            )
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.todo_list})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember which todo list the task was loaded from
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_todo_list_id = instance.__dict__.get("todo_list_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Denormalize the owner of the todo list onto the task
+        self.owner_id = self.todo_list.user_id
+
+        with transaction.atomic():
+            # Count the task in the todo list it was added or moved to
+            adding = self._state.adding
+            old_todo_list_id = getattr(
+                self, "_loaded_todo_list_id", self.todo_list_id)
+            super().save(*args, **kwargs)
+
+            if adding:
+                TodoList.bump({self.todo_list_id: 1})
+
+            elif old_todo_list_id != self.todo_list_id:
+                TodoList.bump({old_todo_list_id: -1, self.todo_list_id: 1})
+
+            else:
+                TodoList.bump({self.todo_list_id: 0})
+
+            UserSummary.bump(self.owner_id)
+            self._loaded_todo_list_id = self.todo_list_id
+
+    def delete(self, *args, **kwargs):
+        # Leave a tombstone behind for clients which sync changes
+        with transaction.atomic():
+            Tombstone.objects.create(
+                user_id=self.owner_id,
+                kind=Tombstone.TASK,
+                object_id=self.pk
+            )
+            TodoList.bump({self.todo_list_id: -1})
+            UserSummary.bump(self.owner_id)
+            return super().delete(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    TODO_LIST = "todo_list"
+    TASK = "task"
+    KIND_CHOICES = [
+        (TODO_LIST, "Todo List"),
+        (TASK, "Task")
+    ]
+
+    user = models.ForeignKey(
+        User, 
+        on_delete=models.CASCADE, 
+        related_name="tombstones", 
+        db_index=False
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=[
+                    "user",
+                    "deleted_at"
+                ],
+                name="user_deleted_at"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} ({self.user})"
+
+
+class UserSummary(models.Model):
+    user = models.OneToOneField(
+        User, 
+        on_delete=models.CASCADE, 
+        primary_key=True, 
+        related_name="summary"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    todo_list_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "user summaries"
+
+    def __str__(self):
+        return f"{self.user} (version {self.version})"
+    
+    @classmethod
+    def bump(cls, user_id, todo_lists=0):
+        # Change the version stamp of the todo lists and tasks of a user and
+        # add the change in their number of todo lists to their todo list
+        # count. The row is created on the first change.
+        for _ in range(2):
+            if cls.objects.filter(user_id=user_id).update(
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+                todo_list_count=F("todo_list_count") + todo_lists
+            ):
+                return
+            
+            cls.objects.get_or_create(user_id=user_id)
+
+    @classmethod
+    def recount(cls, user_ids=None):
+        # Recompute the counters of the given users (all users by default)
+        # from scratch, e.g. after rows were deleted in bulk by the admin
+        users = User.objects.all()
+
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+
+        with transaction.atomic():
+            TodoList.objects.filter(user__in=users).update(
+                version=F("version") + 1,
+                task_count=Coalesce(
+                    Subquery(
+                        Task.objects.filter(todo_list=OuterRef("pk"))
+                        .order_by()
+                        .values("todo_list")
+                        .annotate(count=Count("pk"))
+                        .values("count")
+                    ),
+                    0
+                )
+            )
+            cls.objects.bulk_create(
+                [cls(user=user) for user in users.only("pk")],
+                ignore_conflicts=True
+            )
+            cls.objects.filter(user__in=users).update(
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+                todo_list_count=Coalesce(
+                    Subquery(
+                        TodoList.objects.filter(user=OuterRef("user"))
+                        .order_by()
+                        .values("user")
+                        .annotate(count=Count("pk"))
+                        .values("count")
+                    ),
+                    0
+                )
+            )
+
+    @classmethod
+    def for_user(cls, user_id):
+        # Return the summary of a user, which is empty if they never changed
+        # anything
+        return (
+            cls.objects.filter(user_id=user_id).first() or 
+            cls(user_id=user_id)
+        )
+    
+    @classmethod
+    async def afor_user(cls, user_id):
+        # Async counterpart of for_user()
+        return (
+            await cls.objects.filter(user_id=user_id).afirst() or 
+            cls(user_id=user_id)
+        )
+
+
+class AccountDeletion(models.Model):
+    user = models.OneToOneField(
+        User, 
+        on_delete=models.CASCADE, 
+        primary_key=True, 
+        related_name="deletion"
+    )
+    requested_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} (requested {self.requested_at})"
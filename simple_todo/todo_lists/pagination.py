@@ -0,0 +1,19 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+
+# Paginator Classes
+# =================
+class CountedPaginator(Paginator):
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        # Use the count from the counter cache instead of running a count
+        # query if it was given
+        if self.known_count is not None:
+            return self.known_count
+        
+        return super().count
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+
+from .models import AccountDeletion, Task, Tombstone, TodoList
+
+
+# Rows deleted per transaction. Each chunk holds the write lock only briefly,
+# so other requests can write in between.
+CHUNK_SIZE = 5000
+
+
+# Functions
+# =========
+def delete_in_chunks(queryset, chunk_size=CHUNK_SIZE, on_chunk=None, deadline=None):
+    # Delete the rows of the queryset in chunks and return their number. A
+    # chunk is deleted with a single statement if no signals are attached and
+    # nothing cascades, otherwise only that chunk is loaded to emit them.
+    # Stop early once the time.monotonic() deadline has passed.
+    model = queryset.model
+    pks = queryset.order_by().values_list("pk", flat=True)
+    count = 0
+
+    while not expired(deadline) and (chunk := list(pks[:chunk_size])):
+        with transaction.atomic():
+            rows = model._base_manager.filter(pk__in=chunk)
+            deleted = rows.delete()[1].get(model._meta.label, 0)
+
+            if on_chunk is not None:
+                on_chunk(deleted)
+
+        count += deleted
+
+    return count
+
+
+def delete_todo_list(todo_list, chunk_size=CHUNK_SIZE):
+    # Delete the tasks of a todo list in chunks, keeping its task count
+    # current, then delete the todo list itself
+    delete_in_chunks(
+        todo_list.tasks.all(),
+        chunk_size,
+        lambda deleted: TodoList.bump({todo_list.pk: -deleted})
+    )
+    todo_list.delete()
+
+
+def delete_account(user_id, chunk_size=CHUNK_SIZE, deadline=None):
+    # Delete the tasks, tombstones and todo lists of a user in chunks, then
+    # the user along with the rest of their data. Return whether the account
+    # was deleted before the deadline. Otherwise the rest of it is deleted
+    # by the next call.
+    for model, owner in [
+        (Task, "owner_id"),
+        (Tombstone, "user_id"),
+        (TodoList, "user_id")
+    ]:
+        delete_in_chunks(
+            model.objects.filter(**{owner: user_id}), 
+            chunk_size, 
+            deadline=deadline
+        )
+
+    if expired(deadline):
+        return False
+
+    User.objects.filter(pk=user_id).delete()
+    return True
+
+
+def purge_accounts(max_seconds=None):
+    # Delete the accounts whose deletion was requested and return their
+    # number. Stop between chunks after the given number of seconds, so the
+    # purge fits into the time limit of a scheduled job.
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    user_ids = list(AccountDeletion.objects.values_list("user_id", flat=True))
+    count = 0
+
+    for user_id in user_ids:
+        if not delete_account(user_id, deadline=deadline):
+            break
+
+        count += 1
+
+    return count
+
+
+def expired(deadline):
+    # Return whether the time.monotonic() deadline has passed
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def request_account_deletion(user):
+    # Deactivate the account right away, so it can't be used anymore, and
+    # queue it for the scheduled purge, which deletes it. Servers which keep
+    # running after the response also start deleting it in a background
+    # thread once the request is committed. Serverless hosts may stop that
+    # thread at any point, which is safe since every chunk is committed on
+    # its own.
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        AccountDeletion.objects.get_or_create(user_id=user.pk)
+
+        if settings.ACCOUNT_PURGE_THREAD:
+            transaction.on_commit(
+                lambda: threading.Thread(
+                    target=run_account_deletion,
+                    args=(user.pk,),
+                    daemon=True
+                ).start()
+            )
+
+
+def run_account_deletion(user_id):
+    # Delete the account on the connections of the current thread, which
+    # have to be closed when it is done
+    try:
+        delete_account(user_id)
+
+    finally:
+        connections.close_all()
@@ -0,0 +1,285 @@
+import base64
+import binascii
+import json
+import re
+
+from django.db import connection
+
+from .models import Task, TodoList
+
+
+# Indexed tables: (kind, model, owner column, extra columns). Results are
+# ordered by kind after rank, so "task" sorts before "todo_list".
+INDEXES = [
+    ("task", Task, "owner_id", ["todo_list_id"]),
+    ("todo_list", TodoList, "user_id", [])
+]
+
+
+# Index Functions
+# ===============
+def install_index(connection):
+    # Create the full-text indexes over the names of todo lists and tasks if
+    # they don't exist yet. This is idempotent, so it also repairs SQLite
+    # triggers which are dropped when a migration rebuilds a table.
+    with connection.cursor() as cursor:
+        for kind, model, owner, extra in INDEXES:
+            table = model._meta.db_table
+
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    """
+                    SELECT 1 FROM information_schema.statistics
+                    WHERE table_schema = DATABASE()
+                        AND table_name = %s
+                        AND index_name = %s
+                    """,
+                    [table, f"{table}_name_ft"]
+                )
+
+                if cursor.fetchone() is None:
+                    cursor.execute(
+                        f"ALTER TABLE {table} "
+                        f"ADD FULLTEXT INDEX {table}_name_ft (name)"
+                    )
+
+            elif connection.vendor == "sqlite":
+                # Keep an FTS5 table with external content in sync with
+                # triggers, which unlike signals also see bulk operations
+                # and cascading deletes
+                fts = f"{table}_fts"
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master "
+                    "WHERE type = 'trigger' AND tbl_name = %s "
+                    "AND name LIKE %s",
+                    [table, f"{fts}_%"]
+                )
+                complete = cursor.fetchone()[0] == 3
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"name, content='{table}', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_insert "
+                    f"AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO {fts} (rowid, name) "
+                    f"VALUES (new.id, new.name); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_delete "
+                    f"AFTER DELETE ON {table} BEGIN "
+                    f"INSERT INTO {fts} ({fts}, rowid, name) "
+                    f"VALUES ('delete', old.id, old.name); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_update "
+                    f"AFTER UPDATE OF name ON {table} BEGIN "
+                    f"INSERT INTO {fts} ({fts}, rowid, name) "
+                    f"VALUES ('delete', old.id, old.name); "
+                    f"INSERT INTO {fts} (rowid, name) "
+                    f"VALUES (new.id, new.name); END"
+                )
+
+                # Index the existing rows if changes could have been missed
+                if not complete:
+                    cursor.execute(
+                        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def uninstall_index(connection):
+    # Drop the full-text indexes
+    with connection.cursor() as cursor:
+        for kind, model, owner, extra in INDEXES:
+            table = model._meta.db_table
+
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    f"ALTER TABLE {table} DROP INDEX {table}_name_ft")
+
+            elif connection.vendor == "sqlite":
+                fts = f"{table}_fts"
+
+                for name in ("insert", "delete", "update"):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{name}")
+
+                cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+# Query Functions
+# ===============
+def parse_terms(q):
+    # Split the query into words. Every word must match as a prefix.
+    return re.findall(r"\w+", q)
+
+
+def full_text_query(terms):
+    # Build a query in the syntax of the full-text index of the database
+    if connection.vendor == "mysql":
+        return " ".join(f"+{term}*" for term in terms)
+
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def match_sql(model, terms):
+    # Return the SQL and parameters of a query which selects the primary keys
+    # of all rows matching the terms, or None if there is no full-text index
+    table = model._meta.db_table
+
+    if connection.vendor == "mysql":
+        return (
+            f"SELECT id FROM {table} "
+            f"WHERE MATCH (name) AGAINST (%s IN BOOLEAN MODE)",
+            [full_text_query(terms)]
+        )
+
+    elif connection.vendor == "sqlite":
+        fts = f"{table}_fts"
+        return (
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s",
+            [full_text_query(terms)]
+        )
+
+    return None
+
+
+def rank_sql(table, terms):
+    # Return the SQL and parameters of the rank of a matching row. Names
+    # equal to the query rank first, then names starting with its first
+    # word, and shorter names before longer ones within each group. Unlike
+    # the relevance scores of full-text indexes, this depends only on the
+    # row itself, so inserts by other users don't reorder the hits between
+    # pages.
+    return (
+        f"(CASE WHEN LOWER({table}.name) = LOWER(%s) THEN 2 "
+        f"WHEN LOWER({table}.name) LIKE LOWER(%s) ESCAPE '!' THEN 1 "
+        f"ELSE 0 END) * 1000 - LENGTH({table}.name)",
+        [" ".join(terms), terms[0].replace("_", "!_") + "%"]
+    )
+
+
+def encode_cursor(hit):
+    # Encode the sort key of a hit as an opaque cursor
+    key = json.dumps([hit["score"], hit["kind"], hit["id"]])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor):
+    # Decode a cursor into a sort key. Raise ValueError if it is invalid.
+    try:
+        score, kind, id = json.loads(base64.urlsafe_b64decode(cursor))
+
+    except (binascii.Error, TypeError, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+    if not (isinstance(score, int) and isinstance(kind, str) and
+        isinstance(id, int)):
+        raise ValueError("Invalid cursor.")
+
+    return score, kind, id
+
+
+def search_table(user, kind, model, owner, extra, terms, after, limit):
+    # Return the best ranked rows of one table which belong to the user and
+    # sort after the cursor. Higher scores rank higher. The full-text index
+    # only selects the matching rows.
+    table = model._meta.db_table
+    columns = ", ".join([f"{table}.id", f"{table}.name"] + [
+        f"{table}.{column}" for column in extra
+    ])
+    rank, params = rank_sql(table, terms)
+
+    if connection.vendor == "mysql":
+        sql = (
+            f"SELECT {columns}, {rank} AS score "
+            f"FROM {table} WHERE {owner} = %s "
+            f"AND MATCH (name) AGAINST (%s IN BOOLEAN MODE)"
+        )
+        params += [user.pk, full_text_query(terms)]
+
+    elif connection.vendor == "sqlite":
+        fts = f"{table}_fts"
+        sql = (
+            f"SELECT {columns}, {rank} AS score "
+            f"FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid "
+            f"WHERE {fts} MATCH %s AND {table}.{owner} = %s"
+        )
+        params += [full_text_query(terms), user.pk]
+
+    else:
+        # Without a full-text index, fall back to substring matching
+        sql = (
+            f"SELECT {columns}, {rank} AS score "
+            f"FROM {table} WHERE {owner} = %s"
+        )
+        params += [user.pk]
+
+        for term in terms:
+            sql += f" AND {table}.name LIKE %s"
+            params.append(f"%{term}%")
+
+    # Continue after the cursor, which sorts by score, kind and ID
+    where = "1 = 1"
+
+    if after is not None:
+        score, after_kind, id = after
+
+        if kind > after_kind:
+            where = "score <= %s"
+            params += [score]
+
+        elif kind == after_kind:
+            where = "(score < %s OR (score = %s AND id > %s))"
+            params += [score, score, id]
+
+        else:
+            where = "score < %s"
+            params += [score]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT * FROM ({sql}) AS hits WHERE {where} "
+            f"ORDER BY score DESC, id LIMIT %s",
+            params + [limit]
+        )
+        names = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+
+    # Build the hits
+    hits = []
+
+    for row in rows:
+        hit = dict(zip(names, row))
+        hit["kind"] = kind
+        hit["score"] = int(hit["score"])
+
+        if "todo_list_id" in hit:
+            hit["todo_list"] = hit.pop("todo_list_id")
+
+        hits.append(hit)
+
+    return hits
+
+
+def search(user, q, cursor=None, limit=10):
+    # Search the names of the todo lists and tasks of a user. Return the best
+    # ranked hits after the cursor and the cursor of the next page, which is
+    # None on the last page. Raise ValueError if the cursor is invalid.
+
+    # Return nothing if the query has no words
+    after = decode_cursor(cursor) if cursor else None
+    terms = parse_terms(q)
+
+    if not terms:
+        return [], None
+
+    # Merge the best hits of each table
+    hits = []
+
+    for kind, model, owner, extra in INDEXES:
+        hits += search_table(
+            user, kind, model, owner, extra, terms, after, limit + 1)
+
+    hits.sort(key=lambda hit: (-hit["score"], hit["kind"], hit["id"]))
+    hits, rest = hits[:limit], hits[limit:]
+    return hits, encode_cursor(hits[-1]) if rest else None
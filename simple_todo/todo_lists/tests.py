@@ -1,3 +1,143 @@
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from .models import Task, TodoList
+from .search import search
+
+
+# Test Case Classes
+# =================
+class SearchViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client.force_login(self.user)
+
+    def test_search_box_loads_results_page(self):
+        # The search box of the todo lists page requests the HTML results,
+        # not the search API
+        response = self.client.get(reverse("todo-lists"))
+        self.assertContains(response, f'hx-get="{reverse("todo-lists-search")}"')
+
+        TodoList.objects.create(user=self.user, name="Groceries")
+        response = self.client.get(reverse("todo-lists-search"), {"q": "groceries"})
+        self.assertTemplateUsed(response, "todo_lists/search_results.html")
+        self.assertContains(response, "Groceries")
+
+
+class TasksPartialViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.other = User.objects.create_user("bob", password="secret")
+        self.client.force_login(self.user)
+
+    def get(self, todo_list, etag=None):
+        # Request the tasks partial of the todo list
+        headers = {"HX-Request": "true"}
+
+        if etag is not None:
+            headers["If-None-Match"] = etag
+
+        return self.client.get(
+            reverse("todo-list", args=[todo_list.pk]), headers=headers)
+
+    def test_other_users_todo_list_is_not_found(self):
+        # The ETag only depends on the user, so a revalidation of a todo list
+        # of someone else must not be answered with 304
+        todo_list = TodoList.objects.create(user=self.user, name="Chores")
+        other_todo_list = TodoList.objects.create(user=self.other, name="Chores")
+        etag = self.get(todo_list)["ETag"]
+        self.assertEqual(self.get(todo_list, etag).status_code, 304)
+        self.assertEqual(self.get(other_todo_list, etag).status_code, 404)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.other = User.objects.create_user("bob", password="secret")
+
+    def test_exact_and_prefix_matches_rank_first(self):
+        for name in ["Weekly milk run", "Milk", "Milkshake ideas"]:
+            TodoList.objects.create(user=self.user, name=name)
+
+        hits, cursor = search(self.user, "milk")
+        self.assertEqual(
+            [hit["name"] for hit in hits], 
+            ["Milk", "Milkshake ideas", "Weekly milk run"]
+        )
+        self.assertIsNone(cursor)
+
+    def test_pages_are_stable_while_others_write(self):
+        # Page through the hits while another user adds matching rows, which
+        # changes the corpus statistics of the full-text index
+        names = {f"Shopping {i}" + " x" * i for i in range(25)}
+
+        for name in names:
+            TodoList.objects.create(user=self.user, name=name)
+
+        seen = []
+        hits, cursor = search(self.user, "shopping", limit=10)
+        seen += [hit["name"] for hit in hits]
+
+        while cursor is not None:
+            for i in range(20):
+                TodoList.objects.create(
+                    user=self.other, name=f"Shopping {len(seen)}-{i}")
+
+            hits, cursor = search(self.user, "shopping", cursor, limit=10)
+            seen += [hit["name"] for hit in hits]
+
+        self.assertEqual(len(seen), len(names))
+        self.assertEqual(set(seen), names)
+
+
+class IndexUsageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.todo_list = TodoList.objects.create(user=self.user, name="Chores")
+        Task.objects.create(
+            todo_list=self.todo_list, name="Dishes", due_date=timezone.now())
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        # Return the query plan of a query, one line per step
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            return [" ".join(map(str, row)) for row in cursor.fetchall()]
+
+    def assert_sorted_by_index(self, url, params=None):
+        # Check that every sorted query of the page reads its rows in order
+        # from an index instead of sorting them
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        sorted_queries = [
+            query["sql"] for query in queries if "ORDER BY" in query["sql"]]
+        self.assertTrue(sorted_queries)
+
+        for sql in sorted_queries:
+            for step in self.explain(sql):
+                # SQLite sorts in a temporary B-tree and MySQL in a filesort
+                self.assertNotIn("TEMP B-TREE", step, sql)
+                self.assertNotIn("filesort", step, sql)
+
+                # SQLite scans tables which aren't read through an index
+                if "SCAN todo_lists_" in step:
+                    self.assertIn("INDEX", step, sql)
+
+    def test_list_views_use_indexes(self):
+        self.assert_sorted_by_index(reverse("todo-lists"))
+        self.assert_sorted_by_index(reverse("todo-list", args=[self.todo_list.pk]))
+        self.assert_sorted_by_index(reverse("due-tasks"), {"window": "week"})
+
+    def test_viewsets_use_indexes(self):
+        self.assert_sorted_by_index(reverse("todo_list-list"))
+        self.assert_sorted_by_index(reverse("todo_list-list"), {"stats": "1"})
+        self.assert_sorted_by_index(reverse("task-list"))
+        self.assert_sorted_by_index(
+            reverse("task-list"), {"todo_list": self.todo_list.pk})
+        self.assert_sorted_by_index(reverse("task-due"), {"window": "week"})
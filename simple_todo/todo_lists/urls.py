@@ -11,5 +11,7 @@ urlpatterns = [
     path("todo-lists/<int:pk>/create-task/", views.TaskCreateView.as_view(), name="todo-list-create-task"),
     path("tasks/<int:pk>/", views.TaskDeleteView.as_view(), name="task"),
     path("tasks/<int:pk>/edit/", views.TaskUpdateView.as_view(), name="task-edit"),
-    path("tasks/<int:pk>/info/", views.TaskInfoView.as_view(), name="task-info")
+    path("tasks/<int:pk>/info/", views.TaskInfoView.as_view(), name="task-info"),
+    path("due/", views.DueTasksView.as_view(), name="due-tasks"),
+    path("search/", views.SearchView.as_view(), name="todo-lists-search")
 ]
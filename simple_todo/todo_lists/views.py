@@ -1,7 +1,12 @@
+from datetime import datetime
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.utils import IntegrityError
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
 from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.views.decorators.vary import vary_on_headers
 from django.views.generic import (
     CreateView, 
     DeleteView, 
@@ -13,33 +18,119 @@ from django.views.generic import (
 from django.views.generic.detail import SingleObjectMixin
 from django_htmx.http import HttpResponseClientRedirect
 
+from .conditional import get_user_summary, user_conditional
+from .due import WINDOWS, due_window_from_params
 from .forms import TaskForm, TodoListForm
-from .models import Task, TodoList
+from .models import TodoList
+from .pagination import CountedPaginator
+from .purge import delete_todo_list
+from .search import search
+
+
+# Mixin Classes
+# =============
+class CountedPaginationMixin:
+    paginator_class = CountedPaginator
+
+    def get_paginator(self, *args, **kwargs):
+        # Pass the count from the counter cache to the paginator
+        return super().get_paginator(*args, count=self.get_count(), **kwargs)
+    
+
+class DueTasksMixin:
+    page_size = 10
+
+    def get(self, request, *args, **kwargs):
+        # Parse the due date window, falling back to overdue tasks
+        self.window_name = request.GET.get("window", "overdue")
+
+        try:
+            self.window = due_window_from_params(request.GET)
+
+        except ValueError:
+            self.window_name = "overdue"
+            self.window = due_window_from_params({})
+
+        return super().get(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        # List the tasks due in the window in date order. Pages continue
+        # after the last task of the previous page instead of counting and
+        # skipping rows.
+        queryset = self.request.user.tasks.select_related("todo_list")
+        queryset = queryset.due_between(*self.window)
+        after = self.request.GET.get("after", "")
+        due_date, _, pk = after.rpartition("|")
+
+        try:
+            queryset = queryset.due_after(
+                datetime.fromisoformat(due_date), int(pk))
+            
+        except ValueError:
+            pass
+
+        return queryset
+    
+    def get_context_data(self, **kwargs):
+        # Fetch one extra task to find out if there is a next page, and link
+        # to it
+        tasks = list(self.object_list[:self.page_size + 1])
+        params = self.request.GET.copy()
+        params.pop("after", None)
+        next_url = None
+
+        if len(tasks) > self.page_size:
+            tasks = tasks[:self.page_size]
+            params["after"] = f"{tasks[-1].due_date.isoformat()}|{tasks[-1].pk}"
+            next_url = f"{reverse('due-tasks')}?{params.urlencode()}"
 
+        ctx = super().get_context_data(**kwargs)
+        ctx["tasks"] = tasks
+        ctx["next_url"] = next_url
+        ctx["window"] = self.window_name
+        ctx["windows"] = WINDOWS
+        return ctx
+    
 
 # View Classes
 # ============
-class TodoListsFullView(ListView):
+class TodoListsFullView(CountedPaginationMixin, ListView):
     template_name = "todo_lists/todo_lists_full.html"
     paginate_by = 10
 
     def get_queryset(self):
         return self.request.user.todo_lists.order_by("name")
     
+    def get_count(self):
+        return get_user_summary(self.request).todo_list_count
+    
     def get_context_data(self, **kwargs):
-        # Add the todo list form to the template context
+        # Add the todo list form and the version stamp which keys the cached
+        # todo lists to the template context
         ctx = super().get_context_data(**kwargs)
         ctx["form"] = TodoListForm()
+        ctx["version"] = get_user_summary(self.request).version
         return ctx
     
 
-class TodoListsPartialView(ListView):
+@method_decorator(user_conditional("todo-lists"), name="get")
+class TodoListsPartialView(CountedPaginationMixin, ListView):
     template_name = "todo_lists/todo_lists_partial.html"
     paginate_by = 10
 
     def get_queryset(self):
         return self.request.user.todo_lists.order_by("name")
     
+    def get_count(self):
+        return get_user_summary(self.request).todo_list_count
+    
+    def get_context_data(self, **kwargs):
+        # Add the version stamp which keys the cached todo lists to the
+        # template context
+        ctx = super().get_context_data(**kwargs)
+        ctx["version"] = get_user_summary(self.request).version
+        return ctx
+    
 
 class TodoListCreateView(CreateView):
     template_name = "todo_lists/todo_list_create_form.html"
@@ -59,6 +150,7 @@ class TodoListCreateView(CreateView):
             return self.form_invalid(form)
     
 
+@method_decorator(vary_on_headers("HX-Request"), name="get")
 class TodoListsView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         # Render partial content?
@@ -76,7 +168,7 @@ class TodoListsView(LoginRequiredMixin, View):
         return view(request, *args, **kwargs)
     
 
-class TodoListFullView(SingleObjectMixin, ListView):
+class TodoListFullView(CountedPaginationMixin, SingleObjectMixin, ListView):
     template_name = "todo_lists/todo_list_full.html"
     paginate_by = 10
 
@@ -91,6 +183,9 @@ class TodoListFullView(SingleObjectMixin, ListView):
     def get_queryset(self):
         return self.object.tasks.order_by("name")
     
+    def get_count(self):
+        return self.object.task_count
+    
     def get_context_data(self, **kwargs):
         # Add the todo list and task form to the template context
         ctx = super().get_context_data(**kwargs)
@@ -99,21 +194,31 @@ class TodoListFullView(SingleObjectMixin, ListView):
         return ctx
     
 
-class TasksPartialView(SingleObjectMixin, ListView):
+class TasksPartialView(CountedPaginationMixin, SingleObjectMixin, ListView):
     template_name = "todo_lists/tasks_partial.html"
     paginate_by = 10
 
     def get(self, request, *args, **kwargs):
-        # Store the referenced object and return the value returned by the
-        # base method
-        self.object = self.get_object(
-            queryset=self.request.user.todo_lists.all()
+        # Store the referenced object before the conditional check, so todo
+        # lists of other users are answered with 404 instead of 304
+        self.object = get_object_or_404(
+            TodoList, 
+            pk=kwargs["pk"], 
+            user=request.user
         )
+        return self.get_page(request, *args, **kwargs)
+    
+    @method_decorator(user_conditional("tasks"))
+    def get_page(self, request, *args, **kwargs):
+        # Return the value returned by the base method
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
         return self.object.tasks.order_by("name")
     
+    def get_count(self):
+        return self.object.task_count
+    
     def get_context_data(self, **kwargs):
         # Add the todo list to the template context
         ctx = super().get_context_data(**kwargs)
@@ -157,11 +262,14 @@ class TodoListDeleteView(DeleteView):
         return self.request.user.todo_lists.all()
     
     def delete(self, request, *args, **kwargs):
-        # Delete the todo list and redirect to the homepage
-        super().delete(request, *args, **kwargs)
+        # Delete the tasks of the todo list in chunks, then the todo list, and
+        # redirect to the homepage
+        self.object = self.get_object()
+        delete_todo_list(self.object)
         return HttpResponseClientRedirect(self.get_success_url())
 
 
+@method_decorator(vary_on_headers("HX-Request"), name="get")
 class TodoListView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         # Render partial content?
@@ -219,7 +327,7 @@ class TaskDeleteView(DeleteView):
         return reverse("todo-list", args=(self.object.todo_list.pk,))
 
     def get_queryset(self):
-        return Task.objects.filter(todo_list__user=self.request.user)
+        return self.request.user.tasks.all()
     
     def delete(self, request, *args, **kwargs):
         # Delete the task and redirect to the todo list which contained the
@@ -237,7 +345,7 @@ class TaskUpdateView(UpdateView):
         return reverse("task-info", args=(self.kwargs["pk"],))
     
     def get_queryset(self):
-        return Task.objects.filter(todo_list__user=self.request.user)
+        return self.request.user.tasks.all()
     
     def form_valid(self, form):
         try:
@@ -253,4 +361,62 @@ class TaskInfoView(DetailView):
     context_object_name = "task"
 
     def get_queryset(self):
-        return Task.objects.filter(todo_list__user=self.request.user)
+        return self.request.user.tasks.all()
+
+
+class DueTasksFullView(DueTasksMixin, ListView):
+    template_name = "todo_lists/due_tasks_full.html"
+
+
+class DueTasksPartialView(DueTasksMixin, ListView):
+    template_name = "todo_lists/due_tasks_partial.html"
+
+    def get_template_names(self):
+        # Further pages are appended below the tasks which are already shown
+        if "after" in self.request.GET:
+            return ["todo_lists/due_tasks_page.html"]
+        
+        return super().get_template_names()
+
+
+@method_decorator(vary_on_headers("HX-Request"), name="get")
+class DueTasksView(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        # Render partial content?
+        if request.htmx:
+            view = DueTasksPartialView.as_view()
+
+        else:
+            view = DueTasksFullView.as_view()
+
+        return view(request, *args, **kwargs)
+    
+
+class SearchView(LoginRequiredMixin, View):
+    template_name = "todo_lists/search_results.html"
+    paginate_by = 10
+
+    def get(self, request, *args, **kwargs):
+        # Search the todo lists and tasks of the current user. An invalid
+        # cursor just restarts the search.
+        q = request.GET.get("q", "")
+
+        try:
+            hits, cursor = search(
+                request.user, q, request.GET.get("cursor"), self.paginate_by)
+
+        except ValueError:
+            hits, cursor = search(request.user, q, None, self.paginate_by)
+
+        # Link to the next page of hits, if there is one
+        next_url = None
+
+        if cursor is not None:
+            next_url = (
+                f"{reverse('todo-lists-search')}?{urlencode({'q': q, 'cursor': cursor})}")
+
+        return render(request, self.template_name, {
+            "q": q,
+            "hits": hits,
+            "next_url": next_url
+        })
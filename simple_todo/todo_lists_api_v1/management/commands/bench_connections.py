@@ -0,0 +1,105 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from todo_lists.benchmark import benchmark_user
+from todo_lists.models import TodoList
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Compares the latency of API requests which open a new database "
+        "connection (CONN_MAX_AGE=0) with ones which reuse a persistent "
+        "connection. The requests run through the WSGI handler in this "
+        "process, so connections are closed at the end of each request like "
+        "they are by the server. The generated data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todo-lists",
+            type=int,
+            default=10,
+            help="Number of todo lists of the user."
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Number of requests to measure for each setting."
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_user() as user:
+            TodoList.objects.bulk_create(
+                [
+                    TodoList(user=user, name=f"List {i:05d}")
+                    for i in range(options["todo_lists"])
+                ]
+            )
+
+            # Fetch the todo lists of the user like the app does
+            application = get_wsgi_application()
+            factory = RequestFactory(
+                HTTP_HOST=(settings.ALLOWED_HOSTS or ["localhost"])[0],
+                HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+            )
+            environ = factory.get(reverse("todo_list-list")).environ
+
+            for max_age in [0, 60]:
+                self.report(
+                    f"CONN_MAX_AGE={max_age}",
+                    *self.measure(application, environ, max_age, options["requests"])
+                )
+
+    def measure(self, application, environ, max_age, count):
+        # Return the time in seconds which each request took and how many
+        # connections were opened. Every database starts out closed, so the
+        # new maximum age applies to the first connection.
+        connects = []
+        statuses = set()
+        on_connect = lambda **kwargs: connects.append(kwargs["connection"].alias)
+        connection_created.connect(on_connect)
+        durations = []
+
+        for connection in connections.all():
+            connection.close()
+            connection.settings_dict["CONN_MAX_AGE"] = max_age
+
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                response = application(
+                    dict(environ), 
+                    lambda status, headers: statuses.add(status)
+                )
+                b"".join(response)
+                response.close()
+                durations.append(time.perf_counter() - start)
+
+        finally:
+            connection_created.disconnect(on_connect)
+
+        if statuses != {"200 OK"}:
+            raise CommandError(f"Unexpected responses: {', '.join(statuses)}")
+
+        return durations, len(connects)
+
+    def report(self, name, durations, connects):
+        # Print the median and 99th percentile latency
+        percentiles = statistics.quantiles(durations, n=100)
+        self.stdout.write(
+            f"{name}: p50 {percentiles[49] * 1000:.2f} ms, "
+            f"p99 {percentiles[98] * 1000:.2f} ms, "
+            f"{connects} connections"
+        )
@@ -0,0 +1,113 @@
+import gzip
+import json
+import statistics
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+import msgpack
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from todo_lists.benchmark import benchmark_user
+from todo_lists.importer import Importer
+from todo_lists_api_v1.renderers import MessagePackRenderer
+from todo_lists_api_v1.serializers import TaskReadSerializer
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Compares the size and client decode time of a task listing encoded "
+        "as JSON and MessagePack, with and without gzip. The generated data "
+        "is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=1000,
+            help="Number of tasks in the listing."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Number of decodes to measure for each encoding."
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_user() as user:
+            self.generate(user, options)
+
+            # Serialize the tasks like the listing does
+            request = Request(RequestFactory().get("/api/v1/tasks/"))
+            serializer = TaskReadSerializer(context={"request": request})
+            rows = list(
+                user.tasks.order_by("name", "id")
+                .values(*serializer.get_columns())
+            )
+            data = {
+                "next": None,
+                "previous": None,
+                "results": TaskReadSerializer(
+                    rows, 
+                    many=True, 
+                    context={"request": request}
+                ).data
+            }
+
+        # Encode the listing like the renderers and ApiGZipMiddleware do, and
+        # decode it like the mobile client does
+        json_body = JSONRenderer().render(data)
+        msgpack_body = MessagePackRenderer().render(data)
+        encodings = {
+            "JSON": (json_body, json.loads),
+            "MessagePack": (msgpack_body, msgpack.unpackb),
+            "JSON+gzip": (
+                compress_string(json_body),
+                lambda body: json.loads(gzip.decompress(body))
+            ),
+            "MessagePack+gzip": (
+                compress_string(msgpack_body),
+                lambda body: msgpack.unpackb(gzip.decompress(body))
+            )
+        }
+
+        for name, (body, decode) in encodings.items():
+            durations = self.measure(body, decode, options["repeat"])
+            self.stdout.write(
+                f"{name}: {len(body):,} bytes, "
+                f"decode p50 {statistics.median(durations) * 1000:.2f} ms"
+            )
+
+    def generate(self, user, options):
+        # Import the tasks into one todo list
+        due_date = timezone.now().astimezone(dt_timezone.utc)
+        rows = [{"type": "todo_list", "id": 1, "name": "Benchmark"}]
+        rows += [
+            {
+                "type": "task",
+                "todo_list": 1,
+                "name": f"Task {i:06d}",
+                "due_date": (due_date + timedelta(minutes=i)).isoformat()
+            }
+            for i in range(options["tasks"])
+        ]
+        Importer(user).run(enumerate(rows, 1))
+
+    def measure(self, body, decode, count):
+        # Return the time in seconds which each decode took
+        durations = []
+
+        for _ in range(count):
+            start = time.perf_counter()
+            decode(body)
+            durations.append(time.perf_counter() - start)
+
+        return durations
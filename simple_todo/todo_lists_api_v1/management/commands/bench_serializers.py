@@ -0,0 +1,106 @@
+import statistics
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from todo_lists.benchmark import benchmark_user
+from todo_lists.importer import Importer
+from todo_lists_api_v1.serializers import TaskReadSerializer, TaskSerializer
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Compares how many tasks per second TaskSerializer and "
+        "TaskReadSerializer fetch and serialize for a task listing. The "
+        "generated data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=10000,
+            help="Number of tasks to serialize at once."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of measurements of each serializer."
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_user() as user:
+            self.generate(user, options)
+            queryset = user.tasks.order_by("name", "id")
+
+            # Serialize model instances with the generic serializer, and
+            # plain rows with the read-only one like the listings do
+            variants = [
+                ("TaskSerializer", TaskSerializer, None),
+                ("TaskReadSerializer", TaskReadSerializer, None),
+                ("TaskReadSerializer ?fields=id,name", TaskReadSerializer, "id,name")
+            ]
+
+            for name, serializer_class, fields in variants:
+                self.report(
+                    name,
+                    options["tasks"],
+                    self.measure(queryset, serializer_class, fields, options["repeat"])
+                )
+
+    def generate(self, user, options):
+        # Import the tasks into one todo list
+        due_date = timezone.now().astimezone(dt_timezone.utc)
+        rows = [{"type": "todo_list", "id": 1, "name": "Benchmark"}]
+        rows += [
+            {
+                "type": "task",
+                "todo_list": 1,
+                "name": f"Task {i:06d}",
+                "due_date": (due_date + timedelta(minutes=i)).isoformat()
+            }
+            for i in range(options["tasks"])
+        ]
+        Importer(user).run(enumerate(rows, 1))
+
+    def measure(self, queryset, serializer_class, fields, count):
+        # Return the seconds which fetching and serializing all tasks took,
+        # once for each measurement
+        params = {"fields": fields} if fields else {}
+        request = Request(RequestFactory().get("/api/v1/tasks/", params))
+        fetch_durations = []
+        serialize_durations = []
+
+        for _ in range(count):
+            start = time.perf_counter()
+
+            if serializer_class is TaskReadSerializer:
+                columns = serializer_class(context={"request": request}).get_columns()
+                rows = list(queryset.values(*columns))
+
+            else:
+                rows = list(queryset.all())
+
+            fetched = time.perf_counter()
+            serializer_class(rows, many=True, context={"request": request}).data
+            serialize_durations.append(time.perf_counter() - fetched)
+            fetch_durations.append(fetched - start)
+
+        return fetch_durations, serialize_durations
+
+    def report(self, name, count, durations):
+        # Print the median throughput of serializing alone and together with
+        # fetching the rows
+        fetch = statistics.median(durations[0])
+        serialize = statistics.median(durations[1])
+        self.stdout.write(
+            f"{name}: {count / serialize:.0f} tasks/s serialized, "
+            f"{count / (fetch + serialize):.0f} tasks/s fetched and serialized"
+        )
@@ -0,0 +1,156 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Endpoints which are compared, by name
+ENDPOINTS = {
+    "sync": "/api/v1/todo-lists/",
+    "async": "/api/v1/async/todo-lists/"
+}
+
+
+# Command Classes
+# ===============
+class Command(BaseCommand):
+    help = (
+        "Compares the requests per second and latency of the sync and async "
+        "todo list endpoints of a running server, e.g. "
+        "uvicorn simple_todo.asgi:application."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "username", 
+            help="Send the requests as this user."
+        )
+        parser.add_argument(
+            "password", 
+            help="Password of the user."
+        )
+        parser.add_argument(
+            "--base-url", 
+            default="http://127.0.0.1:8000", 
+            help="URL of the server under test."
+        )
+        parser.add_argument(
+            "--concurrency", 
+            type=int, 
+            default=1000, 
+            help="Number of clients sending requests at the same time."
+        )
+        parser.add_argument(
+            "--requests", 
+            type=int, 
+            default=10000, 
+            help="Number of requests to send to each endpoint."
+        )
+        parser.add_argument(
+            "--endpoint", 
+            choices=list(ENDPOINTS), 
+            action="append", 
+            help="Endpoint to test (both by default)."
+        )
+        parser.add_argument(
+            "--timeout", 
+            type=float, 
+            default=60, 
+            help="Seconds after which a request counts as failed."
+        )
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        # Open one connection per client, so requests don't queue in the
+        # client instead of the server
+        limits = httpx.Limits(
+            max_connections=options["concurrency"],
+            max_keepalive_connections=options["concurrency"]
+        )
+
+        async with httpx.AsyncClient(
+            base_url=options["base_url"], 
+            limits=limits, 
+            timeout=options["timeout"]
+        ) as client:
+            # Test each endpoint after a short warm up, one after the other.
+            # Access tokens expire after a few minutes, so each test gets a
+            # new one.
+            for name in options["endpoint"] or list(ENDPOINTS):
+                await self.log_in(client, options["username"], options["password"])
+                await self.attack(client, ENDPOINTS[name], 100, 10)
+                stats = await self.attack(
+                    client, 
+                    ENDPOINTS[name], 
+                    options["requests"], 
+                    options["concurrency"]
+                )
+                self.report(name, stats)
+
+    async def log_in(self, client, username, password):
+        # Send the requests with an access token, like the mobile app
+        try:
+            response = await client.post(
+                "/api/v1/token/", 
+                json={"username": username, "password": password}
+            )
+
+        except httpx.HTTPError as exc:
+            raise CommandError(f"Could not reach the server: {exc}")
+
+        if response.status_code != 200:
+            raise CommandError(f"Could not log in: {response.text}")
+        
+        client.headers["Authorization"] = f"Bearer {response.json()['access']}"
+
+    async def attack(self, client, url, count, concurrency):
+        # Send the given number of requests from concurrent clients and
+        # return the latency of each successful request, the number of
+        # errors and the total duration
+        latencies = []
+        errors = 0
+        remaining = count
+
+        async def run_client():
+            nonlocal errors, remaining
+
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+
+                try:
+                    response = await client.get(url)
+                    ok = response.status_code == 200
+
+                except httpx.HTTPError:
+                    ok = False
+
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+    
+    def report(self, name, stats):
+        # Print the throughput and the median and 99th percentile latency
+        latencies, errors, duration = stats
+
+        if len(latencies) < 2:
+            self.stdout.write(f"{name}: {errors} errors, no successful requests")
+            return
+        
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{name}: {len(latencies) / duration:.0f} requests/s, "
+            f"p50 {percentiles[49] * 1000:.0f} ms, "
+            f"p99 {percentiles[98] * 1000:.0f} ms, "
+            f"{errors} errors"
+        )
@@ -0,0 +1,21 @@
+from django.middleware.gzip import GZipMiddleware
+
+
+# Middleware Classes
+# ==================
+class ApiGZipMiddleware(GZipMiddleware):
+    # Compress API responses only. HTML pages, including those of the
+    # browsable API, embed the CSRF token, so compressing them would expose
+    # it to BREACH style attacks.
+    path_prefix = "/api/"
+
+    def process_response(self, request, response):
+        # Leave pages outside the API alone
+        if not request.path.startswith(self.path_prefix):
+            return response
+        
+        # Leave HTML alone
+        if response.get("Content-Type", "").startswith("text/html"):
+            return response
+        
+        return super().process_response(request, response)
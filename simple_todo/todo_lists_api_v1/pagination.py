@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Pagination Classes
+# ==================
+class NameCursorPagination(CursorPagination):
+    # Keyset pagination on (name, id) which is served directly by the
+    # (user, name) and (todo_list, name) unique indexes. Unlike page number
+    # pagination, this never runs a COUNT query or an OFFSET scan, so deep
+    # pages cost the same as the first one.
+    ordering = ("name", "id")
+
+
+class DueDateCursorPagination(CursorPagination):
+    # Keyset pagination on (due_date, id) which is served by the
+    # (owner, due_date) and (todo_list, due_date) indexes
+    ordering = ("due_date", "id")
@@ -0,0 +1,18 @@
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+# Parser Classes
+# ==============
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        # Decode the request body
+        try:
+            return msgpack.unpackb(stream.read())
+        
+        except ValueError as exc:
+            raise ParseError(
+                f"MessagePack parse error - {str(exc) or type(exc).__name__}")
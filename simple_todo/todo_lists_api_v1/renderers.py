@@ -0,0 +1,21 @@
+import msgpack
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Renderer Classes
+# ================
+class MessagePackRenderer(BaseRenderer):
+    # Compact binary alternative to JSON for the mobile app
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Encode the types which MessagePack doesn't support natively, like
+        # dates and decimals, the same way as the JSON renderer
+        if data is None:
+            return b""
+        
+        return msgpack.packb(data, default=JSONEncoder().default)
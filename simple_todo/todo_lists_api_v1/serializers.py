@@ -1,17 +1,366 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from rest_framework import serializers
 
-from todo_lists.models import Task, TodoList
+from todo_lists.models import Task, TodoList, Tombstone, UserSummary
+
+
+# Functions
+# =========
+def requested_fields(context, available):
+    # Return the fields named by the ?fields= parameter of a GET request in
+    # the order they are available, or None if all fields were requested.
+    # Raise ValidationError if an unknown field was named.
+    request = context.get("request")
+
+    if request is None or request.method != "GET":
+        return None
+    
+    fields = request.query_params.get("fields")
+
+    if not fields:
+        return None
+    
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names.difference(available)
+
+    if unknown:
+        raise serializers.ValidationError({
+            "fields": [f'"{name}" is not a valid field.' for name in sorted(unknown)]
+        })
+    
+    return [name for name in available if name in names]
+
+
+# Mixin Classes
+# =============
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        # Drop the fields which weren't requested
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context, list(self.fields))
+
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
+
+# Field Classes
+# =============
+class UserTodoListField(serializers.PrimaryKeyRelatedField):
+    def get_queryset(self):
+        # Only allow todo lists which belong to the current user
+        return self.context["request"].user.todo_lists.all()
 
 
 # Serializer Classes
 # ==================
-class TodoListSerializer(serializers.ModelSerializer):
+class TodoListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TodoList
         fields = ["id", "name"]
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TodoListStatsSerializer(TodoListSerializer):
+    overdue_count = serializers.IntegerField(read_only=True)
+    next_due = serializers.DateTimeField(read_only=True)
+
+    class Meta(TodoListSerializer.Meta):
+        fields = TodoListSerializer.Meta.fields + [
+            "task_count", 
+            "overdue_count", 
+            "next_due"
+        ]
+
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    todo_list = UserTodoListField()
+
     class Meta:
         model = Task
         fields = ["id", "todo_list", "name", "due_date"]
+
+
+class TaskReadSerializer(serializers.BaseSerializer):
+    # Read-only serializer for task listings which formats the rows returned
+    # by values() directly instead of going through model instances and
+    # ModelSerializer fields. The output matches TaskSerializer.
+    columns = {
+        "id": "id",
+        "todo_list": "todo_list_id",
+        "name": "name",
+        "due_date": "due_date"
+    }
+
+    def __init__(self, *args, **kwargs):
+        # Look up the current time zone once instead of once per row
+        super().__init__(*args, **kwargs)
+        self.due_date_field = serializers.DateTimeField(
+            default_timezone=timezone.get_current_timezone())
+        self.field_names = (
+            requested_fields(self.context, list(self.columns)) or 
+            list(self.columns)
+        )
+
+    def get_columns(self, ordering=()):
+        # Return the columns to fetch with values(), which are those of the
+        # requested fields and those the page cursor is built from
+        return list(dict.fromkeys(
+            [self.columns[name] for name in self.field_names] + list(ordering)))
+
+    def to_representation(self, row):
+        data = {name: row[self.columns[name]] for name in self.field_names}
+
+        if "due_date" in data:
+            data["due_date"] = self.due_date_field.to_representation(
+                data["due_date"])
+
+        return data
+
+
+class TaskBulkSerializer(serializers.ListSerializer):
+    def run_validation(self, data=serializers.empty):
+        # Look up the todo lists and tasks referenced by the batch with one
+        # query each instead of one query per item
+        if isinstance(data, list):
+            user = self.context["request"].user
+            todo_list_ids = self._collect_ids(data, "todo_list")
+            self.todo_list_ids = set(
+                user.todo_lists.filter(pk__in=todo_list_ids).values_list("pk", flat=True)
+            )
+            self.tasks = user.tasks.in_bulk(self._collect_ids(data, "id"))
+
+        return super().run_validation(data)
+
+    def run_child_validation(self, data):
+        # Report per-item errors instead of failing the whole batch
+        try:
+            return super().run_child_validation(data)
+        
+        except serializers.ValidationError as exc:
+            return {"errors": exc.detail}
+
+    def validate(self, attrs):
+        # Reject operations on a task which an earlier operation of the batch
+        # already targets, since both would change the same instance
+        seen = set()
+
+        for item in attrs:
+            task = item.get("instance")
+
+            if "errors" in item or task is None:
+                continue
+
+            if task.pk in seen:
+                item["errors"] = {
+                    "id": ["This task is already part of the batch."]
+                }
+                continue
+
+            seen.add(task.pk)
+
+        # Collect the (todo list, name) pairs which are already taken. Names
+        # are compared case-insensitively like the collation of the MySQL
+        # database does.
+        named = [
+            item for item in attrs if item.get("action") in ("create", "update")
+        ]
+        taken = {
+            (todo_list_id, name.casefold()) 
+            for todo_list_id, name in Task.objects.alias(name_lower=Lower("name"))
+            .filter(
+                todo_list__in={item["todo_list"] for item in named},
+                name_lower__in={item["name"].lower() for item in named}
+            ).values_list("todo_list", "name")
+        }
+
+        # Enforce the unique todo list name constraint in batch order so that
+        # earlier operations can free up or claim names for later ones
+        for item in attrs:
+            if "errors" in item:
+                continue
+
+            task = item.get("instance")
+            old_key = (task.todo_list_id, task.name.casefold()) if task else None
+
+            if item["action"] == "delete":
+                taken.discard(old_key)
+                continue
+
+            new_key = (item["todo_list"], item["name"].casefold())
+
+            if new_key != old_key and new_key in taken:
+                item["errors"] = {
+                    "non_field_errors": [
+                        "The fields todo_list, name must make a unique set."
+                    ]
+                }
+                continue
+
+            taken.discard(old_key)
+            taken.add(new_key)
+
+        return attrs
+    
+    def save(self, **kwargs):
+        # Apply all valid operations in a single transaction
+        user = self.context["request"].user
+        items = self.validated_data
+        now = timezone.now()
+        deleted = [item["instance"].pk for item in items 
+                   if "errors" not in item and item["action"] == "delete"]
+        updated = []
+        created = []
+
+        # Remember which todo list each referenced task was in
+        old_todo_list_ids = {
+            pk: task.todo_list_id for pk, task in self.tasks.items()
+        }
+
+        for item in items:
+            if "errors" in item or item["action"] == "delete":
+                continue
+
+            task = item.get("instance") or Task(owner=user)
+            task.todo_list_id = item["todo_list"]
+            task.name = item["name"]
+            task.due_date = item["due_date"]
+            task.updated_at = now
+            item["instance"] = task
+            (created if task.pk is None else updated).append(task)
+
+        # Count the change in the number of tasks of each affected todo list
+        task_deltas = Counter()
+
+        for pk in set(deleted):
+            task_deltas[old_todo_list_ids[pk]] -= 1
+
+        for task in {task.pk: task for task in updated}.values():
+            if task.pk not in deleted:
+                task_deltas[old_todo_list_ids[task.pk]] -= 1
+                task_deltas[task.todo_list_id] += 1
+
+        for task in created:
+            task_deltas[task.todo_list_id] += 1
+
+        with transaction.atomic():
+            Tombstone.objects.bulk_create([
+                Tombstone(user=user, kind=Tombstone.TASK, object_id=pk) 
+                for pk in deleted
+            ])
+            Task.objects.filter(pk__in=deleted).delete()
+            Task.objects.bulk_update(
+                updated, 
+                ["todo_list", "name", "due_date", "updated_at"]
+            )
+            Task.objects.bulk_create(created)
+            TodoList.bump(task_deltas)
+            UserSummary.bump(user.pk)
+
+        # Backends which can't return rows from a bulk insert (MySQL) leave
+        # the primary keys unset, so fetch them in one query
+        missing = [task for task in created if task.pk is None]
+
+        if missing:
+            pks = {
+                (todo_list, name): pk for pk, todo_list, name in 
+                user.tasks.filter(
+                    todo_list__in={task.todo_list_id for task in missing},
+                    name__in={task.name for task in missing}
+                ).values_list("pk", "todo_list", "name")
+            }
+
+            for task in missing:
+                task.pk = pks[(task.todo_list_id, task.name)]
+
+        # Report the outcome of each operation in the order they were given
+        results = []
+
+        for item in items:
+            if "errors" in item:
+                results.append({"status": 400, "errors": item["errors"]})
+
+            elif item["action"] == "delete":
+                results.append({"status": 204})
+
+            else:
+                results.append({
+                    "status": 201 if item["action"] == "create" else 200,
+                    "data": TaskSerializer(item["instance"], context=self.context).data
+                })
+
+        return results
+    
+    def _collect_ids(self, data, field):
+        # Gather the well-formed IDs of the given field from the raw batch
+        ids = set()
+
+        for item in data:
+            try:
+                ids.add(int(item[field]))
+
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        return ids
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    action = serializers.ChoiceField(["create", "update", "delete"])
+    id = serializers.IntegerField(required=False)
+    todo_list = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Task
+        fields = ["action", "id", "todo_list", "name", "due_date"]
+        extra_kwargs = {
+            "name": {"required": False},
+            "due_date": {"required": False}
+        }
+        list_serializer_class = TaskBulkSerializer
+
+        # Uniqueness is checked for the whole batch by TaskBulkSerializer
+        validators = []
+
+    def validate_todo_list(self, value):
+        if value not in self.parent.todo_list_ids:
+            raise serializers.ValidationError(
+                f'Invalid pk "{value}" - object does not exist.')
+        
+        return value
+
+    def validate(self, attrs):
+        # Creating a task requires all of its fields
+        if attrs["action"] == "create":
+            missing = [
+                field for field in ("todo_list", "name", "due_date") 
+                if field not in attrs
+            ]
+
+            if missing:
+                raise serializers.ValidationError(
+                    {field: ["This field is required."] for field in missing})
+            
+            return attrs
+
+        # Updating or deleting a task requires an existing task
+        if "id" not in attrs:
+            raise serializers.ValidationError({"id": ["This field is required."]})
+        
+        task = self.parent.tasks.get(attrs["id"])
+
+        if task is None:
+            raise serializers.ValidationError({"id": ["Not found."]})
+
+        attrs["instance"] = task
+
+        # Fill in the fields which an update leaves unchanged
+        if attrs["action"] == "update":
+            attrs.setdefault("todo_list", task.todo_list_id)
+            attrs.setdefault("name", task.name)
+            attrs.setdefault("due_date", task.due_date)
+
+        return attrs
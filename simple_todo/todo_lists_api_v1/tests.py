@@ -1,3 +1,424 @@
+import json
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from todo_lists.models import Task, TodoList
+from todo_lists_api_v1.views import SyncView
+
+
+# Test Case Classes
+# =================
+class SyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        # Fetch the changes since the given token
+        params = {} if since is None else {"since": since}
+        response = self.client.get(reverse("sync"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def sync_pages(self, since, after_first_page=None):
+        # Fetch the changes since the given token until they are drained,
+        # and return each page
+        pages = [self.sync(since)]
+
+        if after_first_page is not None:
+            after_first_page()
+
+        while pages[-1]["more"]:
+            pages.append(self.sync(pages[-1]["token"]))
+
+        return pages
+    
+    def test_rename_is_synced(self):
+        # Create a todo list which changed long before the token
+        todo_list = TodoList.objects.create(user=self.user, name="Chores")
+        TodoList.objects.filter(pk=todo_list.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1))
+        token = self.sync()["token"]
+        self.assertEqual(self.sync(token)["todo_lists"], [])
+
+        # Rename it and check that the rename reaches other devices
+        todo_list.refresh_from_db()
+        todo_list.name = "Errands"
+        todo_list.save()
+        changes = self.sync(token)
+        self.assertEqual(
+            [todo_list["name"] for todo_list in changes["todo_lists"]], 
+            ["Errands"]
+        )
+
+    @mock.patch.object(SyncView, "page_size", 2)
+    def test_changes_are_paged(self):
+        token = self.sync()["token"]
+        todo_list = TodoList.objects.create(user=self.user, name="List 0")
+
+        for i in range(1, 5):
+            TodoList.objects.create(user=self.user, name=f"List {i}")
+
+        for i in range(3):
+            Task.objects.create(
+                todo_list=todo_list, name=f"Task {i}", due_date=timezone.now())
+
+        Task.objects.get(name="Task 0").delete()
+
+        # Sync until the changes are drained. A change made in between is
+        # left to the next sync.
+        pages = self.sync_pages(
+            token, 
+            lambda: TodoList.objects.create(user=self.user, name="Later")
+        )
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(
+            [
+                todo_list["name"] 
+                for page in pages for todo_list in page["todo_lists"]
+            ],
+            [f"List {i}" for i in range(5)]
+        )
+        self.assertEqual(
+            [task["name"] for page in pages for task in page["tasks"]], 
+            ["Task 1", "Task 2"]
+        )
+        self.assertEqual(
+            len([id for page in pages for id in page["deleted"]["tasks"]]), 1)
+        self.assertIn(
+            "Later",
+            [
+                todo_list["name"] 
+                for page in self.sync_pages(pages[-1]["token"]) 
+                for todo_list in page["todo_lists"]
+            ]
+        )
+
+
+class DueViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_last_month_is_rejected(self):
+        # The month after the last one can't be represented
+        response = self.client.get(
+            reverse("task-due"), {"window": "month", "month": "9999-12"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"window": ["Month is out of range."]})
+
+
+class TaskViewSetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        todo_list = TodoList.objects.create(user=self.user, name="Chores")
+        Task.objects.create(
+            todo_list=todo_list, name="Dishes", due_date=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fields_trim_the_query(self):
+        # Only the requested columns and those of the cursor are selected
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("task-list"), {"fields": "name"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [{"name": "Dishes"}])
+        sql = next(
+            query["sql"] for query in queries 
+            if 'FROM "todo_lists_task"' in query["sql"]
+        )
+        self.assertNotIn("due_date", sql)
+        self.assertNotIn("todo_list_id", sql.split(" FROM ")[0])
+
+    def test_bulk_rejects_duplicate_ids(self):
+        # Only the first operation on a task in a batch is applied
+        task = Task.objects.get()
+        response = self.client.post(
+            reverse("task-bulk"),
+            [
+                {
+                    "action": "update", 
+                    "id": task.pk, 
+                    "todo_list": task.todo_list_id, 
+                    "name": "Laundry", 
+                    "due_date": task.due_date.isoformat()
+                },
+                {"action": "delete", "id": task.pk}
+            ],
+            format="json"
+        )
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results], [200, 400])
+        self.assertEqual(
+            results[1]["errors"], {"id": ["This task is already part of the batch."]})
+        self.assertEqual(Task.objects.get().name, "Laundry")
+        self.assertEqual(TodoList.objects.get().task_count, 1)
+
+    def test_bulk_reports_invalid_items(self):
+        # Invalid operations are reported in place and the others applied
+        task = Task.objects.get()
+        response = self.client.post(
+            reverse("task-bulk"),
+            [
+                {"action": "create", "todo_list": task.todo_list_id, "name": "Laundry"},
+                {"action": "rename", "id": task.pk},
+                {
+                    "action": "create", 
+                    "todo_list": task.todo_list_id + 1, 
+                    "name": "Vacuum", 
+                    "due_date": task.due_date.isoformat()
+                },
+                {"action": "delete", "id": task.pk}
+            ],
+            format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results], [400, 400, 400, 204])
+        self.assertIn("due_date", results[0]["errors"])
+        self.assertIn("action", results[1]["errors"])
+        self.assertIn("todo_list", results[2]["errors"])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(TodoList.objects.get().task_count, 0)
+
+    def test_bulk_rejects_names_which_differ_in_case(self):
+        # Names are unique regardless of case, both against existing tasks
+        # and within the batch, but a name freed earlier in the batch can be
+        # taken again
+        task = Task.objects.get()
+        create = lambda name: {
+            "action": "create", 
+            "todo_list": task.todo_list_id, 
+            "name": name, 
+            "due_date": task.due_date.isoformat()
+        }
+        response = self.client.post(
+            reverse("task-bulk"),
+            [
+                create("DISHES"),
+                create("Laundry"),
+                create("laundry"),
+                {"action": "delete", "id": task.pk},
+                create("dishes")
+            ],
+            format="json"
+        )
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results], [400, 201, 400, 204, 201])
+        self.assertEqual(
+            results[0]["errors"], 
+            {"non_field_errors": ["The fields todo_list, name must make a unique set."]}
+        )
+        self.assertEqual(
+            sorted(Task.objects.values_list("name", flat=True)), 
+            ["Laundry", "dishes"]
+        )
+
+
+class TodoListViewSetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stats_take_one_query(self):
+        # One overdue and one upcoming task in each todo list
+        now = timezone.now()
+
+        for i in range(5):
+            todo_list = TodoList.objects.create(user=self.user, name=f"List {i}")
+            Task.objects.create(
+                todo_list=todo_list, name="Late", due_date=now - timedelta(days=1))
+            Task.objects.create(
+                todo_list=todo_list, name="Soon", due_date=now + timedelta(days=i + 1))
+
+        # Look up the version stamp for the ETag and the page of todo lists
+        # with their stats, no matter how many todo lists there are
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("todo_list-list"), {"stats": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 5)
+
+        for todo_list in results:
+            self.assertEqual(todo_list["task_count"], 2)
+            self.assertEqual(todo_list["overdue_count"], 1)
+            self.assertIsNotNone(todo_list["next_due"])
+
+
+class AsyncTaskViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        todo_list = TodoList.objects.create(user=self.user, name="Chores")
+        now = timezone.now()
+
+        for i in range(api_settings.PAGE_SIZE + 1):
+            Task.objects.create(
+                todo_list=todo_list, name=f"Task {i:03d}", due_date=now)
+
+        self.client.force_login(self.user)
+
+    def test_cursors_match_the_viewset(self):
+        # The next page of the async view can be fetched from the viewset
+        # and the other way around
+        sync_page = self.client.get(reverse("task-list")).json()
+        async_page = self.client.get(reverse("async_task-list")).json()
+        self.assertEqual(async_page["results"], sync_page["results"])
+
+        for next in [sync_page["next"], async_page["next"]]:
+            cursor = parse_qs(urlsplit(next).query)["cursor"][0]
+            self.assertEqual(
+                self.client.get(
+                    reverse("async_task-list"), {"cursor": cursor}).json()["results"],
+                self.client.get(
+                    reverse("task-list"), {"cursor": cursor}).json()["results"]
+            )
+
+    def test_unchanged_listing_is_not_modified(self):
+        response = self.client.get(reverse("async_task-list"))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse("async_task-list"), headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        # Any change to the tasks of the user changes the ETag
+        Task.objects.first().save()
+        response = self.client.get(
+            reverse("async_task-list"), headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_todo_list_is_rejected(self):
+        response = self.client.get(reverse("async_task-list"), {"todo_list": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"todo_list": ["A valid integer is required."]})
+
+
+class ExportViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_tasks(self, count):
+        # Add tasks to a new todo list
+        todo_list = TodoList.objects.create(
+            user=self.user, name=f"List {TodoList.objects.count()}")
+        due_date = timezone.now()
+        Task.objects.bulk_create(
+            [
+                Task(
+                    todo_list=todo_list, 
+                    owner=self.user, 
+                    name=f"Task {i}", 
+                    due_date=due_date
+                )
+                for i in range(count)
+            ],
+            batch_size=1000
+        )
+
+    def export_peak(self, output):
+        # Stream the export and return the number of lines and the peak
+        # memory allocated while it was consumed
+        response = self.client.get(reverse("export"), {"output": output})
+        self.assertEqual(response.status_code, 200)
+        lines = 0
+        tracemalloc.start()
+
+        try:
+            for chunk in response.streaming_content:
+                lines += chunk.count(b"\n")
+
+            return lines, tracemalloc.get_traced_memory()[1]
+        
+        finally:
+            tracemalloc.stop()
+
+    @mock.patch("todo_lists_api_v1.views.ExportView.chunk_size", 100)
+    def test_memory_stays_flat(self):
+        # Export an account and one with ten times as many tasks. The peak
+        # memory depends on the chunk size, not on the number of tasks.
+        for output, header in [("ndjson", 0), ("csv", 1)]:
+            with self.subTest(output=output):
+                TodoList.objects.all().delete()
+                self.add_tasks(1000)
+                small_lines, small_peak = self.export_peak(output)
+                self.add_tasks(9000)
+                large_lines, large_peak = self.export_peak(output)
+
+                self.assertEqual(small_lines, 1001 + header)
+                self.assertEqual(large_lines, 10002 + header)
+                self.assertLess(large_peak, small_peak * 1.5)
+
+
+class ImportViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_due_dates_match_the_orm(self):
+        # Import due dates in the format of the export and in other formats
+        # which are converted differently
+        due_dates = {
+            "Export": "2030-01-05T09:00:00Z",
+            "Fraction": "2030-01-05T09:00:00.5Z",
+            "Offset": "2030-01-05T10:00:00+01:00",
+            "Naive": "2030-01-05 09:00:00"
+        }
+        lines = [json.dumps({"type": "todo_list", "id": 1, "name": "Inbox"})]
+        lines += [
+            json.dumps(
+                {
+                    "type": "task", 
+                    "todo_list": 1, 
+                    "name": name, 
+                    "due_date": due_date
+                }
+            )
+            for name, due_date in due_dates.items()
+        ]
+
+        # Importing the file twice updates the tasks instead of adding them
+        # again
+        for _ in range(2):
+            response = self.client.post(
+                reverse("import"), 
+                "\n".join(lines), 
+                content_type="application/x-ndjson"
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["errors"], 0)
 
-# Create your tests here.
+        # The ORM finds every task by its due date, so the dates were
+        # stored in the same format
+        expected = datetime(2030, 1, 5, 9, tzinfo=dt_timezone.utc)
+        self.assertEqual(Task.objects.count(), 4)
+        self.assertEqual(
+            set(Task.objects.filter(due_date=expected).values_list("name", flat=True)),
+            {"Export", "Offset", "Naive"}
+        )
+        self.assertEqual(
+            Task.objects.get(name="Fraction").due_date, 
+            expected + timedelta(microseconds=500000)
+        )
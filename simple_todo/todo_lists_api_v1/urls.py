@@ -5,7 +5,16 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView
 )
 
-from .views import TaskViewSet, TodoListViewSet
+from .views import (
+    AsyncTaskView, 
+    AsyncTodoListView, 
+    ExportView, 
+    ImportView, 
+    SearchView, 
+    SyncView, 
+    TaskViewSet, 
+    TodoListViewSet
+)
 
 
 # Configure router
@@ -15,6 +24,26 @@ router.register("tasks", TaskViewSet, "task")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("search/", SearchView.as_view(), name="api-search"),
+    path("export/", ExportView.as_view(), name="export"),
+    path("import/", ImportView.as_view(), name="import"),
+    path(
+        "async/todo-lists/", 
+        AsyncTodoListView.as_view(), 
+        name="async_todo_list-list"
+    ),
+    path(
+        "async/todo-lists/<int:pk>/", 
+        AsyncTodoListView.as_view(), 
+        name="async_todo_list-detail"
+    ),
+    path("async/tasks/", AsyncTaskView.as_view(), name="async_task-list"),
+    path(
+        "async/tasks/<int:pk>/", 
+        AsyncTaskView.as_view(), 
+        name="async_task-detail"
+    ),
     path("auth/", include("rest_framework.urls")),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh")
@@ -1,35 +1,136 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.utils import IntegrityError
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework import permissions, viewsets
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from rest_framework import exceptions, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from simple_todo.replicas import use_primary
+from todo_lists.conditional import user_conditional
+from todo_lists.due import due_window_from_params
+from todo_lists.importer import FORMATS, Importer, parse
+from todo_lists.models import Task, TodoList
+from todo_lists.purge import delete_todo_list
+from todo_lists.search import search
+
+from .pagination import DueDateCursorPagination, NameCursorPagination
+from .renderers import MessagePackRenderer
+from .serializers import (
+    TaskBulkItemSerializer, 
+    TaskReadSerializer, 
+    TaskSerializer, 
+    TodoListSerializer, 
+    TodoListStatsSerializer
+)
+
+
+# Functions
+# =========
+def api_variant(request):
+    # Each renderer produces a different representation. Overdue counts
+    # change with the clock, so representations which include them are
+    # only reused within the same minute.
+    variant = f"api-{request.accepted_renderer.format}"
+    fields = request.query_params.get("fields")
+
+    if fields:
+        variant += f"-fields-{','.join(sorted(set(fields.split(','))))}"
+
+    if include_stats(request):
+        variant += f"-stats-{int(timezone.now().timestamp()) // 60}"
+
+    return variant
 
-from todo_lists.models import Task
-from .serializers import TaskSerializer, TodoListSerializer
+
+def include_stats(request):
+    # Check whether the client asked for the stats of each todo list
+    return request.query_params.get("stats", "").lower() in ("1", "true")
 
 
 # ViewSet Classes
 # ===============
+@method_decorator(user_conditional(api_variant), name="list")
+@method_decorator(user_conditional(api_variant), name="retrieve")
 class TodoListViewSet(viewsets.ModelViewSet):
     serializer_class = TodoListSerializer
+    pagination_class = NameCursorPagination
     permission_classes = [
         permissions.IsAuthenticated
     ]
 
     def get_queryset(self):
-        return self.request.user.todo_lists.order_by("name")
+        # Filter todo lists by current user
+        queryset = self.request.user.todo_lists.all()
+
+        # Filter todo lists by name
+        name = self.request.query_params.get("name")
+
+        if name is not None:
+            queryset = queryset.filter(name=name)
+
+        # Compute the stats of each todo list in the same query. The task
+        # count comes from the counter cache and the other stats from
+        # subqueries served by the (todo_list, due_date) index.
+        if include_stats(self.request):
+            queryset = queryset.with_stats(timezone.now())
+
+        # Sort todo lists by name
+        return queryset.order_by("name", "id")
+    
+    def get_serializer_class(self):
+        if include_stats(self.request):
+            return TodoListStatsSerializer
+        
+        return super().get_serializer_class()
     
     def perform_create(self, serializer):
         # Associate the new todo list with the current user
         serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        # Delete the tasks of the todo list in chunks, then the todo list
+        delete_todo_list(instance)
     
 
+@method_decorator(user_conditional(api_variant), name="list")
+@method_decorator(user_conditional(api_variant), name="retrieve")
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
+    pagination_class = NameCursorPagination
     permission_classes = [
         permissions.IsAuthenticated
     ]
+    bulk_max_length = 1000
+    read_actions = ("list", "due")
 
     def get_queryset(self):
-        # Filter tasks by current user
-        queryset = Task.objects.filter(todo_list__user=self.request.user)
+        # Filter tasks by current user. Listings fetch plain rows for the
+        # read-only serializer instead of model instances, with only the
+        # columns of the fields requested by ?fields=.
+        queryset = self.request.user.tasks.all()
+
+        if self.action in self.read_actions:
+            queryset = queryset.values(*self.get_serializer().get_columns(
+                self.paginator.ordering))
 
         # Filter tasks by todo list
         todo_list = self.request.query_params.get("todo_list")
@@ -37,5 +138,576 @@ class TaskViewSet(viewsets.ModelViewSet):
         if todo_list is not None:
             queryset = queryset.filter(todo_list=todo_list)
 
+        # Filter tasks by name
+        name = self.request.query_params.get("name")
+
+        if name is not None:
+            queryset = queryset.filter(name=name)
+
         # Sort tasks by name
-        return queryset.order_by("name")
+        return queryset.order_by("name", "id")
+    
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return TaskReadSerializer
+        
+        return super().get_serializer_class()
+    
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        # Validate the batch of create, update, and delete operations
+        serializer = TaskBulkItemSerializer(
+            data=request.data,
+            many=True,
+            max_length=self.bulk_max_length,
+            context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+
+        # Try to apply the valid operations
+        try:
+            results = serializer.save()
+
+        except IntegrityError:
+            return Response(
+                {"detail": "The batch conflicts with a concurrent change."},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({"results": results})
+    
+    @action(detail=False, pagination_class=DueDateCursorPagination)
+    def due(self, request):
+        # Parse the due date window. The result depends on the current time,
+        # so unlike the other listings it is never answered with 304.
+        try:
+            start, end = due_window_from_params(request.query_params)
+
+        except ValueError as exc:
+            return Response(
+                {"window": [str(exc)]}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # List the tasks due in the window in date order across all todo
+        # lists, unless filtered by todo list
+        queryset = self.get_queryset().due_between(start, end)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+# View Classes
+# ============
+class ExportView(APIView):
+    permission_classes = [
+        permissions.IsAuthenticated
+    ]
+    chunk_size = 2000
+    outputs = {
+        "ndjson": ("application/x-ndjson", "ndjson"),
+        "csv": ("text/csv", "csv")
+    }
+    csv_columns = ["type", "id", "todo_list", "name", "due_date"]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The export isn't rendered by a renderer, so don't reject clients
+        # which only accept CSV or NDJSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        # Check the output format. The "format" parameter is taken by
+        # content negotiation, hence the different name.
+        output = request.query_params.get("output", "ndjson")
+
+        if output not in self.outputs:
+            return Response(
+                {"output": [f'"{output}" is not a valid choice.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Stream the todo lists and tasks of the current user
+        content_type, extension = self.outputs[output]
+        chunks = self.iter_chunks(request)
+        response = StreamingHttpResponse(
+            self.render_csv(chunks) if output == "csv" else 
+            self.render_ndjson(chunks),
+            content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="simple-todo-export.{extension}"')
+        response["Cache-Control"] = "no-store"
+        return response
+    
+    def iter_chunks(self, request):
+        # Yield the todo lists of the user and then the tasks of each todo
+        # list, one chunk of rows at a time
+        todo_list_ids = []
+        tasks = TaskReadSerializer(context={})
+
+        for rows in self.iter_keyset(
+            TodoList.objects.filter(user=request.user).values("id", "name")):
+            todo_list_ids += [row["id"] for row in rows]
+            yield [{"type": "todo_list", **row} for row in rows]
+
+        # The index on the todo list of tasks also orders them by ID, so
+        # each chunk is a range scan. Filtering by owner would sort all
+        # tasks of the user again for every chunk.
+        for todo_list_id in todo_list_ids:
+            for rows in self.iter_keyset(
+                Task.objects.filter(todo_list_id=todo_list_id).values(
+                    *TaskReadSerializer.columns.values())):
+                yield [
+                    {"type": "task", **tasks.to_representation(row)} 
+                    for row in rows
+                ]
+
+    def iter_keyset(self, queryset):
+        # Yield the rows of the queryset in ID order in chunks. Each chunk is
+        # fetched with its own query, so memory use doesn't grow with the
+        # size of the account and no cursor or transaction stays open
+        # between chunks.
+        last_id = 0
+
+        while True:
+            chunk = list(
+                queryset.filter(id__gt=last_id).order_by("id")[:self.chunk_size])
+
+            if chunk:
+                yield chunk
+
+            if len(chunk) < self.chunk_size:
+                return
+            
+            last_id = chunk[-1]["id"]
+
+    def render_ndjson(self, chunks):
+        # Write one JSON object per line
+        encoder = json.JSONEncoder()
+
+        for rows in chunks:
+            yield "".join(f"{encoder.encode(row)}\n" for row in rows)
+
+    def render_csv(self, chunks):
+        # Write a header and one line per row. Columns which don't apply to
+        # a row are left empty.
+        buffer = io.StringIO()
+        writer = csv.DictWriter(
+            buffer, 
+            fieldnames=self.csv_columns, 
+            restval=""
+        )
+        writer.writeheader()
+
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+
+class ImportView(APIView):
+    permission_classes = [
+        permissions.IsAuthenticated
+    ]
+
+    def post(self, request):
+        # Check the input format, which defaults to the content type
+        default = "csv" if request.content_type.startswith("text/csv") else "ndjson"
+        input = request.query_params.get("input", default)
+
+        if input not in FORMATS:
+            return Response(
+                {"input": [f'"{input}" is not a valid choice.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Parse the request body while it is read instead of loading it
+        # into memory, and import the rows in batches
+        stream = request.stream
+
+        if stream is None:
+            return Response(
+                {"detail": "The request body is empty."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(Importer(request.user).run(parse(stream, input)))
+    
+
+class SearchView(APIView):
+    permission_classes = [
+        permissions.IsAuthenticated
+    ]
+    page_size = 10
+
+    def get(self, request):
+        # Search the todo lists and tasks of the current user
+        q = request.query_params.get("q", "")
+
+        try:
+            hits, cursor = search(
+                request.user, 
+                q, 
+                request.query_params.get("cursor"), 
+                self.page_size
+            )
+
+        except ValueError:
+            return Response(
+                {"cursor": ["Invalid cursor."]}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Link to the next page of hits, if there is one
+        next = None
+
+        if cursor is not None:
+            next = replace_query_param(
+                request.build_absolute_uri(), "cursor", cursor)
+
+        return Response({"next": next, "results": hits})
+    
+
+class SyncView(APIView):
+    permission_classes = [
+        permissions.IsAuthenticated
+    ]
+
+    # Tokens point slightly into the past so that rows written by
+    # transactions which were still in flight are sent again on the next
+    # sync. Clients apply changes idempotently, so the overlap is harmless.
+    overlap = timedelta(seconds=5)
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+    # Most rows of each kind which are sent at once. Clients keep syncing
+    # with the returned token while "more" is true.
+    page_size = 500
+
+    def get(self, request):
+        # Tokens are stamped from the clock of the primary's writers, so read
+        # from the primary, which a lagging replica might not have caught up
+        # with. Pin the client to the primary for a while, so the pages it
+        # loads right after the token don't miss rows either.
+        use_primary(pin=True)
+
+        # Issue the next token before running any queries
+        now = timezone.now()
+        changes = {
+            "token": self.encode_token(now - self.overlap),
+            "more": False,
+            "todo_lists": [],
+            "tasks": [],
+            "deleted": {
+                "todo_lists": [],
+                "tasks": []
+            }
+        }
+
+        # Without a token, the client only wants a starting point
+        since = request.query_params.get("since")
+
+        if since is None:
+            return Response(changes)
+        
+        state = self.decode_token(since)
+
+        if state is None:
+            return Response(
+                {"since": ["Invalid sync token."]}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Tombstones older than the token lifetime may have been pruned, so
+        # the client has to reload everything
+        until, positions = state
+
+        if min(moment for moment, _ in positions) < now - settings.SYNC_TOKEN_LIFETIME:
+            return Response(
+                {"since": ["Sync token has expired."]}, 
+                status=status.HTTP_410_GONE
+            )
+        
+        # A sync which takes several pages covers the rows which changed
+        # before its first page. Later changes are sent by the next sync.
+        if until is None:
+            until = now
+
+        # Collect the next page of rows which changed since the given token,
+        # and of rows which were deleted, in (time, id) order
+        todo_lists, positions[0] = self.page(
+            request.user.todo_lists.all(), "updated_at", positions[0], until)
+        tasks, positions[1] = self.page(
+            request.user.tasks.all(), "updated_at", positions[1], until)
+        tombstones, positions[2] = self.page(
+            request.user.tombstones.all(), "deleted_at", positions[2], until)
+        changes["todo_lists"] = TodoListSerializer(todo_lists, many=True).data
+        changes["tasks"] = TaskSerializer(tasks, many=True).data
+
+        for tombstone in tombstones:
+            changes["deleted"][f"{tombstone.kind}s"].append(tombstone.object_id)
+
+        # Continue after the last rows sent, or start the next sync where
+        # this one ends
+        if any(moment < until for moment, _ in positions):
+            changes["token"] = self.encode_token(until, positions)
+            changes["more"] = True
+
+        else:
+            changes["token"] = self.encode_token(until - self.overlap)
+
+        return Response(changes)
+    
+    def page(self, queryset, field, position, until):
+        # Return the rows after the position which changed before the end of
+        # the sync, and the position after them, which is the end of the
+        # sync once all rows were returned. The separate lower bound lets
+        # the (user, time) index seek to the position.
+        moment, pk = position
+        rows = list(
+            queryset.filter(**{f"{field}__gte": moment, f"{field}__lt": until})
+            .filter(Q(**{f"{field}__gt": moment}) | Q(pk__gt=pk))
+            .order_by(field, "id")[:self.page_size + 1]
+        )
+
+        if len(rows) <= self.page_size:
+            return rows, (until, 0)
+        
+        rows = rows[:self.page_size]
+        return rows, (getattr(rows[-1], field), rows[-1].pk)
+    
+    def encode_token(self, moment, positions=None):
+        # Encode the moment as microseconds since the epoch. Continuation
+        # tokens also hold the (time, id) position reached for each kind of
+        # row, separated by dots.
+        def micros(moment):
+            return str((moment - self.epoch) // timedelta(microseconds=1))
+        
+        values = [micros(moment)]
+
+        for position_moment, pk in positions or []:
+            values += [micros(position_moment), str(pk)]
+
+        return ".".join(values)
+    
+    def decode_token(self, token):
+        # Decode the end of the sync, which is None for a new sync, and the
+        # position of each kind of row. Return None if the token is
+        # malformed.
+        try:
+            values = [int(value) for value in token.split(".")]
+
+            if len(values) == 1:
+                since = self.epoch + timedelta(microseconds=values[0])
+                return None, [(since, 0)] * 3
+            
+            if len(values) != 7:
+                return None
+            
+            until = self.epoch + timedelta(microseconds=values[0])
+            return until, [
+                (self.epoch + timedelta(microseconds=moment), pk)
+                for moment, pk in zip(values[1::2], values[2::2])
+            ]
+        
+        except (OverflowError, ValueError):
+            return None
+    
+
+# Async View Classes
+# ==================
+class AsyncReadView(View):
+    # Read-only API view which runs natively under ASGI. DRF views are
+    # synchronous and occupy a worker thread for the whole request, while
+    # these only hand the queries to the async ORM. Responses, errors,
+    # authentication, cursors and ETags match those of the viewsets.
+    http_method_names = ["get", "head", "options"]
+    jwt_authentication = JWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Authenticate the user, then run the handler with the DRF request,
+        # which the serializers, the paginator and api_variant() read, and
+        # render its errors like DRF does
+        try:
+            user = await self.authenticate(request)
+
+            if user is None:
+                raise exceptions.NotAuthenticated()
+            
+            self.drf_request = Request(request)
+            self.drf_request.user = user
+            self.drf_request.accepted_renderer = self.get_renderer()
+            return await super().dispatch(self.drf_request, *args, **kwargs)
+        
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        # Return the user of the session, or else of the access token in the
+        # Authorization header, or None if neither is present
+        user = await request.auser()
+
+        if user.is_authenticated:
+            return user
+        
+        header = self.jwt_authentication.get_header(request)
+        raw_token = header and self.jwt_authentication.get_raw_token(header)
+
+        if raw_token is None:
+            return None
+        
+        # Look up the user of the token without blocking the event loop
+        token = self.jwt_authentication.get_validated_token(raw_token)
+        user = await User.objects.filter(**{
+            jwt_settings.USER_ID_FIELD: token.get(jwt_settings.USER_ID_CLAIM)
+        }).afirst()
+
+        if user is None:
+            raise exceptions.AuthenticationFailed("User not found")
+        
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User is inactive")
+        
+        return user
+    
+    def handle_exception(self, exc):
+        # Render API errors like DRF does and leave any other exception to
+        # Django, which logs it and answers with 500
+        if not isinstance(exc, exceptions.APIException):
+            raise exc
+        
+        # Session authentication comes first and doesn't ask for credentials,
+        # so the viewsets answer failed authentication with 403
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.status_code = status.HTTP_403_FORBIDDEN
+
+        data = exc.detail
+
+        if not isinstance(data, (dict, list)):
+            data = {"detail": data}
+
+        return self.render_response(data, exc.status_code)
+    
+    def get_renderer(self):
+        # Render MessagePack for the mobile app and JSON for everyone else
+        if MessagePackRenderer.media_type in self.request.headers.get("Accept", ""):
+            return MessagePackRenderer()
+        
+        return JSONRenderer()
+    
+    def render_response(self, data, status_code=status.HTTP_200_OK):
+        # Render the data with the renderer the client accepts
+        renderer = self.get_renderer()
+        content_type = renderer.media_type
+
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+
+        return HttpResponse(
+            renderer.render(data), 
+            status=status_code, 
+            content_type=content_type
+        )
+    
+    def get_serializer_context(self):
+        # Serializers read the query parameters from the DRF request
+        return {"request": self.drf_request}
+    
+    async def paginate(self, queryset):
+        # Return a page of rows along with the URLs of the next and previous
+        # pages, using NameCursorPagination so that cursors can be passed
+        # between these views and the viewsets. The paginator queries
+        # synchronously, so it runs in the thread the async ORM would use.
+        paginator = NameCursorPagination()
+        rows = await sync_to_async(paginator.paginate_queryset)(
+            queryset, self.drf_request, self)
+        return rows, paginator.get_next_link(), paginator.get_previous_link()
+    
+
+@method_decorator(user_conditional(api_variant), name="get")
+class AsyncTodoListView(AsyncReadView):
+    # Async counterpart of the list and retrieve actions of TodoListViewSet
+    async def get(self, request, pk=None):
+        # Filter todo lists by current user
+        queryset = TodoList.objects.filter(user=request.user)
+
+        # Filter todo lists by name
+        name = request.GET.get("name")
+
+        if name is not None:
+            queryset = queryset.filter(name=name)
+
+        # Compute the stats of each todo list in the same query
+        serializer_class = TodoListSerializer
+
+        if include_stats(self.drf_request):
+            queryset = queryset.with_stats(timezone.now())
+            serializer_class = TodoListStatsSerializer
+
+        # Return a single todo list
+        if pk is not None:
+            try:
+                todo_list = await queryset.aget(pk=pk)
+
+            except TodoList.DoesNotExist:
+                raise exceptions.NotFound("No TodoList matches the given query.")
+            
+            serializer = serializer_class(
+                todo_list, context=self.get_serializer_context())
+            return self.render_response(serializer.data)
+
+        # Return a page of todo lists sorted by name
+        rows, next, previous = await self.paginate(queryset)
+        serializer = serializer_class(
+            rows, many=True, context=self.get_serializer_context())
+        return self.render_response(
+            {"next": next, "previous": previous, "results": serializer.data})
+    
+
+@method_decorator(user_conditional(api_variant), name="get")
+class AsyncTaskView(AsyncReadView):
+    # Async counterpart of the list and retrieve actions of TaskViewSet
+    async def get(self, request, pk=None):
+        # Filter tasks by current user
+        queryset = Task.objects.filter(owner=request.user)
+
+        # Return a single task
+        if pk is not None:
+            try:
+                task = await queryset.aget(pk=pk)
+
+            except Task.DoesNotExist:
+                raise exceptions.NotFound("No Task matches the given query.")
+            
+            serializer = TaskSerializer(task, context=self.get_serializer_context())
+            return self.render_response(serializer.data)
+        
+        # Listings fetch plain rows for the read-only serializer instead of
+        # model instances, with only the columns of the requested fields
+        columns = TaskReadSerializer(
+            context=self.get_serializer_context()).get_columns(("name", "id"))
+        queryset = queryset.values(*columns)
+
+        # Filter tasks by todo list
+        todo_list = request.GET.get("todo_list")
+
+        if todo_list is not None:
+            try:
+                queryset = queryset.filter(todo_list=int(todo_list))
+
+            except ValueError:
+                raise exceptions.ValidationError(
+                    {"todo_list": ["A valid integer is required."]})
+
+        # Filter tasks by name
+        name = request.GET.get("name")
+
+        if name is not None:
+            queryset = queryset.filter(name=name)
+
+        # Return a page of tasks sorted by name
+        rows, next, previous = await self.paginate(queryset)
+        serializer = TaskReadSerializer(
+            rows, many=True, context=self.get_serializer_context())
+        return self.render_response(
+            {"next": next, "previous": previous, "results": serializer.data})
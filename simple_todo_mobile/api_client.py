@@ -0,0 +1,155 @@
+from collections import OrderedDict
+
+import httpx
+
+from token_manager import TokenManager
+
+# MessagePack is smaller and faster to decode than JSON, but builds without
+# it still work with JSON
+try:
+    import msgpack
+
+except ImportError:
+    msgpack = None
+
+
+# API Response Class
+# ==================
+class ApiResponse(httpx.Response):
+    def json(self, **kwargs):
+        # Decode MessagePack bodies like JSON ones
+        if self.headers.get("Content-Type", "").startswith(
+            "application/msgpack"):
+            return msgpack.unpackb(self.content)
+        
+        return super().json(**kwargs)
+    
+    @classmethod
+    def from_response(cls, response, status_code=None):
+        # Copy a response which was already read. Its content was already
+        # decoded, so drop the headers which describe the encoding.
+        return cls(
+            status_code or response.status_code,
+            headers=[
+                (name, value) for name, value in response.headers.items()
+                if name not in ("content-encoding", "content-length")
+            ],
+            content=response.content,
+            request=response.request
+        )
+
+
+# API Client Class
+# ================
+class ApiClient:
+    # Number of responses kept for revalidation
+    etag_cache_size = 64
+
+    def __init__(self, app, transport=None):
+        # Share one pooled HTTP/2 client between all screens so that
+        # connections are reused instead of paying for a new TCP and TLS
+        # handshake on every request. Tests pass a mock transport.
+        self.app = app
+        self.client = httpx.AsyncClient(
+            http2=True,
+            transport=transport,
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=10,
+                max_keepalive_connections=5,
+                keepalive_expiry=60.0
+            )
+        )
+        self.tokens = TokenManager(app, self.client)
+        self.etag_cache = OrderedDict()
+
+    async def request(self, method, url, auth=True, **kwargs):
+        # Send the request with the access token of the current user
+        access = await self.tokens.get_access_token() if auth else None
+        response = await self.send(method, url, access, **kwargs)
+
+        # The access token can still be rejected if it was revoked or the
+        # clocks disagree, so refresh it once and retry
+        if access is not None and self.is_auth_failure(response):
+            if await self.tokens.refresh(access):
+                access = await self.tokens.get_access_token()
+                response = await self.send(method, url, access, **kwargs)
+
+        return response
+    
+    def is_auth_failure(self, response):
+        # Check whether the access token was rejected. The API answers with
+        # 403 because session authentication comes first, so tell a rejected
+        # token apart from missing permissions by its error code.
+        if response.status_code == 401:
+            return True
+        
+        if response.status_code != 403:
+            return False
+        
+        try:
+            return response.json().get("code") == "token_not_valid"
+        
+        except (AttributeError, ValueError):
+            return False
+    
+    async def send(self, method, url, access, **kwargs):
+        # Add the access token to the request and ask for MessagePack if it
+        # can be decoded
+        headers = dict(kwargs.pop("headers", {}))
+
+        if access is not None:
+            headers["Authorization"] = f"Bearer {access}"
+
+        if msgpack is not None:
+            headers.setdefault("Accept", "application/msgpack")
+
+        response = await self.client.request(
+            method, url, headers=headers, **kwargs)
+        return ApiResponse.from_response(response)
+    
+    async def get(self, url, **kwargs):
+        # Ask the server to confirm the cached response instead of sending it
+        # again if nothing changed
+        key = str(httpx.URL(url, params=kwargs.get("params")))
+        cached = self.etag_cache.get(key)
+
+        if cached is not None:
+            kwargs["headers"] = dict(
+                kwargs.get("headers", {}), 
+                **{"If-None-Match": cached.headers["ETag"]}
+            )
+
+        response = await self.request("GET", url, **kwargs)
+
+        # Serve the cached response if it is still valid
+        if response.status_code == 304 and cached is not None:
+            self.etag_cache.move_to_end(key)
+            return ApiResponse.from_response(cached, 200)
+        
+        # Remember responses which can be revalidated, evicting the least
+        # recently used one
+        if response.status_code == 200 and "ETag" in response.headers:
+            self.etag_cache[key] = response
+            self.etag_cache.move_to_end(key)
+
+            if len(self.etag_cache) > self.etag_cache_size:
+                self.etag_cache.popitem(last=False)
+
+        return response
+    
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+    
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+    
+    async def patch(self, url, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+    
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+    
+    async def aclose(self):
+        # Close all pooled connections
+        await self.client.aclose()
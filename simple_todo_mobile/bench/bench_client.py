@@ -0,0 +1,154 @@
+import os
+import sys
+
+# Import the app modules from the app directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from api_client import ApiClient
+
+
+# Stand-in Server Classes
+# =======================
+class TasksHandler(BaseHTTPRequestHandler):
+    # Answer every GET with a page of tasks and keep the connection open.
+    # The headers and body are written separately, so don't let Nagle's
+    # algorithm hold the body back until the client acknowledges them.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = self.server.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    # Server which waits before accepting each connection to stand in for
+    # the round trips of the TCP and TLS handshakes to the real API
+    daemon_threads = True
+
+    def __init__(self, connect_delay, page_size):
+        super().__init__(("127.0.0.1", 0), TasksHandler)
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.body = json.dumps(
+            {
+                "next": None,
+                "previous": None,
+                "results": [
+                    {
+                        "id": id,
+                        "name": f"Task {id:05d}",
+                        "due_date": "2030-01-01T00:00:00Z"
+                    }
+                    for id in range(1, page_size + 1)
+                ]
+            }
+        ).encode()
+
+    def get_request(self):
+        request = super().get_request()
+        self.connections += 1
+        time.sleep(self.connect_delay)
+        return request
+
+
+# Functions
+# =========
+async def old_client(url, count):
+    # Open a new client for every request, like the screens did before the
+    # client was shared, and return the seconds each request took
+    durations = []
+
+    for _ in range(count):
+        start = time.perf_counter()
+
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url)
+            response.json()
+
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+async def new_client(url, count):
+    # Send every request through one pooled ApiClient and return the
+    # seconds each request took
+    api = ApiClient(None)
+    durations = []
+
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await api.get(url, auth=False)
+        response.json()
+        durations.append(time.perf_counter() - start)
+
+    await api.aclose()
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures the latency of fetching a page of tasks from a "
+        "local stand-in server with a new client per request and with the "
+        "shared ApiClient."
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=200,
+        help="Number of requests to send with each client."
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=10,
+        help="Number of tasks in each response."
+    )
+    parser.add_argument(
+        "--connect-delay",
+        type=float,
+        default=0,
+        help="Milliseconds the server waits before accepting a connection, "
+        "e.g. the handshake round trips of a mobile network."
+    )
+    args = parser.parse_args()
+
+    # Serve the page of tasks on a free port in the background
+    server = StandInServer(args.connect_delay / 1000, args.page_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/tasks/"
+
+    for name, client in [("old client", old_client), ("ApiClient", new_client)]:
+        connections = server.connections
+        durations = asyncio.run(client(url, args.requests))
+        percentiles = statistics.quantiles(durations, n=100)
+        print(
+            f"{name}: p50 {percentiles[49] * 1000:.2f} ms, "
+            f"p99 {percentiles[98] * 1000:.2f} ms, "
+            f"{server.connections - connections} connections"
+        )
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
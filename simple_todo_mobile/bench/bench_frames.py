@@ -0,0 +1,129 @@
+import os
+import sys
+
+# Import the app modules and load their .kv files from the app directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(APP_DIR)
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from kivy.app import App
+from kivy.base import EventLoop
+from kivy.uix.screenmanager import ScreenManager
+
+from local_store import LocalStore
+from mutation_queue import MutationQueue
+from screens.todo_list_screen import TodoListScreen
+
+
+# Fake App Class
+# ==============
+class FakeApp(App):
+    # App which collects the network tasks instead of running them
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.mutations = MutationQueue(self)
+        self.tasks = []
+
+    def spawn_task(self, coro):
+        coro.close()
+
+
+# Functions
+# =========
+def load_pages(screen, count, page_size, rebuild):
+    # Load the tasks a page at a time like scrolling to the bottom does and
+    # return the seconds each frame took, from changing the rows until the
+    # view was refreshed and the tasks were saved
+    view = screen.ids.tasks
+    durations = []
+
+    for start in range(0, count, page_size):
+        rows = [
+            screen.make_task_row(
+                {
+                    "id": id,
+                    "name": f"Task {id:05d}",
+                    "due_date": "2030-01-01T00:00:00Z"
+                }
+            )
+            for id in range(start + 1, start + page_size + 1)
+        ]
+        begin = time.perf_counter()
+
+        if rebuild:
+            # Copy the whole list for every page, like the screens did
+            # before the rows were paged in place
+            view.data = view.data + rows
+
+        else:
+            evicted = screen.rows.append_page(rows, "", "next")
+            screen.shift_rows(-evicted)
+
+        view.scroll_y = 0
+        EventLoop.idle()
+        durations.append(time.perf_counter() - begin)
+
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures the frame time of loading many tasks into the "
+        "todo list screen. Run with KIVY_GL_BACKEND=mock to run headless."
+    )
+    parser.add_argument(
+        "--tasks",
+        type=int,
+        default=10000,
+        help="Number of tasks to load."
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=10,
+        help="Number of tasks in each page."
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Copy the whole list for each page instead of paging in place."
+    )
+    args = parser.parse_args()
+
+    # Show a todo list which wasn't created yet, so nothing is fetched but
+    # the tasks are still saved to the local store
+    with tempfile.TemporaryDirectory() as tempdir:
+        app = FakeApp(LocalStore(os.path.join(tempdir, "simple_todo.sqlite3")))
+        manager = ScreenManager(size=(480, 800))
+        screen = TodoListScreen()
+        manager.add_widget(screen)
+        screen.todo_list = -1
+        EventLoop.idle()
+        durations = load_pages(screen, args.tasks, args.page_size, args.rebuild)
+        app.store.close()
+
+    # Print the median and slowest frame of each quarter of the tasks
+    quarter = max(len(durations) // 4, 1)
+
+    for i in range(0, len(durations), quarter):
+        frames = durations[i:i + quarter]
+        first = i * args.page_size + 1
+        last = min((i + len(frames)) * args.page_size, args.tasks)
+        print(
+            f"rows {first}-{last}: "
+            f"p50 {statistics.median(frames) * 1000:.1f} ms, "
+            f"max {max(frames) * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
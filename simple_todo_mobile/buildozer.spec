@@ -27,7 +27,7 @@ source.include_exts = py,png,jpg,kv,atlas
 #source.exclude_exts = spec
 
 # (list) List of directory to exclude (leave empty to not exclude anything)
-#source.exclude_dirs = tests, bin, venv
+source.exclude_dirs = tests, bench, bin, venv
 
 # (list) List of exclusions using pattern matching
 # Do not prefix with './'
@@ -42,7 +42,7 @@ version = 1.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy,anyio,certifi,h11,httpcore,httpx,idna,typing_extensions
+requirements = python3,kivy,sqlite3,anyio,certifi,h11,h2,hpack,hyperframe,httpcore,httpx,idna,msgpack,typing_extensions
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
@@ -3,6 +3,10 @@ LOGIN_URL = "http://127.0.0.1:8000/api/v1/token/"
 SIGNUP_URL = "http://127.0.0.1:8000/accounts/signup/"
 TODO_LISTS_URL = "http://127.0.0.1:8000/api/v1/todo-lists/"
 TASKS_URL = "http://127.0.0.1:8000/api/v1/tasks/"
+SYNC_URL = "http://127.0.0.1:8000/api/v1/sync/"
 
 # Format strings
 DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+# Rows from the end of a list at which its next page starts loading
+PREFETCH_ROWS = 10
@@ -3,6 +3,10 @@ LOGIN_URL = "https://simple-todo-alpha-bice.vercel.app/api/v1/token/"
 SIGNUP_URL = "https://simple-todo-alpha-bice.vercel.app/accounts/signup/"
 TODO_LISTS_URL = "https://simple-todo-alpha-bice.vercel.app/api/v1/todo-lists/"
 TASKS_URL = "https://simple-todo-alpha-bice.vercel.app/api/v1/tasks/"
+SYNC_URL = "https://simple-todo-alpha-bice.vercel.app/api/v1/sync/"
 
 # Format strings
 DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+# Rows from the end of a list at which its next page starts loading
+PREFETCH_ROWS = 10
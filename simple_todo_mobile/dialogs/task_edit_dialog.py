@@ -1,6 +1,5 @@
 from datetime import datetime
 
-import httpx
 from kivy.app import App
 from kivy.lang import Builder
 from kivy.properties import ObjectProperty, StringProperty
@@ -32,62 +31,22 @@ class TaskEditPopup(Popup):
         popup.open()
 
     def update_task(self):
-        # Schedule task update
-        App.get_running_app().spawn_task(self.async_update_task())
-
-    async def async_update_task(self):
-        # Disable save and cancel buttons
-        self.ids.save_task_btn.disabled = True
-        self.ids.cancel_edit_task_btn.disabled = True
-
-        # Update task data
-        async with httpx.AsyncClient() as client:
-            try:
-                due_date = datetime.strptime(
-                    self.ids.due_date.text, 
-                    config.DATE_FORMAT).astimezone()
-                response = await client.patch(
-                    f"{config.TASKS_URL}{self.task.id}/",
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    },
-                    json={
-                        "name": self.ids.name.text, 
-                        "due_date": due_date.isoformat()
-                    }
-                )
-
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
-                return
-            
-            except ValueError:
-                self.show_error("Invalid due date.")
-                return
+        # Parse the due date
+        try:
+            due_date = datetime.strptime(
+                self.ids.due_date.text, 
+                config.DATE_FORMAT).astimezone()
             
-            finally:
-                # Enable save and cancel buttons
-                self.ids.save_task_btn.disabled = False
-                self.ids.cancel_edit_task_btn.disabled = False
-            
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
-            
-            # Retry request
-            await self.async_update_task()
-            return
-        
-        elif response.status_code != 200:
-            self.show_error("Failed to update task info.")
+        except ValueError:
+            self.show_error("Invalid due date.")
             return
         
-        # Update task info and dismiss task edit popup
-        self.task.name = self.ids.name.text
-        self.task.due_date = due_date.isoformat()
+        # Update the task in the background and dismiss task edit popup
+        App.get_running_app().root.get_screen("TodoListScreen").update_task(
+            self.task.id,
+            self.ids.name.text,
+            due_date.isoformat()
+        )
         self.dismiss()
 
 
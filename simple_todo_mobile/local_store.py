@@ -0,0 +1,256 @@
+import json
+import sqlite3
+
+
+# Local Store Class
+# =================
+class LocalStore:
+    schema = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS todo_lists (
+            position INTEGER NOT NULL,
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            todo_list INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            PRIMARY KEY (todo_list, id)
+        );
+        CREATE TABLE IF NOT EXISTS outbox (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            action TEXT NOT NULL,
+            object_id INTEGER NOT NULL,
+            parent_id INTEGER,
+            payload TEXT NOT NULL,
+            attempted INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, path):
+        # Open the database and create the tables on first use
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(self.schema)
+
+    def close(self):
+        self.db.close()
+
+    def get(self, key, default=""):
+        # Return a stored value
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row is not None else default
+
+    def set(self, key, value):
+        # Store a value
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, value)
+            )
+
+    def clear(self):
+        # Forget all cached data, e.g. when a different user logs in
+        with self.db:
+            for table in ("meta", "todo_lists", "tasks", "outbox"):
+                self.db.execute(f"DELETE FROM {table}")
+
+    def next_temp_id(self):
+        # Return a negative ID for an object which wasn't created on the
+        # server yet. The counter is stored so IDs stay unique across
+        # restarts while creates are still waiting in the outbox.
+        temp_id = int(self.get("temp_id", "0")) - 1
+        self.set("temp_id", str(temp_id))
+        return temp_id
+
+    def load_todo_lists(self):
+        # Return the cached todo lists in display order
+        return [
+            dict(row) for row in self.db.execute(
+                "SELECT id, name FROM todo_lists ORDER BY position")
+        ]
+
+    def save_todo_lists(self, todo_lists, pages, next_page, sync_token):
+        # Replace the cached todo lists and the state needed to continue
+        # loading and syncing them. The pages are stored as JSON.
+        with self.db:
+            self.db.execute("DELETE FROM todo_lists")
+            self.db.executemany(
+                "INSERT INTO todo_lists (position, id, name) VALUES (?, ?, ?)",
+                [
+                    (i, todo_list["id"], todo_list["name"])
+                    for i, todo_list in enumerate(todo_lists)
+                ]
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("todo_lists.pages", json.dumps(pages)),
+                    ("todo_lists.next_page", next_page),
+                    ("todo_lists.sync_token", sync_token)
+                ]
+            )
+
+    def todo_list_name(self, todo_list):
+        # Return the cached name of a todo list
+        row = self.db.execute(
+            "SELECT name FROM todo_lists WHERE id = ?", 
+            (todo_list,)
+        ).fetchone()
+        return row["name"] if row is not None else ""
+
+    def load_tasks(self, todo_list):
+        # Return the cached tasks of a todo list in display order
+        return [
+            dict(row) for row in self.db.execute(
+                """
+                SELECT id, name, due_date FROM tasks
+                WHERE todo_list = ? ORDER BY position
+                """,
+                (todo_list,)
+            )
+        ]
+
+    def save_tasks(self, todo_list, tasks, pages, next_page, sync_token):
+        # Replace the cached tasks of a todo list and the state needed to
+        # continue loading and syncing them. The pages are stored as JSON.
+        with self.db:
+            self.db.execute(
+                "DELETE FROM tasks WHERE todo_list = ?", (todo_list,))
+            self.db.executemany(
+                """
+                INSERT INTO tasks (todo_list, position, id, name, due_date)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (todo_list, i, task["id"], task["name"], task["due_date"])
+                    for i, task in enumerate(tasks)
+                ]
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [
+                    (f"tasks.{todo_list}.pages", json.dumps(pages)),
+                    (f"tasks.{todo_list}.next_page", next_page),
+                    (f"tasks.{todo_list}.sync_token", sync_token)
+                ]
+            )
+
+    def forget_tasks(self, todo_list):
+        # Drop the cached tasks of a todo list so they are reloaded
+        with self.db:
+            self.db.execute(
+                "DELETE FROM tasks WHERE todo_list = ?", (todo_list,))
+            self.db.execute(
+                "DELETE FROM meta WHERE key LIKE ?", (f"tasks.{todo_list}.%",))
+
+    def forget_sync_tokens(self):
+        # Make every screen reload its data from the server the next time it
+        # is shown
+        with self.db:
+            self.db.execute("DELETE FROM meta WHERE key LIKE '%.sync_token'")
+
+    def push_mutation(self, kind, action, object_id, parent_id, payload):
+        # Append a mutation to the outbox and return its sequence number
+        with self.db:
+            cursor = self.db.execute(
+                """
+                INSERT INTO outbox 
+                    (kind, action, object_id, parent_id, payload)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (kind, action, object_id, parent_id, json.dumps(payload))
+            )
+
+        return cursor.lastrowid
+
+    def first_mutation(self):
+        # Return the oldest mutation in the outbox, or None if it is empty
+        row = self.db.execute(
+            "SELECT * FROM outbox ORDER BY seq LIMIT 1").fetchone()
+
+        if row is None:
+            return None
+
+        mutation = dict(row)
+        mutation["payload"] = json.loads(mutation["payload"])
+        return mutation
+
+    def mark_attempted(self, seq):
+        # Remember that a mutation may have reached the server
+        with self.db:
+            self.db.execute(
+                "UPDATE outbox SET attempted = 1 WHERE seq = ?", (seq,))
+
+    def pop_mutation(self, seq):
+        # Remove a mutation from the outbox once it has been handled
+        with self.db:
+            self.db.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+
+    def remap(self, kind, temp_id, id):
+        # Replace the temporary ID of a created object with its real ID in
+        # the outbox and the cache
+        with self.db:
+            self.db.execute(
+                """
+                UPDATE outbox SET object_id = ?
+                WHERE kind = ? AND object_id = ?
+                """,
+                (id, kind, temp_id)
+            )
+
+            if kind == "todo_list":
+                self.db.execute(
+                    "UPDATE outbox SET parent_id = ? WHERE parent_id = ?",
+                    (id, temp_id)
+                )
+                self.db.execute(
+                    "UPDATE OR REPLACE todo_lists SET id = ? WHERE id = ?",
+                    (id, temp_id)
+                )
+                self.db.execute(
+                    """
+                    UPDATE OR REPLACE tasks SET todo_list = ?
+                    WHERE todo_list = ?
+                    """,
+                    (id, temp_id)
+                )
+                self.db.execute(
+                    "DELETE FROM meta WHERE key LIKE ?",
+                    (f"tasks.{temp_id}.%",)
+                )
+
+            else:
+                self.db.execute(
+                    "UPDATE OR REPLACE tasks SET id = ? WHERE id = ?",
+                    (id, temp_id)
+                )
+
+    def drop_mutations(self, kind, object_id):
+        # Remove the queued mutations of an object which the server rejected,
+        # including those of the tasks created in a rejected todo list, and
+        # return their sequence numbers
+        where = "kind = ? AND object_id = ?"
+        params = (kind, object_id)
+
+        if kind == "todo_list":
+            where += " OR parent_id = ?"
+            params += (object_id,)
+
+        with self.db:
+            seqs = [
+                row["seq"] for row in self.db.execute(
+                    f"SELECT seq FROM outbox WHERE {where}", params)
+            ]
+            self.db.execute(f"DELETE FROM outbox WHERE {where}", params)
+
+        return seqs
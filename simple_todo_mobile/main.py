@@ -1,11 +1,14 @@
 import asyncio
-import httpx
+import json
+import os
 
 from kivy.app import App
 from kivy.properties import ObjectProperty
 from kivy.uix.screenmanager import ScreenManager
 
-import config
+from api_client import ApiClient
+from local_store import LocalStore
+from mutation_queue import MutationQueue
 import screens.login_screen
 import screens.todo_lists_screen
 import screens.todo_list_screen
@@ -21,38 +24,54 @@ class MainScreen(ScreenManager):
 # =========
 class SimpleTodoMobileApp(App):
     tokens = ObjectProperty()
+    api = ObjectProperty()
+    store = ObjectProperty()
+    mutations = ObjectProperty()
     
     def build(self):
-        return MainScreen()
+        # Open the local store and restore the tokens of the last session
+        self.store = LocalStore(
+            os.path.join(self.user_data_dir, "simple_todo.sqlite3"))
+        self.tokens = json.loads(self.store.get("tokens", "null"))
+        self.api = ApiClient(self)
+        self.mutations = MutationQueue(self)
+        root = MainScreen()
+
+        # Skip the login screen if the user is still logged in, so the cached
+        # todo lists are shown even while offline
+        if self.tokens:
+            root.current = "TodoListsScreen"
+
+        return root
+    
+    def on_start(self):
+        # Send the changes which were made while offline
+        self.mutations.start()
+
+    def on_stop(self):
+        self.store.close()
+
+    def on_tokens(self, instance, value):
+        # Persist the tokens for the next session
+        self.store.set("tokens", json.dumps(value))
+
+    def require_login(self):
+        # Show the login screen once the session expired. The cached data
+        # and the outbox are kept and sent once the same user logged in
+        # again.
+        self.tokens = None
+        login_screen = self.root.get_screen("LoginScreen")
+        login_screen.status_msg = "Session expired. Please log in again."
+        self.root.current = "LoginScreen"
     
     def spawn_task(self, coro):
-        loop.create_task(coro)
-
-    async def refresh_token(self):
-        # Request a new access token
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{config.LOGIN_URL}refresh/",
-                    json={
-                        "refresh": self.tokens["refresh"]
-                    }
-                )
-
-            except httpx.ConnectError:
-                return False
-            
-        # Check status code
-        if response.status_code != 200:
-            return False
-        
-        # Update access token
-        self.tokens["access"] = response.json()["access"]
-        return True
+        return loop.create_task(coro)
     
 
 # Entry Point
 # ===========
 if __name__ == "__main__":
     loop = asyncio.new_event_loop()
-    loop.run_until_complete(SimpleTodoMobileApp().async_run())
+    app = SimpleTodoMobileApp()
+    loop.run_until_complete(app.async_run())
+    loop.run_until_complete(app.api.aclose())
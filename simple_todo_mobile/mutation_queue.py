@@ -0,0 +1,212 @@
+import asyncio
+
+import httpx
+
+import config
+from dialogs.error_dialog import ErrorPopup
+
+
+# Exception Classes
+# =================
+class LoginRequired(Exception):
+    # The server rejected the request because the user isn't logged in
+    pass
+
+
+# Mutation Queue Class
+# ====================
+class MutationQueue:
+    # Seconds to wait before each retry while the network is unavailable
+    retry_delays = (1, 2, 5, 10, 30, 60)
+
+    error_msgs = {
+        ("todo_list", "create"): "Failed to create todo list.",
+        ("todo_list", "update"): "Failed to update todo list info.",
+        ("todo_list", "delete"): "Failed to delete todo list.",
+        ("task", "create"): "Failed to create task.",
+        ("task", "update"): "Failed to update task info.",
+        ("task", "delete"): "Failed to delete task."
+    }
+
+    def __init__(self, app):
+        self.app = app
+        self.rollbacks = {}
+        self.listeners = []
+        self.worker = None
+        self.wakeup = asyncio.Event()
+
+    @property
+    def busy(self):
+        return self.worker is not None
+
+    def add_listener(self, listener):
+        # Listeners are told when a temporary ID is replaced and when the
+        # outbox has been drained
+        self.listeners.append(listener)
+
+    def submit(self, kind, action, object_id, payload, parent_id=None,
+        rollback=None):
+        # Store the mutation in the outbox so it survives restarts and start
+        # sending queued mutations if needed. The caller has already applied
+        # the mutation to the UI and the rollback undoes it.
+        seq = self.app.store.push_mutation(
+            kind, action, object_id, parent_id, payload)
+
+        if rollback is not None:
+            self.rollbacks[seq] = rollback
+
+        self.start()
+
+    def start(self):
+        # Cut short the wait before the next retry, since a new mutation or a
+        # restart is a good moment to check whether the network is back
+        self.wakeup.set()
+
+        if self.worker is None:
+            self.worker = self.app.spawn_task(self.async_run())
+
+    async def async_run(self):
+        # Send the mutations one at a time in the order they were made
+        store = self.app.store
+        failures = 0
+        sent = False
+        reload = False
+
+        while (mutation := store.first_mutation()) is not None:
+            store.mark_attempted(mutation["seq"])
+
+            try:
+                accepted = await self.send(mutation)
+
+            except (httpx.TransportError, LoginRequired):
+                # Keep the mutation until the user logged in again, which
+                # starts sending it again
+                if not self.app.tokens:
+                    break
+                
+                # Otherwise keep the mutation and retry once the network is
+                # back
+                delay = self.retry_delays[
+                    min(failures, len(self.retry_delays) - 1)]
+                failures += 1
+                self.wakeup.clear()
+
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+
+                except asyncio.TimeoutError:
+                    pass
+
+                continue
+
+            failures = 0
+            sent = True
+            store.pop_mutation(mutation["seq"])
+            rollback = self.rollbacks.pop(mutation["seq"], None)
+
+            if accepted:
+                continue
+
+            # Drop the mutations which depend on a rejected create
+            if mutation["action"] == "create":
+                for seq in store.drop_mutations(
+                    mutation["kind"], mutation["object_id"]):
+                    self.rollbacks.pop(seq, None)
+
+            # Undo the mutation. If it was made before the app restarted, the
+            # cached data can't be rolled back, so reload it instead.
+            if rollback is not None:
+                rollback()
+
+            else:
+                store.forget_sync_tokens()
+                reload = True
+
+            popup = ErrorPopup(
+                msg=self.error_msgs[mutation["kind"], mutation["action"]])
+            popup.open()
+
+        self.worker = None
+
+        # Let the screens fetch the changes made by the server
+        if sent:
+            for listener in self.listeners:
+                listener.mutations_idle(reload)
+
+    def check_login(self, response):
+        # Requests which are still rejected after refreshing the access
+        # token aren't the fault of the mutation, so it must not be dropped
+        if self.app.api.is_auth_failure(response):
+            raise LoginRequired()
+        
+        return response
+
+    async def send(self, mutation):
+        # Mutations of objects whose create was rejected don't change anything
+        kind = mutation["kind"]
+        action = mutation["action"]
+        id = mutation["object_id"]
+
+        if action != "create" and id < 0:
+            return True
+
+        # Send the mutation. Deleting an object which is already gone counts
+        # as a success, so a mutation which reached the server before the
+        # connection dropped can be replayed safely.
+        api = self.app.api
+        url = {
+            "todo_list": config.TODO_LISTS_URL,
+            "task": config.TASKS_URL
+        }[kind]
+
+        if action == "create":
+            payload = mutation["payload"]
+
+            if kind == "task":
+                payload["todo_list"] = mutation["parent_id"]
+
+            response = self.check_login(await api.post(url, json=payload))
+
+            if response.status_code == 201:
+                real_id = response.json()["id"]
+
+            # A create which reached the server before the connection dropped
+            # is rejected as a duplicate when it is replayed. Names are
+            # unique, so look up the object which was created instead.
+            elif response.status_code == 400 and mutation["attempted"]:
+                params = {"name": payload["name"]}
+
+                if kind == "task":
+                    params["todo_list"] = payload["todo_list"]
+
+                response = self.check_login(await api.get(url, params=params))
+
+                if response.status_code != 200:
+                    return False
+                
+                results = response.json()["results"]
+
+                if not results:
+                    return False
+                
+                real_id = results[0]["id"]
+
+            else:
+                return False
+
+            # Replace the temporary ID everywhere it is used
+            self.app.store.remap(kind, id, real_id)
+
+            for listener in self.listeners:
+                listener.remap_id(kind, id, real_id)
+
+            return True
+
+        elif action == "update":
+            response = self.check_login(
+                await api.patch(f"{url}{id}/", json=mutation["payload"]))
+            return response.status_code == 200
+
+        else:
+            response = self.check_login(await api.delete(f"{url}{id}/"))
+            return response.status_code in (204, 404)
@@ -0,0 +1,47 @@
+import asyncio
+from functools import partial
+
+
+# Page Loader Class
+# =================
+class PageLoader:
+    def __init__(self, app):
+        self.app = app
+        self.fetches = {}
+
+    def loading(self, url):
+        # Return whether the page is being fetched
+        return url in self.fetches
+
+    async def get(self, url):
+        # Fetch a page. Callers which ask for a page which is already being
+        # fetched share that fetch. Return None if the fetch was cancelled.
+        fetch = self.fetches.get(url)
+
+        if fetch is None:
+            fetch = asyncio.ensure_future(self.app.api.get(url))
+            fetch.add_done_callback(partial(self.on_fetch_done, url))
+            self.fetches[url] = fetch
+
+        # Shield the shared fetch, so it isn't cancelled along with one of
+        # the callers waiting for it
+        try:
+            return await asyncio.shield(fetch)
+        
+        except asyncio.CancelledError:
+            if fetch.cancelled():
+                return None
+            
+            raise
+        
+    def on_fetch_done(self, url, fetch):
+        # Forget the fetch unless it was already replaced
+        if self.fetches.get(url) is fetch:
+            del self.fetches[url]
+
+    def cancel(self):
+        # Cancel every fetch, e.g. when the pages it would load are stale
+        for fetch in self.fetches.values():
+            fetch.cancel()
+
+        self.fetches.clear()
@@ -0,0 +1,126 @@
+import bisect
+
+
+# Paged Rows Class
+# ================
+class PagedRows:
+    # Most rows which are kept in memory. Pages scrolled out of view beyond
+    # this are evicted and fetched again when the user scrolls back to them.
+    max_rows = 500
+
+    def __init__(self, view, key):
+        # The rows are the data of the recycle view. They are only changed in
+        # place, so the view is told which rows changed and only lays out
+        # those instead of every row.
+        self.view = view
+        self.key = key
+
+        # The row count and the URLs of the previous and next page of each
+        # loaded page, in display order
+        self.pages = []
+
+    @property
+    def rows(self):
+        return self.view.data
+
+    @property
+    def row_height(self):
+        # Height of each row including the spacing between rows
+        layout = self.view.layout_manager
+        return layout.default_size[1] + layout.spacing
+
+    @property
+    def previous_page(self):
+        # URL of the page before the first loaded row, or "" if there is none
+        return self.pages[0][1] if self.pages else ""
+
+    @property
+    def next_page(self):
+        # URL of the page after the last loaded row, or "" if there is none
+        return self.pages[-1][2] if self.pages else ""
+
+    def restore(self, rows, pages, next_page):
+        # Show cached rows. Rows which were cached without their pages count
+        # as a single page.
+        if sum(page[0] for page in pages) != len(rows):
+            pages = [[len(rows), "", next_page]] if rows else []
+
+        self.view.data = rows
+        self.pages = pages
+
+    def replace(self, rows, previous, next):
+        # Replace the shown rows with a single page
+        self.view.data = rows
+        self.pages = [[len(rows), previous or "", next or ""]]
+
+    def append_page(self, rows, previous, next):
+        # Show a page after the loaded rows, leaving out rows which are
+        # already shown, then evict pages from the top. Return the number of
+        # rows which were removed from the top.
+        rows = self.new_rows(rows)
+        self.pages.append([len(rows), previous or "", next or ""])
+        self.rows.extend(rows)
+        return self.evict(0)
+
+    def prepend_page(self, rows, previous, next):
+        # Show a page before the loaded rows, leaving out rows which are
+        # already shown, then evict pages from the bottom. Return the number
+        # of rows which were added at the top.
+        rows = self.new_rows(rows)
+        self.pages.insert(0, [len(rows), previous or "", next or ""])
+
+        # Insert the rows one at a time, since the view relays out every row
+        # when a slice is assigned
+        for row in reversed(rows):
+            self.rows.insert(0, row)
+
+        self.evict(-1)
+        return len(rows)
+
+    def new_rows(self, rows):
+        # Return the rows which aren't shown yet
+        ids = {row["id"] for row in self.rows}
+        return [row for row in rows if row["id"] not in ids]
+
+    def evict(self, end):
+        # Evict whole pages from the top (0) or the bottom (-1) while too many
+        # rows are kept, but never the only page. Return the number of rows
+        # which were evicted.
+        evicted = 0
+
+        while len(self.rows) > self.max_rows and len(self.pages) > 1:
+            count = self.pages.pop(end)[0]
+
+            if end == 0:
+                del self.rows[:count]
+
+            else:
+                del self.rows[len(self.rows) - count:]
+
+            evicted += count
+
+        return evicted
+
+    def insert(self, row):
+        # Show a row at its sorted position
+        i = bisect.bisect(self.rows, self.key(row), key=self.key)
+        self.rows.insert(i, row)
+        self.count(i, 1)
+
+    def remove(self, i):
+        # Stop showing the row at the given index
+        del self.rows[i]
+        self.count(i, -1)
+
+    def count(self, i, delta):
+        # Add to the row count of the page which contains the given index.
+        # Rows after the last page count towards it.
+        if not self.pages:
+            self.pages.append([0, "", ""])
+
+        for page in self.pages:
+            if i < page[0] or page is self.pages[-1]:
+                page[0] += delta
+                return
+
+            i -= page[0]
@@ -26,28 +26,30 @@ class LoginScreen(Screen):
         self.ids.signup_btn.disabled = True
 
         # Send login request
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    config.LOGIN_URL,
-                    json={
-                        "username": self.username,
-                        "password": self.password
-                    }
-                )
-
-            except httpx.ConnectError:
-                self.status_msg = "Network Error"
-                return
-
-            finally:
-                # Clear username and password fields
-                self.ids.username.text = ""
-                self.ids.password.text = ""
-
-                # Enable login and sign-up buttons
-                self.ids.login_btn.disabled = False
-                self.ids.signup_btn.disabled = False
+        username = self.username
+
+        try:
+            response = await App.get_running_app().api.post(
+                config.LOGIN_URL,
+                auth=False,
+                json={
+                    "username": username,
+                    "password": self.password
+                }
+            )
+
+        except httpx.TransportError:
+            self.status_msg = "Network Error"
+            return
+
+        finally:
+            # Clear username and password fields
+            self.ids.username.text = ""
+            self.ids.password.text = ""
+
+            # Enable login and sign-up buttons
+            self.ids.login_btn.disabled = False
+            self.ids.signup_btn.disabled = False
         
         # Check for errors
         if response.status_code == 401:
@@ -57,11 +59,21 @@ class LoginScreen(Screen):
         elif response.status_code != 200:
             print(response.status_msg)
 
+        # Forget the cached data of a different user
+        app = App.get_running_app()
+
+        if app.store.get("username") != username:
+            app.store.clear()
+            app.store.set("username", username)
+
         # Clear status message, store tokens, and switch to todo lists page
         self.status_msg = ""
-        App.get_running_app().tokens = response.json()
+        app.tokens = response.json()
         self.parent.current = "TodoListsScreen"
 
+        # Send the changes which were queued while logged out
+        app.mutations.start()
+
     def signup(self):
         # Open the user sign-up page in a web browser
         webbrowser.open(config.SIGNUP_URL)
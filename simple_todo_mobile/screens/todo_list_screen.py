@@ -1,10 +1,12 @@
+import json
 from datetime import datetime
+from functools import partial
 
 import httpx
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.lang import Builder
 from kivy.properties import (
-    ListProperty, 
     NumericProperty, 
     ObjectProperty, 
     StringProperty
@@ -15,6 +17,8 @@ from kivy.uix.screenmanager import NoTransition, Screen, SlideTransition
 import config
 from dialogs.error_dialog import ErrorPopup
 from dialogs.task_edit_dialog import TaskEditPopup
+from page_loader import PageLoader
+from paged_rows import PagedRows
 
 
 # Task Class
@@ -42,27 +46,132 @@ class TodoListScreen(Screen):
     todo_list = NumericProperty()
     todo_list_name = StringProperty()
     next_page = StringProperty()
-    tasks = ListProperty()
+    sync_token = StringProperty()
     scrollable_dist = NumericProperty()
     dist_to_top = NumericProperty()
+    rows = None
     scroll_y = NumericProperty()
 
+    def __init__(self, **kwargs):
+        # Call the base constructor
+        super().__init__(**kwargs)
+
+        # Keep a window of pages of tasks in the tasks view
+        self.rows = PagedRows(self.ids.tasks, lambda row: row["name"])
+        self.loader = PageLoader(App.get_running_app())
+
+        # Save the tasks to the local store at most once per frame whenever
+        # they change
+        self.save_trigger = Clock.create_trigger(self.save_state)
+        self.ids.tasks.bind(data=self.save_trigger)
+        self.bind(
+            next_page=self.save_trigger,
+            sync_token=self.save_trigger
+        )
+        self.shown_todo_list = 0
+        self.replace_rows = False
+        App.get_running_app().mutations.add_listener(self)
+
+    @property
+    def tasks(self):
+        # The view data of the shown tasks
+        return self.rows.rows
+
     def on_scroll_y(self, instance, value):
+        # The kv rules set the scroll pos before the rows are created
+        if self.rows is None:
+            return
+        
         # Calculate new distance to top
         self.dist_to_top = (1 - self.scroll_y) * self.scrollable_dist
 
-        # If we're at the bottom of the list, load the next page of tasks
-        if self.scroll_y == 0.0:
+        # If we're close to the bottom of the list, start loading the next
+        # page of tasks before it is reached
+        prefetch_dist = config.PREFETCH_ROWS * self.rows.row_height
+
+        if self.scrollable_dist - self.dist_to_top <= prefetch_dist:
             self.load_next_page()
 
+        # If we're close to the top while earlier tasks were evicted, load the
+        # previous page of tasks
+        elif self.dist_to_top <= prefetch_dist and self.rows.previous_page:
+            self.load_previous_page()
+
     def on_scrollable_dist(self, instance, value):
         # Calculate new scroll position
-        self.scroll_y = (
+        self.ids.tasks.scroll_y = (
             (self.scrollable_dist - self.dist_to_top) / self.scrollable_dist)
+        
+    def shift_rows(self, rows):
+        # Keep the shown tasks in place after the given number of rows was
+        # added above them (or removed if negative), once they were laid out.
+        # The height may not change at all, so set the scroll pos again.
+        if not rows:
+            return
+        
+        self.dist_to_top += rows * self.rows.row_height
+        Clock.schedule_once(
+            lambda dt: self.on_scrollable_dist(self, self.scrollable_dist))
+
+    def on_enter(self):
+        # Finish a reset which was cut short when the screen was left
+        if self.replace_rows:
+            self.load_next_page()
+
+    def on_leave(self):
+        # Stop loading pages which won't be shown
+        self.loader.cancel()
 
     def on_todo_list(self, instance, value):
-        # Schedule todo list info load
-        App.get_running_app().spawn_task(self.async_load_todo_list_info())
+        # Stop loading the pages of the previous todo list, save its tasks
+        # and show the cached tasks of this one right away
+        self.loader.cancel()
+        self.save_trigger.cancel()
+        self.save_state()
+        self.restore()
+
+        # Todo lists which weren't created yet have nothing to fetch. Fetch
+        # the latest changes if the tasks were already loaded, otherwise
+        # schedule todo list info load.
+        if self.todo_list < 0:
+            return
+        
+        elif self.sync_token:
+            self.sync()
+
+        else:
+            App.get_running_app().spawn_task(self.async_load_todo_list_info())
+
+    def restore(self):
+        # Load the tasks of the todo list and their sync state from the local
+        # store
+        store = App.get_running_app().store
+        self.shown_todo_list = self.todo_list
+        self.todo_list_name = store.todo_list_name(self.todo_list)
+        self.next_page = store.get(f"tasks.{self.todo_list}.next_page")
+        self.rows.restore(
+            [
+                self.make_task_row(task) 
+                for task in store.load_tasks(self.todo_list)
+            ],
+            json.loads(store.get(f"tasks.{self.todo_list}.pages", "[]")),
+            self.next_page
+        )
+        self.sync_token = store.get(f"tasks.{self.todo_list}.sync_token")
+        self.replace_rows = False
+
+    def save_state(self, *args):
+        # Write the tasks and their sync state to the local store
+        if not self.shown_todo_list:
+            return
+        
+        App.get_running_app().store.save_tasks(
+            self.shown_todo_list, 
+            self.tasks, 
+            self.rows.pages, 
+            self.next_page, 
+            self.sync_token
+        )
 
     def show_error(self, msg):
         # Show error popup
@@ -75,31 +184,16 @@ class TodoListScreen(Screen):
             return
 
         # Load todo list info
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{config.TODO_LISTS_URL}{self.todo_list}/",
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    }
-                )
-
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
-                return
+        try:
+            response = await App.get_running_app().api.get(
+                f"{config.TODO_LISTS_URL}{self.todo_list}/")
 
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
-            
-            # Retry request
-            await self.async_load_todo_list_info()
+        except httpx.TransportError:
+            self.show_error("Network connection failed.")
             return
 
-        elif response.status_code != 200:
+        # Check status code
+        if response.status_code != 200:
             self.show_error("Failed to fetch todo list info.")
             return
 
@@ -121,52 +215,12 @@ class TodoListScreen(Screen):
         self.ids.todo_list_info.current = "TodoListForm"
 
     def save(self):
-        # Schedule todo list save
-        App.get_running_app().spawn_task(self.async_save())
-
-    async def async_save(self):
-        # Disable todo list save button and cancel edit button
-        self.ids.save_todo_list_btn.disabled = True
-        self.ids.cancel_edit_btn.disabled = True
-
-        # Save todo list info
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.put(
-                    f"{config.TODO_LISTS_URL}{self.todo_list}/",
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    },
-                    json={
-                        "name": self.ids.todo_list_name.text
-                    }
-                )
-
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
-                return
-            
-            finally:
-                # Enable todo list save button and cancel edit button
-                self.ids.save_todo_list_btn.disabled = False
-                self.ids.cancel_edit_btn.disabled = False
-            
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
-            
-            # Retry request
-            await self.async_save()
-            return
-
-        elif response.status_code != 200:
-            self.show_error("Failed to update todo list info.")
-            return
-        
-        # Set todo list name and hide todo list form
+        # Show the new name right away, update the todo list in the
+        # background and hide todo list form
+        self.parent.get_screen("TodoListsScreen").update_todo_list(
+            self.todo_list, 
+            self.ids.todo_list_name.text
+        )
         self.todo_list_name = self.ids.todo_list_name.text
         self.ids.todo_list_info.current = "TodoListInfo"
 
@@ -176,119 +230,180 @@ class TodoListScreen(Screen):
         self.ids.todo_list_info.current = "TodoListInfo"
 
     def reset(self):
-        # Set the next page URL, clear the tasks, and load the next page of tasks
-        self.next_page = f"{config.TASKS_URL}?todo_list={self.todo_list}"
-        self.tasks = []
+        # Set the next page URL, clear the sync token, then sync and load the
+        # next page of tasks. The shown tasks are kept until the first page
+        # replaces them, so they stay visible while offline. The todo list of
+        # each task is already known, so it isn't requested. Pages which are
+        # still loading are stale.
+        self.loader.cancel()
+        self.next_page = (
+            f"{config.TASKS_URL}?todo_list={self.todo_list}"
+            f"&fields=id,name,due_date"
+        )
+        self.sync_token = ""
+        self.replace_rows = True
+        self.sync()
         self.load_next_page()
 
     def load_next_page(self):
-        # Schedule task load task
-        App.get_running_app().spawn_task(self.async_load_next_page())
+        # Schedule task load task unless the page is already loading
+        if self.next_page != "" and not self.loader.loading(self.next_page):
+            App.get_running_app().spawn_task(self.async_load_next_page())
 
     async def async_load_next_page(self):
         # Return if there isn't a next page
-        if self.next_page == "":
+        url = self.next_page
+
+        if url == "":
             return
         
-        # Fetch tasks
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    self.next_page,
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    }
-                )
+        # Fetch tasks. Concurrent loads of the same page share one request.
+        try:
+            response = await self.loader.get(url)
 
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
-                return
-            
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
+        except httpx.TransportError:
+            self.show_error("Network connection failed.")
+            return
             
-            # Retry request
-            await self.async_load_next_page()
+        # Return if the load was cancelled or the page is already shown
+        if response is None or url != self.next_page:
             return
         
-        elif response.status_code != 200:
+        # Check status code
+        if response.status_code != 200:
             self.show_error("Failed to fetch tasks.")
             return
         
-        # Set next page URL and display additional tasks
+        # Set next page URL and display additional tasks. The first page
+        # after a reset replaces the shown tasks, except for those which
+        # weren't created yet. Otherwise, tasks which were created locally
+        # may already be shown.
         payload = response.json()
         self.next_page = payload["next"] if payload["next"] is not None else ""
-        self.tasks = self.tasks + [
-            {
-                "id": task["id"],
-                "name": task["name"],
-                "due_date": task["due_date"],
-                "edit": self.edit_task, 
-                "delete": self.delete_task
-            } for task in payload["results"]
-        ]
+        rows = [self.make_task_row(task) for task in payload["results"]]
 
-    def create_task(self):
-        # Schedule task create task
-        App.get_running_app().spawn_task(self.async_create_task())
+        if self.replace_rows:
+            self.replace_rows = False
+            pending = [row for row in self.tasks if row["id"] < 0]
+            self.rows.replace(rows, payload["previous"], payload["next"])
 
-    async def async_create_task(self):
-        # Disable task create button
-        self.ids.create_task_btn.disabled = True
+            for row in pending:
+                self.insert_task(row)
 
-        # Create new task
-        async with httpx.AsyncClient() as client:
-            try:
-                due_date = datetime.strptime(
-                    self.ids.new_task_due_date.text, 
-                    config.DATE_FORMAT).astimezone()
-                response = await client.post(
-                    config.TASKS_URL,
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    },
-                    json={
-                        "todo_list": self.todo_list, 
-                        "name": self.ids.new_task_name.text,
-                        "due_date": due_date.isoformat()
-                    }
-                )
+        else:
+            # Only the new rows are laid out. Rows far above them may be
+            # evicted.
+            evicted = self.rows.append_page(
+                rows, payload["previous"], payload["next"])
+            self.shift_rows(-evicted)
 
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
-                return
+    def load_previous_page(self):
+        # Schedule previous tasks load task unless the page is already loading
+        if not self.loader.loading(self.rows.previous_page):
+            App.get_running_app().spawn_task(self.async_load_previous_page())
+
+    async def async_load_previous_page(self):
+        # Return if there isn't a previous page
+        url = self.rows.previous_page
+
+        if url == "":
+            return
+        
+        # Fetch the previous page of tasks, which was evicted
+        try:
+            response = await self.loader.get(url)
+
+        except httpx.TransportError:
+            self.show_error("Network connection failed.")
+            return
+            
+        # Return if the load was cancelled or the page is already shown
+        if response is None or url != self.rows.previous_page:
+            return
+        
+        # Check status code
+        if response.status_code != 200:
+            self.show_error("Failed to fetch tasks.")
+            return
+        
+        # Show the tasks above the loaded ones. Rows far below them may be
+        # evicted.
+        payload = response.json()
+        added = self.rows.prepend_page(
+            [self.make_task_row(task) for task in payload["results"]],
+            payload["previous"],
+            payload["next"]
+        )
+        self.next_page = self.rows.next_page
+        self.shift_rows(added)
+
+    def make_task_row(self, task):
+        # Build the view data of a task
+        return {
+            "id": task["id"],
+            "name": task["name"],
+            "due_date": task["due_date"],
+            "edit": self.edit_task, 
+            "delete": self.delete_task
+        }
+    
+    def find_task(self, id):
+        # Return the view data of the task with the given ID, if it is shown
+        for row in self.tasks:
+            if row["id"] == id:
+                return row
             
-            except ValueError:
-                self.show_error("Invalid due date.")
+        return None
+    
+    def insert_task(self, row):
+        # Show the task at its sorted position
+        self.rows.insert(row)
+
+    def remove_task(self, row):
+        # Stop showing the task, if it is still shown
+        for i, other in enumerate(self.tasks):
+            if other is row:
+                self.rows.remove(i)
                 return
             
-            finally:
-                # Enable task create button
-                self.ids.create_task_btn.disabled = False
+    def restore_task(self, row, fields):
+        # Restore the given fields of the task and re-sort it
+        self.remove_task(row)
+        row.update(fields)
+        self.insert_task(row)
 
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
+    def create_task(self):
+        # Parse the due date
+        try:
+            due_date = datetime.strptime(
+                self.ids.new_task_due_date.text, 
+                config.DATE_FORMAT).astimezone()
             
-            # Retry request
-            await self.async_create_task()
-            return
-        
-        elif response.status_code != 201:
-            self.show_error("Failed to create task.")
+        except ValueError:
+            self.show_error("Invalid due date.")
             return
         
-        # Clear new task fields and refresh tasks
+        # Show the new task right away with a temporary ID and clear the new
+        # task fields
+        app = App.get_running_app()
+        row = self.make_task_row({
+            "id": app.store.next_temp_id(),
+            "name": self.ids.new_task_name.text,
+            "due_date": due_date.isoformat()
+        })
+        self.insert_task(row)
         self.ids.new_task_name.text = ""
         self.ids.new_task_due_date.text = ""
-        self.reset()
+
+        # Create the task in the background
+        app.mutations.submit(
+            "task", 
+            "create", 
+            row["id"], 
+            {"name": row["name"], "due_date": row["due_date"]},
+            parent_id=self.todo_list,
+            rollback=partial(self.remove_task, row)
+        )
 
     def edit_task(self, task):
         # Show task edit popup
@@ -299,42 +414,153 @@ class TodoListScreen(Screen):
         )
         popup.open()
 
+    def update_task(self, id, name, due_date):
+        # Return if the task isn't shown anymore
+        row = self.find_task(id)
+
+        if row is None:
+            return
+        
+        # Show the new task info right away
+        old_fields = {"name": row["name"], "due_date": row["due_date"]}
+        self.restore_task(row, {"name": name, "due_date": due_date})
+
+        # Update the task in the background
+        App.get_running_app().mutations.submit(
+            "task", 
+            "update", 
+            id, 
+            {"name": name, "due_date": due_date},
+            rollback=partial(self.restore_task, row, old_fields)
+        )
+
     def delete_task(self, id):
-        # Schedule task deletion
-        App.get_running_app().spawn_task(self.async_delete_task(id))
+        # Return if the task isn't shown anymore
+        row = self.find_task(id)
+
+        if row is None:
+            return
+        
+        # Hide the task right away and delete it in the background
+        self.remove_task(row)
+        App.get_running_app().mutations.submit(
+            "task", 
+            "delete", 
+            id, 
+            {},
+            rollback=partial(self.insert_task, row)
+        )
 
-    async def async_delete_task(self, id):
-        # Delete the task associated with the given ID
-        async with httpx.AsyncClient() as client:
+    def remap_id(self, kind, temp_id, id):
+        # Show the real ID of a task once it was created
+        if kind == "task":
+            row = self.find_task(temp_id)
+
+            if row is not None:
+                row["id"] = id
+                self.ids.tasks.refresh_from_data()
+                self.save_trigger()
+
+        # Switch to the real ID of the todo list once it was created. The
+        # tasks were already moved to it in the local store.
+        elif self.todo_list == temp_id:
+            self.shown_todo_list = id
+            self.todo_list = id
+
+    def mutations_idle(self, reload):
+        # Fetch the changes once the local changes were sent
+        if self.todo_list <= 0:
+            return
+        
+        elif reload:
+            self.reset()
+
+        elif self.sync_token:
+            self.sync()
+
+    def sync(self):
+        # Schedule sync task
+        App.get_running_app().spawn_task(self.async_sync())
+
+    async def async_sync(self):
+        # Fetch the changes since the last sync a page at a time until they
+        # are drained
+        more = True
+
+        while more:
             try:
-                response = await client.delete(
-                    f"{config.TASKS_URL}{id}/",
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    }
+                response = await App.get_running_app().api.get(
+                    config.SYNC_URL,
+                    params={"since": self.sync_token} if self.sync_token else {}
                 )
 
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
+            except httpx.TransportError:
+                # Keep showing the cached tasks while offline
                 return
-            
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
+                
+            # Check status code
+            if response.status_code == 410:
+                # The sync token expired, so reload everything
+                self.reset()
+                return
+
+            elif response.status_code != 200:
+                self.show_error("Failed to sync tasks.")
                 return
             
-            # Retry request
-            await self.async_delete_task()
+            # Apply the changes and store the new sync token, which continues
+            # the sync if there are more changes. While local changes are
+            # still being sent, skip this sync so the changes are fetched
+            # again once the server has them all.
+            payload = response.json()
+
+            if self.sync_token:
+                if App.get_running_app().mutations.busy:
+                    return
+                
+                self.apply_changes(payload)
+
+            self.sync_token = payload["token"]
+            more = payload.get("more", False)
+
+    def apply_changes(self, payload):
+        # Return to the todo lists screen if the todo list was deleted
+        if self.todo_list in payload["deleted"]["todo_lists"]:
+            self.save_trigger.cancel()
+            self.shown_todo_list = 0
+            App.get_running_app().store.forget_tasks(self.todo_list)
+            self.back()
             return
         
-        elif response.status_code != 204:
-            self.show_error("Failed to delete task.")
-            return
-        
-        # Refresh tasks view
-        self.reset()
+        # Update the todo list name if it was changed
+        for todo_list in payload["todo_lists"]:
+            if todo_list["id"] == self.todo_list:
+                self.todo_list_name = todo_list["name"]
+
+        # Remove deleted and changed tasks
+        stale = set(payload["deleted"]["tasks"])
+        stale.update(task["id"] for task in payload["tasks"])
+
+        for i in reversed(range(len(self.tasks))):
+            if self.tasks[i]["id"] in stale:
+                self.rows.remove(i)
+
+        # Insert changed tasks of this todo list at their sorted position.
+        # Tasks which sort after the last loaded one will arrive with the next
+        # page, and those before the first one with the previous page.
+        for task in payload["tasks"]:
+            if task["todo_list"] != self.todo_list:
+                continue
+
+            if self.next_page != "" and (
+                not self.tasks or task["name"] > self.tasks[-1]["name"]):
+                continue
+
+            if self.rows.previous_page != "" and (
+                not self.tasks or task["name"] < self.tasks[0]["name"]):
+                continue
+
+            self.insert_task(self.make_task_row(task))
 
 
 Builder.load_file("screens/todo_list_screen.kv")
@@ -1,8 +1,11 @@
+import json
+from functools import partial
+
 import httpx
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.lang import Builder
 from kivy.properties import (
-    ListProperty, 
     NumericProperty, 
     ObjectProperty, 
     StringProperty
@@ -12,6 +15,8 @@ from kivy.uix.screenmanager import Screen, SlideTransition
 
 import config
 from dialogs.error_dialog import ErrorPopup
+from page_loader import PageLoader
+from paged_rows import PagedRows
 
 
 # Todo List Class
@@ -33,33 +38,130 @@ class TodoList(BoxLayout):
 class TodoListsScreen(Screen):
     new_todo_list_name = StringProperty()
     next_page = StringProperty()
-    todo_lists = ListProperty()
+    sync_token = StringProperty()
     scroll_y = NumericProperty()
     scrollable_dist = NumericProperty()
     dist_to_top = NumericProperty()
+    rows = None
+
+    def __init__(self, **kwargs):
+        # Call the base constructor
+        super().__init__(**kwargs)
+
+        # Keep a window of pages of todo lists in the todo lists view
+        self.rows = PagedRows(self.ids.todo_lists, lambda row: row["name"])
+        self.loader = PageLoader(App.get_running_app())
+
+        # Save the todo lists to the local store at most once per frame
+        # whenever they change
+        self.save_trigger = Clock.create_trigger(self.save_state)
+        self.ids.todo_lists.bind(data=self.save_trigger)
+        self.bind(
+            next_page=self.save_trigger,
+            sync_token=self.save_trigger
+        )
+        self.restored = False
+        self.replace_rows = False
+        App.get_running_app().mutations.add_listener(self)
+
+    @property
+    def todo_lists(self):
+        # The view data of the shown todo lists
+        return self.rows.rows
 
     def on_enter(self):
-        # Reset todo lists screen
-        self.reset()
+        # Show the cached todo lists right away the first time
+        if not self.restored:
+            self.restore()
+
+        # Fetch the latest changes if the todo lists were already loaded,
+        # otherwise reset the todo lists screen
+        if self.sync_token:
+            self.sync()
+
+            # Finish a reset which was cut short when the screen was left
+            if self.replace_rows:
+                self.load_next_page()
+
+        else:
+            self.reset()
+
+    def on_leave(self):
+        # Stop loading pages which won't be shown
+        self.loader.cancel()
+
+    def restore(self):
+        # Load the todo lists and their sync state from the local store
+        store = App.get_running_app().store
+        self.next_page = store.get("todo_lists.next_page")
+        self.rows.restore(
+            [
+                self.make_todo_list_row(todo_list) 
+                for todo_list in store.load_todo_lists()
+            ],
+            json.loads(store.get("todo_lists.pages", "[]")),
+            self.next_page
+        )
+        self.sync_token = store.get("todo_lists.sync_token")
+        self.restored = True
+
+    def save_state(self, *args):
+        # Write the todo lists and their sync state to the local store
+        App.get_running_app().store.save_todo_lists(
+            self.todo_lists, 
+            self.rows.pages, 
+            self.next_page, 
+            self.sync_token
+        )
 
     def on_scroll_y(self, instance, value):
+        # The kv rules set the scroll pos before the rows are created
+        if self.rows is None:
+            return
+        
         # Calculate distance to top
         self.dist_to_top = (1 - self.scroll_y) * self.scrollable_dist
 
-        # Have we reached the bottom of the todo lists view?
-        if value == 0.0:
+        # Have we come close to the bottom of the todo lists view? Start
+        # loading the next page before it is reached.
+        prefetch_dist = config.PREFETCH_ROWS * self.rows.row_height
+
+        if self.scrollable_dist - self.dist_to_top <= prefetch_dist:
             # Load next page of todo lists
             self.load_next_page()
 
+        # Have we come close to the top while earlier todo lists were
+        # evicted?
+        elif self.dist_to_top <= prefetch_dist and self.rows.previous_page:
+            # Load previous page of todo lists
+            self.load_previous_page()
+
     def on_scrollable_dist(self, instance, value):
         # Set new scroll pos
         self.ids.todo_lists.scroll_y = (
             (self.scrollable_dist - self.dist_to_top) / self.scrollable_dist)
+        
+    def shift_rows(self, rows):
+        # Keep the shown todo lists in place after the given number of rows
+        # was added above them (or removed if negative), once they were laid
+        # out. The height may not change at all, so set the scroll pos again.
+        if not rows:
+            return
+        
+        self.dist_to_top += rows * self.rows.row_height
+        Clock.schedule_once(
+            lambda dt: self.on_scrollable_dist(self, self.scrollable_dist))
 
     def reset(self):
-        # Clear todo lists and schedule todo lists load task
+        # Clear the sync token, then schedule sync and todo lists load tasks.
+        # The shown todo lists are kept until the first page replaces them,
+        # so they stay visible while offline. Pages which are still loading
+        # are stale.
+        self.loader.cancel()
         self.next_page = config.TODO_LISTS_URL
-        self.todo_lists = []
+        self.sync_token = ""
+        self.replace_rows = True
+        self.sync()
         self.load_next_page()
 
     def show_error(self, msg):
@@ -68,142 +170,291 @@ class TodoListsScreen(Screen):
         popup.open()
 
     def load_next_page(self):
-        # Schedule todo lists load task
-        App.get_running_app().spawn_task(self.async_load_next_page())
+        # Schedule todo lists load task unless the page is already loading
+        if self.next_page != "" and not self.loader.loading(self.next_page):
+            App.get_running_app().spawn_task(self.async_load_next_page())
 
     async def async_load_next_page(self):
         # Return if there isn't a next page
-        if self.next_page == "":
+        url = self.next_page
+
+        if url == "":
             return
 
-        # Load next page of todo lists
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    self.next_page,
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    }
-                )
+        # Load next page of todo lists. Concurrent loads of the same page
+        # share one request.
+        try:
+            response = await self.loader.get(url)
 
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
-                return
+        except httpx.TransportError:
+            self.show_error("Network connection failed.")
+            return
             
+        # Return if the load was cancelled or the page is already shown
+        if response is None or url != self.next_page:
+            return
+        
         # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
-            
-            # Retry request
-            await self.async_load_next_page()
+        if response.status_code != 200:
+            self.show_error("Failed to fetch todo lists.")
             return
+        
+        # Load todo list data. The first page after a reset replaces the
+        # shown todo lists, except for those which weren't created yet.
+        payload = response.json()
+        self.next_page = payload["next"] if payload["next"] is not None else ""
+        rows = [
+            self.make_todo_list_row(todo_list) 
+            for todo_list in payload["results"]
+        ]
+
+        if self.replace_rows:
+            self.replace_rows = False
+            pending = [row for row in self.todo_lists if row["id"] < 0]
+            self.rows.replace(rows, payload["previous"], payload["next"])
 
-        elif response.status_code != 200:
+            for row in pending:
+                self.insert_todo_list(row)
+
+        else:
+            # Only the new rows are laid out. Rows far above them may be
+            # evicted.
+            evicted = self.rows.append_page(
+                rows, payload["previous"], payload["next"])
+            self.shift_rows(-evicted)
+
+    def load_previous_page(self):
+        # Schedule previous todo lists load task unless the page is already
+        # loading
+        if not self.loader.loading(self.rows.previous_page):
+            App.get_running_app().spawn_task(self.async_load_previous_page())
+
+    async def async_load_previous_page(self):
+        # Return if there isn't a previous page
+        url = self.rows.previous_page
+
+        if url == "":
+            return
+
+        # Load the previous page of todo lists, which was evicted
+        try:
+            response = await self.loader.get(url)
+
+        except httpx.TransportError:
+            self.show_error("Network connection failed.")
+            return
+            
+        # Return if the load was cancelled or the page is already shown
+        if response is None or url != self.rows.previous_page:
+            return
+        
+        # Check status code
+        if response.status_code != 200:
             self.show_error("Failed to fetch todo lists.")
             return
         
-        # Load todo list data
+        # Show the todo lists above the loaded ones. Rows far below them may
+        # be evicted.
         payload = response.json()
-        self.next_page = payload["next"] if payload["next"] is not None else ""
-        self.todo_lists = (
-            self.todo_lists + 
+        added = self.rows.prepend_page(
             [
-                {
-                    "id": todo_list["id"], 
-                    "name": todo_list["name"], 
-                    "delete": self.delete_todo_list,
-                    "view": self.view_todo_list
-                } for todo_list in payload["results"]
-            ]
+                self.make_todo_list_row(todo_list) 
+                for todo_list in payload["results"]
+            ],
+            payload["previous"],
+            payload["next"]
         )
+        self.next_page = self.rows.next_page
+        self.shift_rows(added)
 
-    def create_todo_list(self):
-        # Schedule todo list create task
-        App.get_running_app().spawn_task(self.async_create_todo_list())
+    def make_todo_list_row(self, todo_list):
+        # Build the view data of a todo list
+        return {
+            "id": todo_list["id"], 
+            "name": todo_list["name"], 
+            "delete": self.delete_todo_list,
+            "view": self.view_todo_list
+        }
 
-    async def async_create_todo_list(self):
-        # Disable todo list create button
-        self.ids.create_todo_list_btn.disabled = True
+    def find_todo_list(self, id):
+        # Return the view data of the todo list with the given ID, if it is
+        # shown
+        for row in self.todo_lists:
+            if row["id"] == id:
+                return row
+            
+        return None
 
-        # Create new todo list
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    config.TODO_LISTS_URL,
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    },
-                    json={
-                        "name": self.new_todo_list_name
-                    }
-                )
+    def insert_todo_list(self, row):
+        # Show the todo list at its sorted position
+        self.rows.insert(row)
 
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
+    def remove_todo_list(self, row):
+        # Stop showing the todo list, if it is still shown
+        for i, other in enumerate(self.todo_lists):
+            if other is row:
+                self.rows.remove(i)
                 return
-            
-            finally:
-                # Enable todo list create button
-                self.ids.create_todo_list_btn.disabled = False
-            
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
-                return
-            
-            # Retry request
-            await self.async_create_todo_list()
-            return
 
-        elif response.status_code != 201:
-            self.show_error("Failed to create todo list.")
+    def create_todo_list(self):
+        # Show the new todo list right away with a temporary ID and clear the
+        # new todo list name field
+        app = App.get_running_app()
+        row = self.make_todo_list_row({
+            "id": app.store.next_temp_id(),
+            "name": self.new_todo_list_name
+        })
+        self.insert_todo_list(row)
+        self.ids.new_todo_list_name.text = ""
+
+        # Create the todo list in the background
+        app.mutations.submit(
+            "todo_list", 
+            "create", 
+            row["id"], 
+            {"name": row["name"]},
+            rollback=partial(self.remove_todo_list, row)
+        )
+
+    def update_todo_list(self, id, name):
+        # Return if the todo list isn't shown anymore
+        row = self.find_todo_list(id)
+
+        if row is None:
             return
         
-        # Clear new todo list name field and refresh todo lists
-        self.ids.new_todo_list_name.text = ""
-        self.reset()
+        # Show the new name right away and update the todo list in the
+        # background
+        old_name = row["name"]
+        self.rename_todo_list(row, name)
+        App.get_running_app().mutations.submit(
+            "todo_list", 
+            "update", 
+            id, 
+            {"name": name},
+            rollback=partial(self.rename_todo_list, row, old_name)
+        )
+
+    def rename_todo_list(self, row, name):
+        # Set the name of the todo list, re-sort it and show the name on the
+        # todo list screen if the todo list is viewed there
+        self.remove_todo_list(row)
+        row["name"] = name
+        self.insert_todo_list(row)
+        todo_list_screen = self.parent.get_screen("TodoListScreen")
+
+        if todo_list_screen.todo_list == row["id"]:
+            todo_list_screen.todo_list_name = name
 
     def delete_todo_list(self, id):
-        # Schedule todo list deletion
-        App.get_running_app().spawn_task(self.async_delete_todo_list(id))
+        # Return if the todo list isn't shown anymore
+        row = self.find_todo_list(id)
 
-    async def async_delete_todo_list(self, id):
-        # Delete the todo list which corresponds with the given ID
-        async with httpx.AsyncClient() as client:
+        if row is None:
+            return
+        
+        # Hide the todo list and its cached tasks right away and delete it in
+        # the background
+        app = App.get_running_app()
+        self.remove_todo_list(row)
+        app.store.forget_tasks(id)
+        app.mutations.submit(
+            "todo_list", 
+            "delete", 
+            id, 
+            {},
+            rollback=partial(self.insert_todo_list, row)
+        )
+
+    def remap_id(self, kind, temp_id, id):
+        # Show the real ID of a todo list once it was created
+        if kind != "todo_list":
+            return
+        
+        row = self.find_todo_list(temp_id)
+
+        if row is not None:
+            row["id"] = id
+            self.ids.todo_lists.refresh_from_data()
+            self.save_trigger()
+
+    def mutations_idle(self, reload):
+        # Fetch the changes once the local changes were sent
+        if reload:
+            self.reset()
+
+        elif self.sync_token:
+            self.sync()
+
+    def sync(self):
+        # Schedule sync task
+        App.get_running_app().spawn_task(self.async_sync())
+
+    async def async_sync(self):
+        # Fetch the changes since the last sync a page at a time until they
+        # are drained
+        more = True
+
+        while more:
             try:
-                response = await client.delete(
-                    f"{config.TODO_LISTS_URL}{id}/",
-                    headers={
-                        "Authorization": f"Bearer {App.get_running_app().tokens['access']}"
-                    }
+                response = await App.get_running_app().api.get(
+                    config.SYNC_URL,
+                    params={"since": self.sync_token} if self.sync_token else {}
                 )
 
-            except httpx.ConnectError:
-                self.show_error("Network connection failed.")
+            except httpx.TransportError:
+                # Keep showing the cached todo lists while offline
                 return
-            
-        # Check status code
-        if response.status_code == 403:
-            # Refresh access token
-            if not await App.get_running_app().refresh_token():
-                self.show_error("Failed to refresh access token.")
+                
+            # Check status code
+            if response.status_code == 410:
+                # The sync token expired, so reload everything
+                self.reset()
+                return
+
+            elif response.status_code != 200:
+                self.show_error("Failed to sync todo lists.")
                 return
             
-            # Retry request
-            await self.async_delete_todo_list()
-            return
+            # Apply the changes and store the new sync token, which continues
+            # the sync if there are more changes. While local changes are
+            # still being sent, skip this sync so the changes are fetched
+            # again once the server has them all.
+            payload = response.json()
 
-        elif response.status_code != 204:
-            self.show_error("Failed to delete todo list.")
-            return
-        
-        # Refresh todo lists
-        self.reset()
+            if self.sync_token:
+                if App.get_running_app().mutations.busy:
+                    return
+                
+                self.apply_changes(payload)
+
+            self.sync_token = payload["token"]
+            more = payload.get("more", False)
+
+    def apply_changes(self, payload):
+        # Remove deleted and changed todo lists
+        stale = set(payload["deleted"]["todo_lists"])
+        stale.update(todo_list["id"] for todo_list in payload["todo_lists"])
+
+        for i in reversed(range(len(self.todo_lists))):
+            if self.todo_lists[i]["id"] in stale:
+                self.rows.remove(i)
+
+        # Insert changed todo lists at their sorted position. Todo lists which
+        # sort after the last loaded one will arrive with the next page, and
+        # those before the first one with the previous page.
+        for todo_list in payload["todo_lists"]:
+            if self.next_page != "" and (
+                not self.todo_lists or 
+                todo_list["name"] > self.todo_lists[-1]["name"]):
+                continue
+
+            if self.rows.previous_page != "" and (
+                not self.todo_lists or 
+                todo_list["name"] < self.todo_lists[0]["name"]):
+                continue
+
+            self.insert_todo_list(self.make_todo_list_row(todo_list))
 
     def view_todo_list(self, id):
         # Set the todo list to view and switch to the todo list screen
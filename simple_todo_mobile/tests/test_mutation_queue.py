@@ -0,0 +1,292 @@
+import os
+import sys
+
+# Import the app modules and load their .kv files from the app directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(APP_DIR)
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+
+import asyncio
+import base64
+import json
+import random
+import unittest
+from unittest import mock
+
+import httpx
+
+import config
+from api_client import ApiClient
+from local_store import LocalStore
+from mutation_queue import MutationQueue
+
+
+def make_token(exp):
+    # Return an unsigned JWT which expires at the given time
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode())
+    return f"header.{payload.decode().rstrip('=')}.signature"
+
+
+ACCESS_TOKEN = make_token(4102444800)
+
+
+# Fake Server Class
+# =================
+class FakeServer:
+    # In-memory version of the todo lists and tasks endpoints which enforces
+    # the same unique names as the real server
+    def __init__(self):
+        self.todo_lists = {}
+        self.tasks = {}
+        self.next_id = 1
+        self.session_expired = False
+
+    def handle(self, request):
+        # Reject everything once the refresh token expired
+        if request.url.path.endswith("/token/refresh/"):
+            if self.session_expired:
+                return httpx.Response(401, json={"detail": "Token is invalid."})
+
+            return httpx.Response(200, json={"access": ACCESS_TOKEN})
+
+        if self.session_expired:
+            return httpx.Response(
+                403, 
+                json={
+                    "detail": "Given token not valid for any token type", 
+                    "code": "token_not_valid"
+                }
+            )
+
+        # Find the table and the object
+        if str(request.url).startswith(config.TODO_LISTS_URL):
+            table = self.todo_lists
+
+        else:
+            table = self.tasks
+
+        last = request.url.path.rstrip("/").split("/")[-1]
+        id = int(last) if last.isdigit() else None
+        data = json.loads(request.content) if request.content else {}
+
+        if request.method == "GET":
+            results = [
+                {"id": id, **row} for id, row in table.items()
+                if all(
+                    str(row[key]) == value
+                    for key, value in request.url.params.items()
+                )
+            ]
+            return httpx.Response(200, json={"results": results})
+
+        if request.method == "POST":
+            if self.is_duplicate(table, data):
+                return httpx.Response(400, json={"name": ["Already exists."]})
+
+            id = self.next_id
+            self.next_id += 1
+            table[id] = data
+            return httpx.Response(201, json={"id": id, **data})
+
+        if id not in table:
+            return httpx.Response(404, json={"detail": "Not found."})
+
+        if request.method == "PATCH":
+            table[id] = dict(table[id], **data)
+            return httpx.Response(200, json={"id": id, **table[id]})
+
+        # Delete the object and the tasks of a deleted todo list
+        del table[id]
+
+        if table is self.todo_lists:
+            self.tasks = {
+                task_id: task for task_id, task in self.tasks.items()
+                if task["todo_list"] != id
+            }
+
+        return httpx.Response(204)
+
+    def is_duplicate(self, table, data):
+        # Names are unique per user and per todo list
+        if table is self.tasks and data["todo_list"] not in self.todo_lists:
+            return True
+
+        return any(
+            row["name"] == data["name"]
+            and row.get("todo_list") == data.get("todo_list")
+            for row in table.values()
+        )
+
+
+# Flaky Transport Class
+# =====================
+class FlakyTransport(httpx.AsyncBaseTransport):
+    # Drop some requests before they reach the server and some responses
+    # after the server handled the request
+    def __init__(self, server, seed, drop_requests=0.4, drop_responses=0.3):
+        self.server = server
+        self.random = random.Random(seed)
+        self.drop_requests = drop_requests
+        self.drop_responses = drop_responses
+
+    async def handle_async_request(self, request):
+        await request.aread()
+
+        if self.random.random() < self.drop_requests:
+            raise httpx.ConnectError("Connection refused.", request=request)
+
+        response = self.server.handle(request)
+
+        if self.random.random() < self.drop_responses:
+            raise httpx.ReadError("Connection reset.", request=request)
+
+        return response
+
+
+# Fake App Class
+# ==============
+class FakeApp:
+    def __init__(self, transport):
+        self.store = LocalStore(":memory:")
+        self.tokens = {"access": ACCESS_TOKEN, "refresh": "refresh"}
+        self.api = ApiClient(self, transport)
+        self.mutations = MutationQueue(self)
+        self.mutations.retry_delays = (0,)
+        self.login_required = False
+
+    def spawn_task(self, coro):
+        return asyncio.ensure_future(coro)
+
+    def require_login(self):
+        self.tokens = None
+        self.login_required = True
+
+
+# Test Case Classes
+# =================
+@mock.patch("mutation_queue.ErrorPopup")
+class MutationQueueTests(unittest.IsolatedAsyncioTestCase):
+    def submit_changes(self, app):
+        # Make changes while offline, including changes to objects which
+        # don't exist on the server yet
+        submit = app.mutations.submit
+        groceries = app.store.next_temp_id()
+        milk = app.store.next_temp_id()
+        eggs = app.store.next_temp_id()
+        chores = app.store.next_temp_id()
+        submit("todo_list", "create", groceries, {"name": "Groceries"})
+        submit(
+            "task",
+            "create",
+            milk,
+            {"name": "Milk", "due_date": "2030-01-01T00:00:00Z"},
+            parent_id=groceries
+        )
+        submit(
+            "task",
+            "create",
+            eggs,
+            {"name": "Eggs", "due_date": "2030-01-01T00:00:00Z"},
+            parent_id=groceries
+        )
+        submit(
+            "task",
+            "update",
+            milk,
+            {"name": "Oat milk", "due_date": "2030-01-02T00:00:00Z"}
+        )
+        submit("task", "delete", eggs, {})
+        submit("todo_list", "update", groceries, {"name": "Shopping"})
+        submit("todo_list", "create", chores, {"name": "Chores"})
+        submit("todo_list", "delete", chores, {})
+
+    async def drain(self, app):
+        # Wait until the queue stopped sending
+        while app.mutations.worker is not None:
+            await app.mutations.worker
+
+    async def test_replay_over_flaky_network(self, ErrorPopup):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                server = FakeServer()
+                app = FakeApp(FlakyTransport(server, seed))
+                self.submit_changes(app)
+                await self.drain(app)
+
+                # Every change was applied exactly once
+                self.assertEqual(
+                    list(server.todo_lists.values()), [{"name": "Shopping"}])
+                self.assertEqual(
+                    [task["name"] for task in server.tasks.values()],
+                    ["Oat milk"]
+                )
+                self.assertIsNone(app.store.first_mutation())
+                ErrorPopup.assert_not_called()
+                await app.api.aclose()
+
+    async def test_outbox_is_kept_until_login(self, ErrorPopup):
+        # Expire the session, so the requests and the refresh are rejected
+        server = FakeServer()
+        server.session_expired = True
+        app = FakeApp(httpx.MockTransport(server.handle))
+        self.submit_changes(app)
+        await self.drain(app)
+
+        self.assertTrue(app.login_required)
+        self.assertIsNone(app.tokens)
+        self.assertEqual(server.todo_lists, {})
+        self.assertIsNotNone(app.store.first_mutation())
+        ErrorPopup.assert_not_called()
+
+        # Send the kept changes after logging in again
+        server.session_expired = False
+        app.tokens = {"access": ACCESS_TOKEN, "refresh": "refresh"}
+        app.mutations.start()
+        await self.drain(app)
+
+        self.assertEqual(
+            list(server.todo_lists.values()), [{"name": "Shopping"}])
+        self.assertIsNone(app.store.first_mutation())
+        await app.api.aclose()
+
+
+class ApiClientTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_rejected_tokens_are_refreshed(self):
+        # Answer requests with the given response and count the refreshes
+        refreshes = []
+        responses = {
+            "forbidden": httpx.Response(
+                403, json={"detail": "You do not have permission."}),
+            "expired": httpx.Response(
+                403, json={"detail": "Token is invalid.", "code": "token_not_valid"}),
+            "unauthorized": httpx.Response(401, json={"detail": "Token is invalid."})
+        }
+
+        def handle(request):
+            if request.url.path.endswith("/token/refresh/"):
+                refreshes.append(request)
+                return httpx.Response(200, json={"access": make_token(4102444801)})
+
+            return responses[request.url.params["case"]]
+
+        app = FakeApp(httpx.MockTransport(handle))
+
+        for case, refreshed in [
+            ("forbidden", False), 
+            ("expired", True), 
+            ("unauthorized", True)
+        ]:
+            with self.subTest(case=case):
+                refreshes.clear()
+                app.tokens = {"access": ACCESS_TOKEN, "refresh": "refresh"}
+                await app.api.get(config.TASKS_URL, params={"case": case})
+                self.assertEqual(bool(refreshes), refreshed)
+
+        await app.api.aclose()
+
+
+if __name__ == "__main__":
+    unittest.main()
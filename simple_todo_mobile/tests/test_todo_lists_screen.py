@@ -0,0 +1,98 @@
+import os
+import sys
+
+# Import the app modules and load their .kv files from the app directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(APP_DIR)
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+os.environ.setdefault("KIVY_GL_BACKEND", "mock")
+
+import tempfile
+import time
+import unittest
+
+from kivy.app import App
+from kivy.base import EventLoop
+from kivy.uix.screenmanager import ScreenManager
+
+import config
+from local_store import LocalStore
+from mutation_queue import MutationQueue
+from screens.todo_lists_screen import TodoListsScreen
+
+
+# Fake App Class
+# ==============
+class FakeApp(App):
+    # App which collects the network tasks instead of running them, so the
+    # screen has to paint from the local store alone
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.mutations = MutationQueue(self)
+        self.tasks = []
+
+    def spawn_task(self, coro):
+        self.tasks.append(coro)
+
+
+# Test Case Classes
+# =================
+class ColdStartTests(unittest.TestCase):
+    # Most seconds from opening the local store until the cached todo lists
+    # are shown
+    first_paint_budget = 0.5
+
+    def setUp(self):
+        # Cache a full window of todo lists like a previous session did
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "simple_todo.sqlite3")
+        store = LocalStore(self.path)
+        store.save_todo_lists(
+            [
+                {"id": id, "name": f"List {id}"}
+                for id in range(1, 501)
+            ],
+            [[500, "", f"{config.TODO_LISTS_URL}?cursor=next"]],
+            f"{config.TODO_LISTS_URL}?cursor=next",
+            "token"
+        )
+        store.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_first_paint_uses_cached_todo_lists(self):
+        # Open the store and enter the screen like the app does on start
+        start = time.perf_counter()
+        app = FakeApp(LocalStore(self.path))
+        manager = ScreenManager(size=(480, 800))
+        screen = TodoListsScreen()
+        manager.add_widget(screen)
+
+        # Lay out the first frame
+        for _ in range(3):
+            EventLoop.idle()
+
+        elapsed = time.perf_counter() - start
+        names = [
+            row.name for row in screen.ids.todo_lists_layout.children]
+        self.assertIn("List 1", names)
+        self.assertLess(elapsed, self.first_paint_budget)
+
+        # The cached todo lists were shown before any request finished. The
+        # sync started in the background.
+        self.assertEqual(len(screen.todo_lists), 500)
+        self.assertEqual(len(app.tasks), 1)
+
+        for task in app.tasks:
+            task.close()
+
+        app.store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
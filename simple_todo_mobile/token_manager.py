@@ -0,0 +1,95 @@
+import asyncio
+import base64
+import json
+import time
+
+import config
+
+
+# Token Manager Class
+# ===================
+class TokenManager:
+    # Refresh the access token this many seconds before it expires
+    refresh_margin = 30
+
+    def __init__(self, app, client):
+        self.app = app
+        self.client = client
+        self.refresh_task = None
+
+    def expires_at(self, token):
+        # Decode the expiry time from the payload of the JWT. The signature
+        # is checked by the server, so it doesn't need to be verified here.
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            return json.loads(base64.urlsafe_b64decode(payload))["exp"]
+        
+        except (IndexError, KeyError, ValueError):
+            return 0
+
+    async def get_access_token(self):
+        # Return None if the user isn't logged in
+        tokens = self.app.tokens
+
+        if not tokens:
+            return None
+        
+        # Refresh the access token shortly before it expires instead of
+        # waiting for a request to fail
+        access = tokens["access"]
+
+        if self.expires_at(access) - self.refresh_margin <= time.time():
+            await self.refresh(access)
+
+        # The session may have expired in the meantime
+        tokens = self.app.tokens
+        return tokens["access"] if tokens else None
+    
+    async def refresh(self, stale_access):
+        # Another caller may have already found out that the session expired
+        if not self.app.tokens:
+            return False
+        
+        # Another caller may have already replaced the stale access token
+        if self.app.tokens["access"] != stale_access:
+            return True
+        
+        # Make concurrent callers await one in-flight refresh instead of each
+        # starting their own
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.ensure_future(self.async_refresh())
+            self.refresh_task.add_done_callback(self.on_refresh_done)
+
+        return await asyncio.shield(self.refresh_task)
+    
+    def on_refresh_done(self, task):
+        # Allow the next refresh to start
+        self.refresh_task = None
+
+    async def async_refresh(self):
+        # Request a new access token. Network errors are raised to the
+        # callers, which keep their data and retry once the network is back.
+        response = await self.client.post(
+            f"{config.LOGIN_URL}refresh/",
+            json={
+                "refresh": self.app.tokens["refresh"]
+            }
+        )
+        
+        # The refresh token expired or was revoked, so the user has to log
+        # in again
+        if response.status_code == 401:
+            self.app.require_login()
+            return False
+        
+        # Check status code
+        if response.status_code != 200:
+            return False
+        
+        # Update access token. Assign new tokens so they are persisted.
+        self.app.tokens = dict(
+            self.app.tokens, 
+            access=response.json()["access"]
+        )
+        return True